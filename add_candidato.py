@@ -26,8 +26,11 @@ def slugify(text):
     text = text.strip('_')
     return text
 
-def create_candidate(name, subtitle=None):
-    """Cria estrutura completa para um novo candidato"""
+def create_candidate(name, subtitle=None, candidatos_root=None):
+    """Cria estrutura completa para um novo candidato
+
+    `candidatos_root` troca a pasta dos candidatos (padrão: candidatos/ do app).
+    """
     
     if not subtitle:
         subtitle = "Mapa de votos por local de votação"
@@ -36,8 +39,11 @@ def create_candidate(name, subtitle=None):
     
     # Diretórios
     base_dir = Path(__file__).parent
-    candidatos_dir = base_dir / "candidatos" / slug
+    root = Path(candidatos_root) if candidatos_root else base_dir / "candidatos"
+    candidatos_dir = root / slug
     pages_dir = base_dir / "pages"
+    # a página importa `candidatos.<slug>`: só vale para a pasta do próprio app
+    with_page = root.resolve() == (base_dir / "candidatos").resolve()
     
     # Criar pasta do candidato
     candidatos_dir.mkdir(parents=True, exist_ok=True)
@@ -80,7 +86,7 @@ def render():
         f.write(candidate_content)
     
     # 2. Criar página Streamlit
-    page_file = pages_dir / f"{page_number}_{slug}.py"
+    page_file = pages_dir / f"{page_number}_{slug}.py" if with_page else None
     page_content = f'''from pathlib import Path
 import sys
 import streamlit as st
@@ -98,8 +104,9 @@ if __name__ == "__main__":
     render()
 '''
     
-    with open(page_file, 'w', encoding='utf-8') as f:
-        f.write(page_content)
+    if page_file:
+        with open(page_file, 'w', encoding='utf-8') as f:
+            f.write(page_content)
     
     # 3. Criar arquivo README com instruções
     readme_file = candidatos_dir / "README.md"
@@ -142,7 +149,7 @@ Após adicionar os arquivos, a página estará disponível em:
     print(f"✅ Candidato '{name}' criado com sucesso!")
     print(f"\n📁 Pasta criada: {candidatos_dir}")
     print(f"📄 Arquivo Python: {candidate_py}")
-    print(f"🌐 Página Streamlit: {page_file}")
+    print(f"🌐 Página Streamlit: {page_file}" if page_file else "🌐 Página Streamlit: não criada (pasta fora de candidatos/ do app)")
     print(f"\n📋 Próximos passos:")
     print(f"1. Adicione arquivos GeoJSON em: {candidatos_dir}/")
     print(f"   - Qualquer arquivo começando com 'votos_' será detectado automaticamente")
@@ -4,6 +4,36 @@ from pathlib import Path
 import streamlit as st
 import hashlib
 
+from localiza.config import WARMUP_HEALTHCHECK_WAIT
+from localiza.warmup import start_warmup, wait_warmup
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except Exception:
+    get_script_run_ctx = None
+
+# pré-carregamento das bases em segundo plano desde a subida do servidor (o
+# healthcheck do Railway já executa este script); não segura a tela de senha
+start_warmup()
+
+
+def is_health_check() -> bool:
+    """Esta execução é a do /_stcore/script-health-check?
+
+    O Streamlit roda o script do healthcheck numa sessão criada à parte, que não
+    entra no gerenciador das sessões dos navegadores.
+    """
+    if get_script_run_ctx is None or not st.runtime.exists():
+        return False
+    ctx = get_script_run_ctx()
+    return ctx is not None and not st.runtime.get_instance().is_active_session(ctx.session_id)
+
+
+# só o healthcheck espera o warm-up: o deploy fica pronto com as bases carregadas,
+# e quem abre a página vê a tela de senha na hora
+if is_health_check() and not wait_warmup(WARMUP_HEALTHCHECK_WAIT):
+    raise RuntimeError("warm-up das bases ainda em andamento")
+
 def check_password():
     """Retorna True se o usuário digitou a senha correta."""
     
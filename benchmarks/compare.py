@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Compara dois resultados de `benchmarks/run.py` (ex.: antes e depois de um commit).
+
+Uso:
+    python benchmarks/compare.py antes.json depois.json [--limiar 1.10]
+
+Mostra a mediana de cada medição nos dois arquivos e a razão depois/antes;
+razões acima do limiar são marcadas como regressão (saída com código 1).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def load(path: Path) -> tuple[dict, dict[str, dict]]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return data.get("meta", {}), {r["name"]: r for r in data.get("results", [])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dois resultados de benchmark")
+    parser.add_argument("antes", type=Path)
+    parser.add_argument("depois", type=Path)
+    parser.add_argument("--limiar", type=float, default=1.10, help="razão a partir da qual é regressão")
+    args = parser.parse_args()
+
+    meta_a, res_a = load(args.antes)
+    meta_b, res_b = load(args.depois)
+    print(f"antes:  {meta_a.get('commit')} ({meta_a.get('secoes')} seções)")
+    print(f"depois: {meta_b.get('commit')} ({meta_b.get('secoes')} seções)\n")
+    print(f"{'medição':<40} {'antes ms':>11} {'depois ms':>11} {'razão':>7}")
+
+    regressions = 0
+    for name in list(res_a) + [n for n in res_b if n not in res_a]:
+        a, b = res_a.get(name), res_b.get(name)
+        ma = a["median_s"] * 1000 if a else None
+        mb = b["median_s"] * 1000 if b else None
+        if ma is None or mb is None:
+            print(f"{name:<40} {ma if ma is not None else '-':>11} {mb if mb is not None else '-':>11}")
+            continue
+        ratio = mb / ma if ma > 0 else float("inf")
+        flag = ""
+        if ratio > args.limiar:
+            flag = "  ⚠️"
+            regressions += 1
+        elif ratio < 1 / args.limiar:
+            flag = "  ✅"
+        print(f"{name:<40} {ma:>11.1f} {mb:>11.1f} {ratio:>7.2f}{flag}")
+
+    if regressions:
+        print(f"\n{regressions} regressão(ões) acima de {args.limiar:.2f}x")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""Benchmarks do LocalizaVotos sobre dados sintéticos na escala do Ceará.
+
+Gera os dados de `benchmarks/synthetic.py` (semente fixa) e mede as etapas
+quentes do app: importação dos módulos (`python -X importtime`, num
+interpretador novo), leitura e normalização de GeoJSON, montagem do DataFrame
+de votos, seleção por polígono, montagem do mapa folium, cada gráfico de
+`localiza.charts` e a página completa (`render_candidate`) num AppTest do
+Streamlit, sem navegador.
+
+Uso:
+    python benchmarks/run.py --saida resultados/abc123.json
+    python benchmarks/run.py --secoes 5000 --repeticoes 3 --apenas chart_ map.
+    python benchmarks/compare.py antes.json depois.json
+
+O JSON de saída traz o commit, a máquina e, para cada medição, min/mediana/média
+em segundos e o número de linhas processadas.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault("LOCALIZA_PERF_LOG", "0")
+os.environ.setdefault("LOCALIZA_WARMUP", "0")
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+from synthetic import LAT_MAX, LAT_MIN, LON_MAX, LON_MIN, generate  # noqa: E402
+
+from localiza import cache, charts, export, pyramid, report, selection, tiles, vector_tiles  # noqa: E402
+from localiza.analytics import (  # noqa: E402
+    PointIndex,
+    _catchments,
+    build_votos_df,
+    filter_points_within_polygon,
+    load_votos_df,
+    polling_places,
+    select_votos_features,
+    vote_density_grid,
+    vote_hexbins,
+    vote_hotspots,
+)
+from localiza.io_geo import read_geojson  # noqa: E402
+from localiza.map_folium import (  # noqa: E402
+    add_density_overlay, add_filterable_votes_layer, add_geojson_layer, add_hexbin_layer, add_points_layer,
+    add_pyramid_layer, build_map, delta_update, finalize_map,
+)
+from localiza.schema import normalize_geojson  # noqa: E402
+from localiza.spatial import assign_points, region_totals  # noqa: E402
+
+CHARTS = [
+    "chart_top_municipios",
+    "chart_bottom_municipios",
+    "chart_top_locais",
+    "chart_bottom_locais",
+    "chart_top_bairros",
+    "chart_hist_votos",
+    "chart_concentracao_votos",
+    "chart_votos_por_zona",
+    "chart_dispersao_geografica",
+]
+
+# importações medidas: a tela de senha (app.py) e o que toda página importa antes de desenhar
+IMPORTS = {
+    "import.app": "app",
+    "import.localiza_ui": "localiza.ui",
+}
+
+PAGE_SCRIPT = """
+import sys
+from pathlib import Path
+sys.path.insert(0, {root!r})
+import streamlit as st
+from localiza.ui import render_candidate
+st.session_state["COMMON_DATA_DIR"] = {data_dir!r}
+render_candidate(
+    candidate_folder=Path({folder!r}),
+    title="Benchmark",
+    subtitle="dados sintéticos",
+    votos_files=[Path({votos!r})],
+)
+"""
+
+
+class Bench:
+    def __init__(self, repeat: int, only: list[str] | None):
+        self.repeat = repeat
+        self.only = only
+        self.results: list[dict[str, Any]] = []
+
+    def wanted(self, name: str) -> bool:
+        return not self.only or any(name.startswith(p) for p in self.only)
+
+    def run(self, name: str, fn: Callable[[], Any], rows: int | None = None, repeat: int | None = None, setup: Callable[[], Any] | None = None):
+        """Mede `fn` `repeat` vezes (após um `setup` opcional, fora do tempo)."""
+        if not self.wanted(name):
+            return None
+        times = []
+        out = None
+        for _ in range(repeat or self.repeat):
+            if setup:
+                setup()
+            gc.collect()
+            t0 = time.perf_counter()
+            out = fn()
+            times.append(time.perf_counter() - t0)
+        self.record(name, times, rows)
+        return out
+
+    def record(self, name: str, times: list[float], rows: int | None = None) -> None:
+        """Guarda tempos medidos fora de `run` (ex.: num subprocesso)."""
+        res = {
+            "name": name,
+            "repeat": len(times),
+            "min_s": round(min(times), 6),
+            "median_s": round(statistics.median(times), 6),
+            "mean_s": round(statistics.fmean(times), 6),
+            "rows": rows,
+        }
+        self.results.append(res)
+        print(f"{name:<40} {res['median_s'] * 1000:>10.1f} ms  (min {res['min_s'] * 1000:.1f}, n={res['repeat']})", file=sys.stderr)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def selection_polygon() -> dict[str, Any]:
+    """Retângulo cobrindo o quarto nordeste do estado (onde fica Fortaleza)."""
+    lat_mid = (LAT_MIN + LAT_MAX) / 2
+    lon_mid = (LON_MIN + LON_MAX) / 2
+    ring = [[lon_mid, lat_mid], [LON_MAX, lat_mid], [LON_MAX, LAT_MAX], [lon_mid, LAT_MAX], [lon_mid, lat_mid]]
+    return {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}, "properties": {}}
+
+
+def import_time(module: str) -> float:
+    """Segundos de `import module` num interpretador novo (cumulativo do `-X importtime`)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module and parts[1].strip().isdigit():
+            return int(parts[1]) / 1e6
+    raise RuntimeError(f"{module} não aparece na saída do -X importtime")
+
+
+def bench_imports(b: Bench):
+    for name, module in IMPORTS.items():
+        if b.wanted(name):
+            b.record(name, [import_time(module) for _ in range(b.repeat)])
+
+
+def bench_core(b: Bench, info: dict[str, Any]):
+    votos_file = info["candidatos"][0] / "votos_ce.geojson"
+    setores_file = info["data_dir"] / "setores_ce.geojson"
+
+    gj = read_geojson(votos_file)
+    setores = read_geojson(setores_file)
+    b.run("read_geojson.votos", lambda: read_geojson(votos_file), rows=info["secoes"])
+    b.run("read_geojson.setores", lambda: read_geojson(setores_file), rows=info["setores"])
+    b.run("normalize_geojson.votos", lambda: normalize_geojson(gj, tipo="votos"), rows=info["secoes"])
+    b.run("normalize_geojson.setores", lambda: normalize_geojson(setores), rows=info["setores"])
+    b.run("build_votos_df", lambda: build_votos_df(gj), rows=info["secoes"])
+
+    # load_votos_df: sem sidecar (GeoJSON) e com sidecar
+    from localiza.analytics import votos_sidecar_path, write_votos_sidecar
+
+    sidecar = votos_sidecar_path(votos_file)
+    sidecar.unlink(missing_ok=True)
+    b.run("load_votos_df.geojson", lambda: load_votos_df(votos_file), rows=info["secoes"])
+    df = build_votos_df(gj)
+    write_votos_sidecar(votos_file, df)
+    b.run("load_votos_df.sidecar", lambda: load_votos_df(votos_file), rows=info["secoes"])
+
+    # exportação da base inteira, escrita em blocos (sem o arquivo pronto do cache em disco)
+    export_dir = info["data_dir"].parent / "exports"
+
+    def _clear_exports():
+        for f in export_dir.glob("*"):
+            f.unlink()
+
+    for fmt in export.available_formats():
+        b.run(f"export.{fmt}", lambda: export.export_path(votos_file, df, fmt, export_dir), rows=len(df), setup=_clear_exports)
+
+    # página do relatório do município com mais votos (mapa, números e gráficos; sem gravar)
+    job = report.ReportJob("bench", "Bench", votos_file, report.municipio_totals(votos_file).index[0])
+    df_mun = df[df[report.municipio_column(df)].astype(str).str.strip() == job.municipio]
+    b.run("report.pagina", lambda: report.compose_page(job, df_mun), rows=len(df_mun))
+
+    poly = selection_polygon()
+    b.run("filter_points_within_polygon", lambda: filter_points_within_polygon(df, poly), rows=len(df))
+
+    # seleção desenhada: teste via índice espacial e evento com uma forma nova sobre outra já calculada
+    idx = PointIndex(df["lat"].to_numpy(), df["lon"].to_numpy())
+    b.run("selection.polygon_rows", lambda: selection.polygon_rows(idx, poly), rows=len(df))
+    ring = [[LON_MIN, LAT_MIN], [(LON_MIN + LON_MAX) / 2, LAT_MIN], [(LON_MIN + LON_MAX) / 2, (LAT_MIN + LAT_MAX) / 2], [LON_MIN, LAT_MIN]]
+    poly2 = {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}, "properties": {}}
+    first = selection.update(None, [poly], votos_file, df)
+
+    b.run(
+        "selection.update.nova_forma", lambda: selection.update(first, [poly, poly2], votos_file, df),
+        rows=len(df), setup=lambda: cache.clear("selecao_forma"),
+    )
+
+    # 20 formas (polígono + círculos de 5 km) já calculadas, trocando só as operações
+    pts = df.iloc[:: max(1, len(df) // 19)].head(19)
+    shapes = [poly] + [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}, "properties": {"radius": 5000}}
+        for lat, lon in zip(pts["lat"], pts["lon"])
+    ]
+    many = selection.update(None, shapes, votos_file, df)
+    ops = [selection.OP_UNION] + [list(selection.OPS)[i % 3] for i in range(1, len(shapes))]
+    b.run("selection.update.20_formas_ops", lambda: selection.update(many, shapes, votos_file, df, ops), rows=len(df))
+
+    regions = assign_points(df["lon"].to_numpy(), df["lat"].to_numpy(), setores)
+    b.run("spatial.assign_points.setores", lambda: assign_points(df["lon"].to_numpy(), df["lat"].to_numpy(), setores), rows=len(df))
+    regions = pd.Series(regions, index=df.index)
+    b.run("spatial.region_totals.setores", lambda: region_totals(regions, df, info["setores"]), rows=len(df))
+
+    idx = PointIndex(df["lat"].to_numpy(), df["lon"].to_numpy())
+    q = df.iloc[:: max(1, len(df) // 200)]
+    b.run("nearest.build_index", lambda: PointIndex(df["lat"].to_numpy(), df["lon"].to_numpy()), rows=len(df))
+    b.run("nearest.knn_200x5", lambda: idx.knn(q["lat"], q["lon"], k=5), rows=len(q))
+    b.run("nearest.sum_within_200x5km", lambda: idx.sum_within(q["lat"], q["lon"], 5.0, df["qt_votos"]), rows=len(q))
+    b.run("nearest.voronoi", lambda: _catchments(polling_places(df), []), rows=len(df), repeat=1)
+
+    grid = vote_density_grid(df)
+    b.run("hotspots.vote_density_grid", lambda: vote_density_grid(df), rows=len(df))
+    b.run("hotspots.vote_hotspots", lambda: vote_hotspots(grid), rows=int(grid["density"].size))
+    b.run("hexbin.vote_hexbins", lambda: vote_hexbins(df), rows=len(df))
+
+    b.run("piramide.build", lambda: pyramid.build_pyramid(df), rows=len(df))
+    b.run("piramide.sidecar", lambda: pyramid.read_pyramid_sidecar(votos_file), rows=len(df))
+    return gj, setores, df
+
+
+def bench_map(b: Bench, info: dict[str, Any], gj: dict[str, Any], setores: dict[str, Any], df):
+    from localiza.ui import load_layer_styles, resolve_layer_style
+
+    styles = load_layer_styles()
+    center = [float(df["lat"].mean()), float(df["lon"].mean())]
+    votos_style = resolve_layer_style({"stem": "votos_ce", "filename": "votos_ce.geojson", "geom": "Point", "type": "votos_ce"}, styles)
+    setores_style = resolve_layer_style({"stem": "setores_ce", "filename": "setores_ce.geojson", "geom": "Polygon", "type": "setores_ce"}, styles)
+
+    feats = {"type": "FeatureCollection", "features": select_votos_features(gj, df)}
+    b.run("select_votos_features", lambda: select_votos_features(gj, df), rows=len(df))
+    b.run("map.build_map", lambda: build_map(center=center))
+    b.run("map.add_geojson_layer.votos", lambda: add_geojson_layer(build_map(center=center), "votos_ce", feats, votos_style), rows=len(df), repeat=1)
+    b.run("map.add_geojson_layer.setores", lambda: add_geojson_layer(build_map(center=center), "setores_ce", setores, setores_style), rows=info["setores"], repeat=1)
+    b.run("map.add_points_layer", lambda: add_points_layer(build_map(center=center), "pontos", df, {"graduated": True}), rows=len(df), repeat=1)
+    grid = vote_density_grid(df)
+    b.run("map.add_density_overlay", lambda: add_density_overlay(build_map(center=center), "densidade", grid), rows=len(df))
+    hexbins = vote_hexbins(df)
+    b.run("map.add_hexbin_layer", lambda: add_hexbin_layer(build_map(center=center), "hexágonos", hexbins, {}), rows=len(hexbins["features"]))
+    levels = pyramid.build_pyramid(df)
+    b.run("map.add_pyramid_layer", lambda: add_pyramid_layer(build_map(center=center), "níveis", levels), rows=len(df))
+
+    # modo delta: base inteira uma vez; um filtro (metade das seções) vira máscara + totais
+    # pontos em arrays tipados (fid, lat, lon, raio, votos + campos da dica em dicionário)
+    if b.wanted("map.add_filterable_votes_layer"):
+        m = build_map(center=center)
+        b.run("map.add_filterable_votes_layer", lambda: add_filterable_votes_layer(m, "votos_ce", gj, votos_style), rows=len(df), repeat=1)
+        layer = list(m._children.values())[-1]
+        b.results[-1]["bytes"] = len(layer._template.module.script(layer))
+    if b.wanted("map.delta_update"):
+        half = df["_fid"].to_numpy()[::2]
+        regions = pd.Series(assign_points(df["lon"].to_numpy(), df["lat"].to_numpy(), setores), index=df.index)
+        totals = region_totals(regions, df.iloc[::2], info["setores"])
+
+        def _delta():
+            fg = delta_update({"votos_ce": half}, {"setores_ce": totals})
+            return "".join(c._template.module.script(c) for c in fg._children.values())
+
+        js = b.run("map.delta_update", _delta, rows=len(half))
+        b.results[-1]["bytes"] = len(js)
+
+    # tiles PNG: montagem dos arrays e desenho de um nível inteiro (z10, estado todo)
+    b.run("tiles.votes_raster", lambda: tiles.votes_raster(df, votos_style), rows=len(df))
+    for label, layer in (("votos", tiles.votes_raster(df, votos_style)), ("setores", tiles.RasterLayer.from_geojson(setores, setores_style))):
+        if b.wanted(f"tiles.render.z10.{label}"):
+            groups = layer.tiles(10)
+            b.run(
+                f"tiles.render.z10.{label}",
+                lambda layer=layer, groups=groups: [layer.render(10, x, y, items) for (x, y), items in groups.items()],
+                rows=len(groups), repeat=1,
+            )
+
+    # tiles vetoriais (gerar_tiles.py): corte da base inteira, todos os zooms
+    if b.wanted("mvt.cut_tiles.votos"):
+        n = b.run("mvt.cut_tiles.votos", lambda: sum(1 for _ in vector_tiles.cut_tiles("votos_ce", gj)), rows=len(df), repeat=1)
+        b.results[-1]["tiles"] = n
+
+    if b.wanted("map.render_html"):
+        m = build_map(center=center)
+        add_geojson_layer(m, "votos_ce", feats, votos_style)
+        finalize_map(m)
+        html = b.run("map.render_html", lambda: m.get_root().render(), rows=len(df), repeat=1)
+        b.results[-1]["bytes"] = len(html)
+
+
+def bench_charts(b: Bench, df):
+    for name in CHARTS:
+        fn = getattr(charts, name, None)
+        if fn is None:
+            continue
+        b.run(f"{name}", lambda fn=fn: fn(df), rows=len(df))
+        if b.wanted(f"{name}.spec"):
+            ch = fn(df)
+            if ch is not None:
+                b.run(f"{name}.spec", lambda ch=ch: ch.to_json(), rows=len(df))
+
+
+def bench_page(b: Bench, info: dict[str, Any], timeout: float):
+    if not (b.wanted("render_candidate.cold") or b.wanted("render_candidate.warm")):
+        return
+    from streamlit.testing.v1 import AppTest
+
+    folder = info["candidatos"][0]
+    script = PAGE_SCRIPT.format(root=str(ROOT), data_dir=str(info["data_dir"]), folder=str(folder), votos=str(folder / "votos_ce.geojson"))
+
+    def page():
+        at = AppTest.from_string(script, default_timeout=timeout)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        return at
+
+    # frio: sem cache de processo (mas com o sidecar gravado acima); quente: cache preenchido
+    b.run("render_candidate.cold", page, rows=info["secoes"], setup=cache.clear)
+    b.run("render_candidate.warm", page, rows=info["secoes"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks com dados sintéticos na escala do Ceará")
+    parser.add_argument("--dados", type=Path, help="pasta dos dados sintéticos (padrão: temporária)")
+    parser.add_argument("--saida", type=Path, help="arquivo JSON de resultados (padrão: stdout)")
+    parser.add_argument("--secoes", type=int, default=25_000)
+    parser.add_argument("--candidatos", type=int, default=3)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--apenas", nargs="*", help="prefixos das medições a rodar (ex.: chart_ map.)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="timeout do AppTest em segundos")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="lv_bench_") as tmp:
+        data_dir = args.dados or Path(tmp)
+        t0 = time.perf_counter()
+        info = generate(data_dir, n_candidatos=args.candidatos, n_secoes=args.secoes)
+        print(f"dados sintéticos: {info['secoes']} seções, {info['locais']} locais em {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+        b = Bench(args.repeticoes, args.apenas)
+        bench_imports(b)
+        gj, setores, df = bench_core(b, info)
+        bench_map(b, info, gj, setores, df)
+        bench_charts(b, df)
+        bench_page(b, info, args.timeout)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "secoes": info["secoes"],
+            "locais": info["locais"],
+            "municipios": info["municipios"],
+            "setores": info["setores"],
+            "candidatos": args.candidatos,
+            "repeticoes": args.repeticoes,
+        },
+        "results": b.results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.saida:
+        args.saida.parent.mkdir(parents=True, exist_ok=True)
+        args.saida.write_text(text, encoding="utf-8")
+        print(f"resultados em {args.saida}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Gerador determinístico de dados sintéticos na escala do Ceará.
+
+Produz, numa pasta de saída, a mesma estrutura que o app espera:
+
+    <saida>/data/locais_ce.geojson        locais de votação
+    <saida>/data/setores_ce.geojson       setores censitários (grade de polígonos com renda)
+    <saida>/data/distritos_ce.geojson     polígonos mais grossos (bairros/distritos)
+    <saida>/candidatos/<slug>/votos_ce.geojson          uma feição por seção
+    <saida>/candidatos/<slug>/votos_municipios.geojson  uma feição por município
+
+Mesma semente, mesmos arquivos: os números de commits diferentes são comparáveis.
+
+Uso:
+    python benchmarks/synthetic.py /tmp/lv_bench --candidatos 3 [--secoes 25000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# caixa aproximada do Ceará
+LAT_MIN, LAT_MAX = -7.86, -2.78
+LON_MIN, LON_MAX = -41.42, -37.25
+
+
+def _write(path: Path, feats: list[dict[str, Any]]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": feats}, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def _point(lat: float, lon: float, props: dict[str, Any]) -> dict[str, Any]:
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [round(lon, 7), round(lat, 7)]}, "properties": props}
+
+
+def _grid_polygons(nx: int, ny: int) -> list[tuple[float, float, float, float]]:
+    lons = np.linspace(LON_MIN, LON_MAX, nx + 1)
+    lats = np.linspace(LAT_MIN, LAT_MAX, ny + 1)
+    return [(lons[i], lats[j], lons[i + 1], lats[j + 1]) for j in range(ny) for i in range(nx)]
+
+
+def _rect(x0: float, y0: float, x1: float, y1: float, props: dict[str, Any]) -> dict[str, Any]:
+    ring = [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+    ring = [[round(x, 6), round(y, 6)] for x, y in ring]
+    return {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}, "properties": props}
+
+
+def generate(
+    out_dir: Path,
+    n_candidatos: int = 3,
+    n_secoes: int = 25_000,
+    n_municipios: int = 184,
+    secoes_por_local: int = 5,
+    setores: tuple[int, int] = (120, 100),
+    distritos: tuple[int, int] = (24, 20),
+    seed: int = 2024,
+) -> dict[str, Any]:
+    """Gera os arquivos e devolve um resumo (caminhos e contagens)."""
+    rng = np.random.default_rng(seed)
+    out_dir = Path(out_dir)
+
+    # municípios: centro + peso (um "Fortaleza" bem maior que os demais)
+    mun_lat = rng.uniform(LAT_MIN + 0.2, LAT_MAX - 0.2, n_municipios)
+    mun_lon = rng.uniform(LON_MIN + 0.2, LON_MAX - 0.2, n_municipios)
+    peso = rng.lognormal(0.0, 0.9, n_municipios)
+    peso[0] = peso.sum() * 0.35
+    mun_lat[0], mun_lon[0] = -3.75, -38.53
+    nomes = ["FORTALEZA"] + [f"MUNICIPIO {i:03d}" for i in range(1, n_municipios)]
+
+    # seções por município (>= 1) e locais de votação
+    secoes_mun = np.maximum(1, np.round(peso / peso.sum() * n_secoes)).astype(int)
+    n_locais_mun = np.maximum(1, secoes_mun // secoes_por_local)
+    local_mun = np.repeat(np.arange(n_municipios), n_locais_mun)
+    n_locais = len(local_mun)
+    spread = 0.02 + 0.03 * np.sqrt(peso[local_mun] / peso.max())
+    local_lat = mun_lat[local_mun] + rng.normal(0, 1, n_locais) * spread
+    local_lon = mun_lon[local_mun] + rng.normal(0, 1, n_locais) * spread
+    local_zona = 1 + local_mun % 120
+    local_nr = 1000 + np.arange(n_locais)
+
+    locais = [
+        _point(float(local_lat[i]), float(local_lon[i]), {
+            "Municipio": nomes[local_mun[i]],
+            "CODIGO_UNICO": f"{int(local_zona[i]):04d}-{int(local_nr[i])}",
+            "Local_Votacao": f"ESCOLA SINTETICA {i}",
+            "Bairro": f"BAIRRO {i % 97:02d}",
+            "latitude": float(local_lat[i]),
+            "longitude": float(local_lon[i]),
+        })
+        for i in range(n_locais)
+    ]
+    _write(out_dir / "data" / "locais_ce.geojson", locais)
+
+    # seções distribuídas nos locais do próprio município
+    secao_local = np.concatenate([
+        rng.choice(np.flatnonzero(local_mun == m), size=int(secoes_mun[m]))
+        for m in range(n_municipios)
+    ])
+    n_sec = len(secao_local)
+
+    # setores censitários e distritos (grades)
+    setor_feats = []
+    for k, (x0, y0, x1, y1) in enumerate(_grid_polygons(*setores)):
+        pop = int(rng.integers(50, 1500))
+        dom = max(1, pop // 3)
+        renda = float(np.round(rng.lognormal(7.5, 0.6), 2))
+        setor_feats.append(_rect(x0, y0, x1, y1, {
+            "CD_SETOR": f"23{k:013d}", "v0001": pop, "v0002": dom, "v0003": dom,
+            "tabela_rendaV06004": f"{renda:.0f}", "renda_media": renda,
+        }))
+    _write(out_dir / "data" / "setores_ce.geojson", setor_feats)
+    dist_feats = [
+        _rect(x0, y0, x1, y1, {"ID": k, "NM_DISTRIT": f"DISTRITO {k:03d}"})
+        for k, (x0, y0, x1, y1) in enumerate(_grid_polygons(*distritos))
+    ]
+    _write(out_dir / "data" / "distritos_ce.geojson", dist_feats)
+
+    # candidatos: cada um forte em alguns municípios
+    cand_dirs = []
+    for c in range(n_candidatos):
+        slug = f"candidato_sintetico_{c:02d}"
+        nr = 10000 + c
+        nome = f"CANDIDATO SINTETICO {c:02d}"
+        afinidade = rng.gamma(0.6, 1.0, n_municipios)
+        votos = rng.poisson(2 + 25 * afinidade[local_mun[secao_local]])
+        feats = []
+        for s in range(n_sec):
+            li = secao_local[s]
+            feats.append(_point(float(local_lat[li]), float(local_lon[li]), {
+                "NM_MUNICIPIO": nomes[local_mun[li]],
+                "NR_ZONA": int(local_zona[li]),
+                "NR_SECAO": s + 1,
+                "NR_VOTAVEL": nr,
+                "NM_VOTAVEL": nome,
+                "QT_VOTOS": int(votos[s]),
+                "NR_LOCAL_VOTACAO": int(local_nr[li]),
+                "NM_LOCAL_VOTACAO": f"ESCOLA SINTETICA {li}",
+                "DS_LOCAL_VOTACAO_ENDERECO": f"RUA {li}, {s % 50}",
+                "Latitude": float(local_lat[li]),
+                "Longitude": float(local_lon[li]),
+            }))
+        folder = out_dir / "candidatos" / slug
+        _write(folder / "votos_ce.geojson", feats)
+
+        tot = np.bincount(local_mun[secao_local], weights=votos, minlength=n_municipios)
+        _write(folder / "votos_municipios.geojson", [
+            _point(float(mun_lat[m]), float(mun_lon[m]), {
+                "NR_VOTAVEL": nr, "NM_VOTAVEL": nome, "NM_MUNICIPIO": nomes[m],
+                "QT_VOTOS": int(tot[m]), "LATITUDE": float(mun_lat[m]), "LONGITUDE": float(mun_lon[m]),
+            })
+            for m in range(n_municipios)
+        ])
+        cand_dirs.append(folder)
+
+    return {
+        "dir": out_dir,
+        "data_dir": out_dir / "data",
+        "candidatos": cand_dirs,
+        "secoes": int(n_sec),
+        "locais": int(n_locais),
+        "municipios": n_municipios,
+        "setores": len(setor_feats),
+        "distritos": len(dist_feats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos na escala do Ceará")
+    parser.add_argument("saida", type=Path)
+    parser.add_argument("--candidatos", type=int, default=3)
+    parser.add_argument("--secoes", type=int, default=25_000)
+    parser.add_argument("--semente", type=int, default=2024)
+    args = parser.parse_args()
+    info = generate(args.saida, n_candidatos=args.candidatos, n_secoes=args.secoes, seed=args.semente)
+    print({k: (str(v) if isinstance(v, Path) else v) for k, v in info.items() if k != "candidatos"})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Geração dos relatórios por município (PDF, opcionalmente PNG) de um candidato
+
+Para cada base de votos do candidato e cada município dela, monta uma página
+A4 com os números do município, o mapa dos pontos e os gráficos de top locais
+e faixas de votos, em relatorios/<candidato>/<base>/<municipio>-<hash>.pdf.
+Os municípios são divididos entre processos (um por CPU, por padrão).
+
+Relatórios cujo (candidato, versão da base, município) não mudou desde a
+última geração ficam como estão.
+
+Os gráficos são convertidos pelo vl-convert-python (requirements.txt). Sem
+ele, as barras são desenhadas direto com Pillow (mais simples, mesmos dados).
+
+Uso:
+    python gerar_relatorios.py CANDIDATO [--base votos_municipios] [--municipios "Sobral" "Crato"]
+                               [--workers 4] [--png] [--saida PASTA] [--forcar]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from localiza.config import REPORTS_DIR
+from localiza.report import ReportJob, build_report, municipio_totals
+from localiza.ui import discover_candidates, load_candidate_module
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gera relatórios por município (PDF/PNG) de um candidato",
+        epilog="Gráficos via vl-convert-python; sem ele instalado, as barras são desenhadas com Pillow.",
+    )
+    parser.add_argument("candidato", help="pasta em candidatos/")
+    parser.add_argument("--base", nargs="*", help="bases de votos (nome do arquivo sem .geojson; padrão: todas)")
+    parser.add_argument("--municipios", nargs="*", help="só estes municípios (padrão: todos da base)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--png", action="store_true", help="grava também um PNG de cada página")
+    parser.add_argument("--saida", type=Path, default=REPORTS_DIR, help="pasta de saída (padrão: relatorios/)")
+    parser.add_argument("--forcar", action="store_true", help="refaz os relatórios, mesmo sem mudanças")
+    args = parser.parse_args()
+
+    py = next((p for p in discover_candidates() if p.parent.name == args.candidato), None)
+    if py is None:
+        print(f"❌ Candidato não encontrado: {args.candidato}")
+        sys.exit(1)
+    module = load_candidate_module(py)
+    title = getattr(module, "CANDIDATE_TITLE", args.candidato.replace("_", " "))
+    bases = [Path(v) for v in getattr(module, "VOTOS_FILES", []) or [] if Path(v).exists()]
+    if args.base:
+        bases = [b for b in bases if b.stem in args.base]
+    if not bases:
+        print("Nenhuma base de votos encontrada.")
+        return
+
+    jobs = []
+    for votos_file in bases:
+        # do município com mais votos para o com menos: os maiores saem primeiro
+        nomes = list(municipio_totals(votos_file).index)
+        if args.municipios:
+            nomes = [n for n in nomes if n in args.municipios]
+        jobs += [ReportJob(args.candidato, title, votos_file, n, args.saida, args.png, args.forcar) for n in nomes]
+    if not jobs:
+        print("Nenhum município encontrado.")
+        return
+
+    workers = max(1, min(args.workers, len(jobs)))
+    print(f"📄 {len(jobs)} relatório(s) de {title} em {args.saida} ({workers} processo(s))")
+    t0 = time.perf_counter()
+    feitos = cache = erros = 0
+
+    def report(job, result=None, error=None):
+        nonlocal feitos, cache, erros
+        nome = f"{job.votos_file.stem}/{job.municipio}"
+        if error is not None:
+            erros += 1
+            print(f"❌ {nome}: {error}")
+        elif result["cached"]:
+            cache += 1
+        else:
+            feitos += 1
+            print(f"✅ {nome}: {result['path'].name}")
+
+    if workers == 1:
+        for job in jobs:
+            try:
+                report(job, build_report(job))
+            except Exception as e:
+                report(job, error=e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(build_report, job): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    report(futures[future], future.result())
+                except Exception as e:
+                    report(futures[future], error=e)
+
+    print(
+        f"\nConcluído em {time.perf_counter() - t0:.1f}s: {feitos} relatório(s) gerado(s)"
+        + (f", {cache} sem mudanças" if cache else "")
+        + (f" ({erros} erro(s))" if erros else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
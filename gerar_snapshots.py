@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Geração dos mapas estáticos (HTML) de cada candidato
+
+Para cada candidato em candidatos/ e cada base de votos dele, monta o mapa
+completo (camadas comuns e do candidato, coropléticos, votos com o filtro
+rápido) e grava um HTML compacto em snapshots/<candidato>/<base>.html. Os
+dados das camadas GeoJSON ficam em snapshots/assets/, um arquivo por conteúdo:
+camadas comuns vão uma vez só para todos os candidatos. A pasta pode ser
+publicada em qualquer host de arquivos estáticos (sem Python); a lista das
+páginas fica em snapshots/index.html.
+
+Só são refeitas as páginas cujos arquivos de entrada mudaram (conteúdo do
+módulo do candidato, da base, das camadas e dos estilos), conforme o
+snapshots/manifest.json da geração anterior.
+
+Uso:
+    python gerar_snapshots.py [CANDIDATOS...] [--saida PASTA] [--forcar]
+
+Sem argumentos, processa todos os candidatos.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from localiza.config import BASE_DIR, SNAPSHOTS_DIR
+from localiza.snapshot import candidate_pages, inputs_digest, page_inputs, prune, read_manifest, render_page, write_index, write_manifest
+from localiza.ui import discover_candidates, load_candidate_module
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera mapas HTML estáticos por candidato e base de votos")
+    parser.add_argument("candidatos", nargs="*", help="pastas em candidatos/ (padrão: todas)")
+    parser.add_argument("--saida", type=Path, default=SNAPSHOTS_DIR, help="pasta de saída (padrão: snapshots/)")
+    parser.add_argument("--forcar", action="store_true", help="refaz todas as páginas, mesmo sem mudanças")
+    args = parser.parse_args()
+
+    out_dir: Path = args.saida
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(out_dir)
+    anteriores = dict(manifest["paginas"])
+
+    pages = []
+    for py in discover_candidates():
+        if args.candidatos and py.parent.name not in args.candidatos:
+            continue
+        try:
+            pages += candidate_pages(py, load_candidate_module(py))
+        except Exception as e:
+            print(f"❌ {py.parent.name}: {e}")
+    if not pages:
+        print("Nenhum candidato com base de votos encontrado.")
+        return
+
+    print(f"🗺️ {len(pages)} página(s) em {out_dir}")
+    t0 = time.perf_counter()
+    feitas = erros = 0
+    vistas = set()
+    for page in pages:
+        vistas.add(page.rel)
+        digest = inputs_digest(page_inputs(page), BASE_DIR)
+        antiga = anteriores.get(page.rel)
+        if not args.forcar and antiga and antiga.get("entradas") == digest and (out_dir / page.rel).exists():
+            print(f"⚪ {page.rel}: sem mudanças")
+            continue
+        t1 = time.perf_counter()
+        try:
+            entry = render_page(page, out_dir)
+        except Exception as e:
+            erros += 1
+            print(f"❌ {page.rel}: {e}")
+            continue
+        manifest["paginas"][page.rel] = {**entry, "entradas": digest}
+        feitas += 1
+        print(f"✅ {page.rel}: {entry['bytes'] / 1e6:.2f} MB, {len(entry['assets'])} asset(s) ({time.perf_counter() - t1:.1f}s)")
+
+    if not args.candidatos:
+        # candidatos ou bases que sumiram
+        for rel in set(manifest["paginas"]) - vistas:
+            del manifest["paginas"][rel]
+    write_manifest(out_dir, manifest)
+    write_index(out_dir, manifest)
+    removidos = prune(out_dir, manifest)
+
+    print(
+        f"\nConcluído em {time.perf_counter() - t0:.1f}s: {feitas} página(s) refeita(s)"
+        + (f", {removidos} arquivo(s) antigo(s) removido(s)" if removidos else "")
+        + (f" ({erros} erro(s))" if erros else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
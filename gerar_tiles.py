@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Geração dos tiles vetoriais (MVT) das camadas do mapa
+
+Corta cada GeoJSON de data/ e das pastas de candidatos em tiles z/x/y e grava
+um MBTiles por camada em tiles/. Na primeira vez que a página usa a camada, os
+tiles são copiados para static/mvt/ e o mapa passa a carregá-los com o
+Leaflet.VectorGrid (só o que está na tela). Se o conteúdo do GeoJSON mudar, a
+camada volta a ir inteira até este script rodar de novo (mudar só o mtime, como
+num clone, não invalida). Os arquivos são processados em paralelo, um processo
+por núcleo. No Railway roda no build (railway.toml); em outro deploy, rode
+antes de subir o app.
+
+Uso:
+    python gerar_tiles.py [ARQUIVOS_OU_PASTAS...] [--min-feicoes N] [--workers N]
+
+Sem argumentos, processa data/ e todas as pastas de candidatos.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from localiza.config import CANDIDATOS_DIR, COMMON_DATA_DIR
+from localiza.io_geo import read_geojson
+from localiza.vector_tiles import build_mbtiles
+
+
+def find_layers(alvos: list[Path], min_feicoes: int) -> list[Path]:
+    arquivos = []
+    for alvo in alvos:
+        if alvo.is_dir():
+            arquivos += sorted(alvo.glob("*.geojson"))
+        elif alvo.suffix.lower() == ".geojson":
+            arquivos.append(alvo)
+    if min_feicoes:
+        arquivos = [f for f in arquivos if len(read_geojson(f).get("features") or []) >= min_feicoes]
+    return arquivos
+
+
+def build_one(path: Path) -> tuple[Path, dict | None, float]:
+    t0 = time.perf_counter()
+    meta = build_mbtiles(path)
+    return path, meta, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera tiles vetoriais (MBTiles) das camadas GeoJSON")
+    parser.add_argument("alvos", type=Path, nargs="*", help="arquivos .geojson ou pastas (padrão: data/ e candidatos/*/)")
+    parser.add_argument("--min-feicoes", type=int, default=0, help="ignora camadas com menos feições que isso")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processos em paralelo")
+    args = parser.parse_args()
+
+    alvos = args.alvos or [COMMON_DATA_DIR] + sorted(p for p in CANDIDATOS_DIR.iterdir() if p.is_dir())
+    camadas = find_layers(alvos, args.min_feicoes)
+    if not camadas:
+        print("Nenhuma camada encontrada.")
+        return
+
+    print(f"🧩 {len(camadas)} camada(s), {args.workers} processo(s)")
+    t0 = time.perf_counter()
+    erros = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        futuros = {ex.submit(build_one, f): f for f in camadas}
+        for fut in as_completed(futuros):
+            f = futuros[fut]
+            try:
+                _, meta, dt = fut.result()
+            except Exception as e:
+                erros += 1
+                print(f"❌ {f}: {e}")
+                continue
+            if meta is None:
+                print(f"⚪ {f}: sem geometrias")
+            else:
+                print(f"✅ {f}: {meta['lv_tiles']} tiles, zoom {meta['minzoom']}-{meta['maxzoom']} ({dt:.1f}s)")
+    print(f"\nConcluído em {time.perf_counter() - t0:.1f}s" + (f" ({erros} erro(s))" if erros else ""))
+    if erros:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
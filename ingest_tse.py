@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Gera as bases de votos de todos os candidatos a partir do CSV do TSE
+
+Lê o arquivo de votação por seção (votacao_secao_<ano>_<UF>.csv ou o .zip
+oficial) numa única passada, liga cada seção ao seu local de votação pelas
+coordenadas dos arquivos locais_*.geojson e grava, para cada candidato:
+    candidatos/<slug>/votos_<uf>.geojson      (um ponto por local de votação)
+    candidatos/<slug>/votos_municipios.geojson (um ponto por município)
+mais os sidecars .parquet lidos direto pelo app.
+
+O CSV estadual traz todos os cargos e turnos: use --cargo (e --turno, se houver
+segundo turno) para ficar com um só. Votos de legenda (número de 2 dígitos nos
+cargos proporcionais) não viram candidato; o total aparece no fim.
+
+Uso:
+    python ingest_tse.py votacao_secao_2024_CE.csv --cargo "Vereador" [--turno 1] [--criar]
+
+Para testar sem baixar nada (gera um CSV sintético com os locais do repositório):
+    python ingest_tse.py /tmp/sintetico.csv --sintetico 30
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from add_candidato import create_candidate, slugify
+from localiza.config import CANDIDATOS_DIR, COMMON_DATA_DIR
+from localiza.tse import build_locais_index, split_tse_csv, write_synthetic_tse_csv
+
+
+def default_locais() -> list[Path]:
+    return sorted(COMMON_DATA_DIR.glob("locais_*.geojson")) + sorted(CANDIDATOS_DIR.glob("*/locais_*.geojson"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Divide o CSV de votação por seção do TSE em bases por candidato")
+    parser.add_argument("csv", type=Path, help="votacao_secao_<ano>_<UF>.csv (ou .zip)")
+    parser.add_argument("--locais", type=Path, nargs="*", help="arquivos locais_*.geojson (padrão: todos do repositório)")
+    parser.add_argument("--destino", type=Path, default=CANDIDATOS_DIR, help="pasta dos candidatos (padrão: candidatos/)")
+    parser.add_argument("--cargo", help='DS_CARGO ou CD_CARGO, ex.: "Deputado Estadual"')
+    parser.add_argument("--turno", type=int, help="NR_TURNO")
+    parser.add_argument("--base", help="nome da base gerada (votos_<base>.geojson); padrão: UF")
+    parser.add_argument("--criar", action="store_true", help="cria página/módulo para candidatos novos")
+    parser.add_argument("--sintetico", type=int, metavar="N", help="apenas gera um CSV sintético com N candidatos")
+    args = parser.parse_args()
+
+    locais_files = args.locais or default_locais()
+
+    if args.sintetico:
+        index = build_locais_index(locais_files)
+        locais = [(z, l, str(loc.props.get("Municipio") or "FORTALEZA")) for (z, l), loc in sorted(index.items())]
+        n = write_synthetic_tse_csv(args.csv, locais, n_candidatos=args.sintetico)
+        print(f"✅ CSV sintético: {args.csv} ({n} linhas, {len(locais)} locais)")
+        return
+
+    if not args.csv.exists():
+        print(f"❌ Arquivo não encontrado: {args.csv}")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    try:
+        stats = split_tse_csv(
+            args.csv,
+            locais_files,
+            args.destino,
+            slug_fn=slugify,
+            cargo=args.cargo,
+            turno=args.turno,
+            base_name=args.base,
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    dt = max(time.perf_counter() - t0, 1e-9)
+
+    for slug, info in sorted(stats["candidatos"].items()):
+        print(f"✅ {slug}: {info['locais']} locais, {info['votos']} votos")
+        if args.criar and not (args.destino / slug / f"{slug}.py").exists():
+            create_candidate(slug.replace("_", " ").title(), candidatos_root=args.destino)
+
+    print(
+        f"\n🏁 {stats['linhas']:,} linhas em {dt:.1f}s ({stats['linhas'] / dt:,.0f} linhas/s) | "
+        f"{len(stats['candidatos'])} candidatos"
+    )
+    if stats["legenda"]:
+        print(f"ℹ️  {stats['legenda']:,} votos de legenda (partido) não entram em nenhum candidato")
+    if stats["locais_sem_coordenada"]:
+        print(
+            f"⚠️  {stats['locais_sem_coordenada']} locais sem coordenada em locais_*.geojson "
+            f"({stats['sem_local']:,} votos ficaram de fora)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Ingestão em lote de bases de votos (vários candidatos de uma vez)
+
+Para cada arquivo votos_*.geojson: valida, normaliza, corrige coordenadas,
+grava o GeoJSON limpo em candidatos/<slug>/ e gera o sidecar binário (.parquet)
+que o app lê direto, sem reprocessar o GeoJSON. Os arquivos são processados
+em paralelo, um processo por núcleo.
+
+Uso:
+    python ingest_votos.py PASTA_BRUTA [--destino candidatos] [--workers N] [--criar]
+
+A PASTA_BRUTA deve ter uma subpasta por candidato (nome = slug):
+    bruto/joao_silva/votos_fortaleza.geojson
+    bruto/maria_santos/votos_municipios.geojson
+
+Para apenas regenerar os sidecars dos candidatos já existentes:
+    python ingest_votos.py candidatos
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from localiza.config import CANDIDATOS_DIR
+from localiza.ingest import ingest_votos_file
+
+
+def find_jobs(origem: Path, destino: Path) -> list[tuple[str, Path, Path]]:
+    """Lista (slug, arquivo bruto, pasta de destino)."""
+    jobs = []
+    pastas = [origem] if list(origem.glob("votos_*.geojson")) else sorted(p for p in origem.iterdir() if p.is_dir())
+    for pasta in pastas:
+        for f in sorted(pasta.glob("votos_*.geojson")):
+            jobs.append((pasta.name, f, destino / pasta.name))
+    return jobs
+
+
+def ensure_candidates(slugs: set[str], destino: Path, criar: bool) -> set[str]:
+    """Retorna os slugs sem pasta de candidato (criando-as se `criar`)."""
+    faltando = {s for s in slugs if not (destino / s).is_dir()}
+    if faltando and criar:
+        from add_candidato import create_candidate
+
+        for slug in sorted(faltando):
+            create_candidate(slug.replace("_", " ").title(), candidatos_root=destino)
+        faltando = {s for s in faltando if not (destino / s).is_dir()}
+    return faltando
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestão em lote de bases votos_*.geojson")
+    parser.add_argument("origem", type=Path, help="pasta com uma subpasta por candidato")
+    parser.add_argument("--destino", type=Path, default=CANDIDATOS_DIR, help="pasta dos candidatos (padrão: candidatos/)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processos em paralelo")
+    parser.add_argument("--criar", action="store_true", help="cria candidatos ausentes com add_candidato.py")
+    args = parser.parse_args()
+
+    if not args.origem.is_dir():
+        print(f"❌ Pasta não encontrada: {args.origem}")
+        sys.exit(1)
+
+    jobs = find_jobs(args.origem, args.destino)
+    if not jobs:
+        print("Nenhum arquivo votos_*.geojson encontrado.")
+        sys.exit(1)
+
+    faltando = ensure_candidates({slug for slug, _, _ in jobs}, args.destino, args.criar)
+    if faltando:
+        print(f"⚠️  Candidatos sem pasta (use --criar): {', '.join(sorted(faltando))}")
+        jobs = [j for j in jobs if j[0] not in faltando]
+
+    print(f"📦 {len(jobs)} arquivo(s), {args.workers} processo(s)\n")
+    t0 = time.perf_counter()
+    ok = erros = feicoes = total_bytes = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(ingest_votos_file, src, dst): slug for slug, src, dst in jobs}
+        for fut in as_completed(futures):
+            slug = futures[fut]
+            r = fut.result()
+            nome = f"{slug}/{Path(r['arquivo']).name}"
+            if r["erro"]:
+                erros += 1
+                print(f"❌ {nome}: {r['erro']}")
+                continue
+            ok += 1
+            feicoes += r["feicoes"]
+            total_bytes += r["bytes"]
+            seg = max(r["segundos"], 1e-9)
+            print(
+                f"✅ {nome}: {r['feicoes']} feições, {r['bytes'] / 1e6:.2f} MB em {seg:.2f}s "
+                f"({r['feicoes'] / seg:,.0f} feições/s, {r['bytes'] / 1e6 / seg:.1f} MB/s)"
+                f" | corrigidas {r['corrigidas']}, descartadas {r['descartadas']}"
+            )
+
+    dt = max(time.perf_counter() - t0, 1e-9)
+    print(
+        f"\n🏁 {ok} ok, {erros} com erro | {feicoes} feições, {total_bytes / 1e6:.1f} MB em {dt:.1f}s "
+        f"({feicoes / dt:,.0f} feições/s)"
+    )
+    sys.exit(1 if erros else 0)
+
+
+if __name__ == "__main__":
+    main()
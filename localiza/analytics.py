@@ -1,22 +1,131 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
+from . import cache
+from .io_geo import file_digest, read_geojson
+from .lazy import lazy_import
+from .profiling import stage, timed
+from .pyramid import write_pyramid_sidecar
+from .schema import normalize_geojson, _flatten_coords
+from .spatial import PROP_LABEL, PROP_VOTES
+
+# só carregam no primeiro uso (ver lazy.py)
+shapely = lazy_import("shapely")
+scipy_spatial = lazy_import("scipy.spatial")
+
 try:
-    from shapely.geometry import shape as shp_shape
-    from shapely.geometry import Point
+    import pyarrow as pa
+    import pyarrow.parquet as pq
 except Exception:
-    shp_shape = None
-    Point = None
+    pa = None
+    pq = None
+
+# versão do formato do sidecar binário; mude ao alterar as colunas de build_votos_df
+SIDECAR_FORMAT = 2
+# colunas de dicionários (GeoJSON original de cada ponto): vão como texto JSON
+SIDECAR_JSON_COLUMNS = ("properties", "geometry")
+_SIDECAR_META = b"localiza"
+
+
+def votos_sidecar_path(votos_file: Path) -> Path:
+    """Sidecar binário (DataFrame já normalizado, Parquet) ao lado do GeoJSON de votos."""
+    return Path(votos_file).with_suffix(".parquet")
+
+
+def write_votos_sidecar(votos_file: Path, df: pd.DataFrame) -> Path | None:
+    """Grava o DataFrame normalizado de `votos_file` (e a pirâmide de totais), amarrado ao hash do GeoJSON.
+
+    Sem pyarrow não há sidecar da base: o app lê o GeoJSON.
+    """
+    digest = file_digest(votos_file)
+    write_pyramid_sidecar(votos_file, df, digest)
+    if pq is None:
+        return None
+    out = votos_sidecar_path(votos_file)
+    flat = df.assign(**{
+        c: [json.dumps(v, ensure_ascii=False, separators=(",", ":")) for v in df[c]]
+        for c in SIDECAR_JSON_COLUMNS if c in df.columns
+    })
+    table = pa.Table.from_pandas(flat)
+    meta = {"format": SIDECAR_FORMAT, "source_digest": digest}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _SIDECAR_META: json.dumps(meta).encode()})
+    tmp = out.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp)
+    tmp.replace(out)
+    return out
+
+
+def read_votos_sidecar(votos_file: Path) -> pd.DataFrame | None:
+    """DataFrame do sidecar, ou None se ele não existir, estiver desatualizado ou não puder ser lido."""
+    side = votos_sidecar_path(votos_file)
+    if pq is None or not side.exists():
+        return None
+    try:
+        meta = json.loads((pq.read_schema(side).metadata or {}).get(_SIDECAR_META, b"{}"))
+        if meta.get("format") != SIDECAR_FORMAT or meta.get("source_digest") != file_digest(votos_file):
+            return None
+        df = pq.read_table(side).to_pandas()
+        for c in SIDECAR_JSON_COLUMNS:
+            if c in df.columns:
+                # uma chamada só do decodificador para a coluna inteira
+                df[c] = json.loads("[" + ",".join(df[c].fillna("null")) + "]")
+    except Exception:
+        return None
+    return df
 
-from .io_geo import read_geojson
-from .schema import normalize_geojson, _flatten_coords
 
 def load_votos_df(votos_file: Path) -> pd.DataFrame:
-    gj = read_geojson(votos_file)
+    """Base de votos normalizada. Usa o sidecar binário quando ele está em dia."""
+    with stage("load_votos_df.sidecar") as rec:
+        df = read_votos_sidecar(votos_file)
+        if df is not None:
+            rec["rows"] = len(df)
+    if df is not None:
+        return df
+    with stage("load_votos_df.json") as rec:
+        gj = read_geojson(votos_file)
+        rec["rows"] = len(gj.get("features") or [])
+        rec["bytes"] = Path(votos_file).stat().st_size if gj else None
+    with stage("load_votos_df.normalizar") as rec:
+        df = build_votos_df(gj)
+        rec["rows"] = len(df)
+    return df
+
+
+def fix_latlon_arrays(lat: np.ndarray, lon: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Versão vetorizada de `schema.fix_latlon`: inválidos viram NaN."""
+    lat = np.array(lat, dtype=float, copy=True)
+    lon = np.array(lon, dtype=float, copy=True)
+
+    def _rescale(v: np.ndarray, limit: float):
+        for _ in range(12):
+            over = np.abs(v) > limit
+            if not over.any():
+                break
+            v[over] /= 10.0
+
+    with np.errstate(invalid="ignore"):
+        _rescale(lat, 90)
+        _rescale(lon, 180)
+        swap = ((np.abs(lat) > 90) & (np.abs(lon) <= 90)) | ((np.abs(lon) > 180) & (np.abs(lat) <= 180))
+        if swap.any():
+            lat[swap], lon[swap] = lon[swap], lat[swap]
+            _rescale(lat, 90)
+            _rescale(lon, 180)
+        bad = ~((np.abs(lat) <= 90) & (np.abs(lon) <= 180))
+    lat[bad] = np.nan
+    lon[bad] = np.nan
+    return lat, lon
+
+
+def build_votos_df(gj: dict[str, Any]) -> pd.DataFrame:
+    """Normaliza um GeoJSON de votos para o DataFrame usado pela UI."""
     if not gj:
         return pd.DataFrame()
 
@@ -40,17 +149,9 @@ def load_votos_df(votos_file: Path) -> pd.DataFrame:
     # Extrair colunas originais do GeoJSON das properties
     if "properties" in df.columns:
         # Extrair NM_MUNICIPIO
-        nm_municipio_list = []
-        nm_local_votacao_list = []
-        
-        for _, row in df.iterrows():
-            props = row.get("properties", {})
-            if isinstance(props, dict):
-                nm_municipio_list.append(props.get("NM_MUNICIPIO", ""))
-                nm_local_votacao_list.append(props.get("NM_LOCAL_VOTACAO", ""))
-            else:
-                nm_municipio_list.append("")
-                nm_local_votacao_list.append("")
+        props_list = [p if isinstance(p, dict) else {} for p in df["properties"]]
+        nm_municipio_list = [p.get("NM_MUNICIPIO", "") for p in props_list]
+        nm_local_votacao_list = [p.get("NM_LOCAL_VOTACAO", "") for p in props_list]
         
         # Criar colunas se houver dados
         if any(nm_municipio_list):
@@ -61,9 +162,30 @@ def load_votos_df(votos_file: Path) -> pd.DataFrame:
             df["NM_LOCAL_VOTACAO"] = nm_local_votacao_list
             df["NM_LOCAL_VOTACAO"] = df["NM_LOCAL_VOTACAO"].replace("", pd.NA).fillna(df["local_votacao"])
 
+    df["lat"], df["lon"] = fix_latlon_arrays(
+        pd.to_numeric(df["lat"], errors="coerce"), pd.to_numeric(df["lon"], errors="coerce")
+    )
     df = df.dropna(subset=["lat", "lon"])
     return df
 
+def load_votos_df_cached(votos_file: Path) -> pd.DataFrame:
+    """`load_votos_df` compartilhado entre sessões. Não altere o DataFrame devolvido."""
+    return cache.get_or_build("votos_df", votos_file, lambda: load_votos_df(votos_file))
+
+def select_votos_features(votos_gj: dict[str, Any], df_points: pd.DataFrame) -> list[dict[str, Any]]:
+    """Recorta as features do GeoJSON de votos que aparecem em `df_points` (via `_fid`)."""
+    feats = (votos_gj or {}).get("features") or []
+    if df_points.empty or "_fid" not in df_points.columns:
+        return []
+    out = []
+    for i in sorted(set(df_points["_fid"].astype(int))):
+        if 0 <= i < len(feats):
+            geom = feats[i].get("geometry") or {}
+            if geom.get("type") == "Point":
+                out.append(feats[i])
+    return out
+
+@timed(rows=lambda df_points, *a, **k: len(df_points))
 def filter_points_within_polygon(df_points: pd.DataFrame, poly_geojson: dict[str, Any]):
     if df_points.empty or not poly_geojson:
         return df_points
@@ -73,7 +195,7 @@ def filter_points_within_polygon(df_points: pd.DataFrame, poly_geojson: dict[str
     if gtype not in ("polygon", "multipolygon"):
         return df_points
 
-    if shp_shape is None or Point is None:
+    if shapely is None:
         coords = geom.get("coordinates")
         pts = _flatten_coords(coords)
         if not pts:
@@ -90,17 +212,395 @@ def filter_points_within_polygon(df_points: pd.DataFrame, poly_geojson: dict[str
         ]
 
     try:
-        poly = shp_shape(geom)
+        poly = shapely.geometry.shape(geom)
     except Exception:
         return df_points
 
-    inside_mask = []
-    for _, r in df_points.iterrows():
-        try:
-            inside_mask.append(poly.contains(Point(float(r["lon"]), float(r["lat"]))))
-        except Exception:
-            inside_mask.append(False)
+    lon = pd.to_numeric(df_points["lon"], errors="coerce").to_numpy(dtype=float)
+    lat = pd.to_numeric(df_points["lat"], errors="coerce").to_numpy(dtype=float)
+    inside = shapely.contains_xy(poly, lon, lat)
+    return df_points[inside]
 
-    if not inside_mask:
-        return df_points
-    return df_points[pd.Series(inside_mask, index=df_points.index)]
+
+# ---- hot-spots: densidade de votos em grade (KDE via FFT) e aglomerados
+
+M_PER_DEG = 111_320.0
+
+
+def _gaussian_blur_fft(grid: np.ndarray, sigma_y: float, sigma_x: float) -> np.ndarray:
+    """Convolução gaussiana por FFT (sigma em células). Borda com zeros, sem dar a volta."""
+    ny, nx = grid.shape
+    py, px = int(np.ceil(3 * sigma_y)), int(np.ceil(3 * sigma_x))
+    shape = (ny + 2 * py, nx + 2 * px)
+    padded = np.zeros(shape)
+    padded[py:py + ny, px:px + nx] = grid
+    # transformada da gaussiana é gaussiana: aplica direto no domínio da frequência
+    fy = np.fft.fftfreq(shape[0])[:, None]
+    fx = np.fft.rfftfreq(shape[1])[None, :]
+    kernel = np.exp(-2 * np.pi ** 2 * ((sigma_y * fy) ** 2 + (sigma_x * fx) ** 2))
+    out = np.fft.irfft2(np.fft.rfft2(padded) * kernel, s=shape)
+    return np.clip(out[py:py + ny, px:px + nx], 0, None)
+
+
+def vote_density_grid(
+    df_points: pd.DataFrame,
+    bandwidth_m: float | None = None,
+    max_cells: int = 256,
+    weight_col: str = "qt_votos",
+) -> dict[str, Any] | None:
+    """Densidade de votos (votos/km²) numa grade regular cobrindo os pontos.
+
+    A grade tem no máximo `max_cells` células no lado maior, então o custo não
+    depende do número de pontos além do `bincount`. `bandwidth_m` padrão: 3 células
+    (ou 300 m, o que for maior).
+    """
+    if df_points.empty:
+        return None
+    lat = pd.to_numeric(df_points["lat"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(df_points["lon"], errors="coerce").to_numpy(dtype=float)
+    w = pd.to_numeric(df_points[weight_col], errors="coerce").fillna(0).to_numpy(dtype=float)
+    ok = np.isfinite(lat) & np.isfinite(lon) & (w > 0)
+    if not ok.any():
+        return None
+    lat, lon, w = lat[ok], lon[ok], w[ok]
+
+    kx = M_PER_DEG * np.cos(np.radians(float(np.mean(lat))))
+    span_m = max((lat.max() - lat.min()) * M_PER_DEG, (lon.max() - lon.min()) * kx, 1000.0)
+    cell_m = span_m / (max_cells * 0.8)
+    bw = float(bandwidth_m or max(3 * cell_m, 300.0))
+    cell_m = max(cell_m, bw / 6)
+    pad_m = 3 * bw
+    lat0, lat1 = lat.min() - pad_m / M_PER_DEG, lat.max() + pad_m / M_PER_DEG
+    lon0, lon1 = lon.min() - pad_m / kx, lon.max() + pad_m / kx
+    ny = max(1, int(np.ceil((lat1 - lat0) * M_PER_DEG / cell_m)))
+    nx = max(1, int(np.ceil((lon1 - lon0) * kx / cell_m)))
+
+    # linha 0 = norte (origem "upper" do ImageOverlay)
+    iy = np.clip(((lat1 - lat) * M_PER_DEG / cell_m).astype(int), 0, ny - 1)
+    ix = np.clip(((lon - lon0) * kx / cell_m).astype(int), 0, nx - 1)
+    flat = iy * nx + ix
+    votes = np.bincount(flat, weights=w, minlength=ny * nx).reshape(ny, nx)
+    places = np.bincount(flat, minlength=ny * nx).reshape(ny, nx)
+
+    sigma = bw / cell_m
+    density = _gaussian_blur_fft(votes, sigma, sigma) / (cell_m * cell_m / 1e6)
+    return {
+        "density": density,
+        "votes": votes,
+        "places": places,
+        "bounds": [[lat1 - ny * cell_m / M_PER_DEG, lon0], [lat1, lon0 + nx * cell_m / kx]],
+        "cell_m": cell_m,
+        "bandwidth_m": bw,
+    }
+
+
+def _label_components(mask: np.ndarray) -> np.ndarray:
+    """Componentes conexos (vizinhança de 8) das células True; 0 = fora."""
+    ny, nx = mask.shape
+    idx = np.flatnonzero(mask.ravel())
+    labels = np.zeros(ny * nx, dtype=np.int64)
+    if not len(idx):
+        return labels.reshape(ny, nx)
+    pos = np.full(ny * nx, -1, dtype=np.int64)
+    pos[idx] = np.arange(len(idx))
+    y, x = np.divmod(idx, nx)
+    edges_a, edges_b = [], []
+    for dy, dx in ((0, 1), (1, -1), (1, 0), (1, 1)):
+        yy, xx = y + dy, x + dx
+        ok = (yy < ny) & (xx >= 0) & (xx < nx)
+        nb = pos[yy[ok] * nx + xx[ok]]
+        has = nb >= 0
+        edges_a.append(np.flatnonzero(ok)[has])
+        edges_b.append(nb[has])
+    a = np.concatenate(edges_a)
+    b = np.concatenate(edges_b)
+    # propagação do menor rótulo com salto de ponteiros (union-find vetorizado)
+    comp = np.arange(len(idx))
+    while True:
+        m = np.minimum(comp[a], comp[b])
+        new = comp.copy()
+        np.minimum.at(new, a, m)
+        np.minimum.at(new, b, m)
+        new = new[new]
+        if np.array_equal(new, comp):
+            break
+        comp = new
+    _, dense = np.unique(comp, return_inverse=True)
+    labels[idx] = dense + 1
+    return labels.reshape(ny, nx)
+
+
+def vote_hotspots(grid: dict[str, Any], quantile: float = 0.9, min_votes: float = 0) -> pd.DataFrame:
+    """Aglomerados de votos: regiões conexas da grade com densidade acima do quantil.
+
+    O quantil é tomado entre as células com densidade relevante (> 1% do máximo).
+    Cada aglomerado traz votos, locais, centro ponderado e caixa envolvente.
+    """
+    cols = ["rank", "votos", "locais", "lat", "lon", "lat_min", "lon_min", "lat_max", "lon_max", "densidade_max"]
+    if not grid:
+        return pd.DataFrame(columns=cols)
+    density, votes, places = grid["density"], grid["votes"], grid["places"]
+    peak = float(density.max())
+    relevant = density[density > peak * 0.01]
+    if peak <= 0 or not len(relevant):
+        return pd.DataFrame(columns=cols)
+    labels = _label_components(density >= np.quantile(relevant, quantile))
+    n = int(labels.max())
+    if n == 0:
+        return pd.DataFrame(columns=cols)
+
+    ny, nx = labels.shape
+    (lat_s, lon_w), (lat_n, lon_e) = grid["bounds"]
+    cy = lat_n - (np.arange(ny) + 0.5) * (lat_n - lat_s) / ny
+    cx = lon_w + (np.arange(nx) + 0.5) * (lon_e - lon_w) / nx
+    lab = labels.ravel()
+    v = votes.ravel()
+    yy = np.repeat(cy, nx)
+    xx = np.tile(cx, ny)
+    tot = np.bincount(lab, weights=v, minlength=n + 1)[1:]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = pd.DataFrame({
+            "votos": tot,
+            "locais": np.bincount(lab, weights=places.ravel(), minlength=n + 1)[1:].astype(int),
+            "lat": np.bincount(lab, weights=v * yy, minlength=n + 1)[1:] / tot,
+            "lon": np.bincount(lab, weights=v * xx, minlength=n + 1)[1:] / tot,
+        })
+    sel = lab > 0
+    g = pd.DataFrame({"l": lab[sel] - 1, "y": yy[sel], "x": xx[sel], "d": density.ravel()[sel]}).groupby("l")
+    out["lat_min"], out["lat_max"] = g["y"].min().to_numpy(), g["y"].max().to_numpy()
+    out["lon_min"], out["lon_max"] = g["x"].min().to_numpy(), g["x"].max().to_numpy()
+    out["densidade_max"] = g["d"].max().to_numpy()
+    out = out[(out["votos"] > max(min_votes, 0)) & out["lat"].notna()]
+    out = out.sort_values("votos", ascending=False).reset_index(drop=True)
+    out.insert(0, "rank", np.arange(1, len(out) + 1))
+    return out[cols]
+
+
+_HEX_ANGLES = np.radians(30 + 60 * np.arange(7))  # vértices (hexágono "em pé"), fechando o anel
+
+
+@timed(rows=lambda df_points, *a, **k: len(df_points))
+def vote_hexbins(
+    df_points: pd.DataFrame,
+    cells: int = 60,
+    cell_m: float | None = None,
+    weight_col: str = "qt_votos",
+) -> dict[str, Any] | None:
+    """Votos agregados numa grade hexagonal, um polígono (GeoJSON) por célula ocupada.
+
+    `cell_m` é a largura do hexágono em metros; sem ela, cabem `cells` hexágonos
+    no lado maior da extensão dos pontos. O número de feições é limitado pelas
+    células, não pelos pontos. Propriedades: votos (`PROP_VOTES`), locais e votos/km².
+    """
+    if df_points.empty:
+        return None
+    lat = pd.to_numeric(df_points["lat"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(df_points["lon"], errors="coerce").to_numpy(dtype=float)
+    w = pd.to_numeric(df_points[weight_col], errors="coerce").fillna(0).to_numpy(dtype=float)
+    ok = np.isfinite(lat) & np.isfinite(lon) & (w > 0)
+    if not ok.any():
+        return None
+    lat, lon, w = lat[ok], lon[ok], w[ok]
+
+    lat0, lon0 = float(lat.min()), float(lon.min())
+    kx = M_PER_DEG * np.cos(np.radians(float(np.mean(lat))))
+    span_m = max((lat.max() - lat0) * M_PER_DEG, (lon.max() - lon0) * kx, 1000.0)
+    width = float(cell_m or span_m / max(int(cells), 1))
+    size = width / np.sqrt(3)  # raio (centro ao vértice)
+    x = (lon - lon0) * kx
+    y = (lat - lat0) * M_PER_DEG
+
+    # coordenadas axiais fracionárias -> arredondamento cúbico para o hexágono que contém o ponto
+    qf = (np.sqrt(3) / 3 * x - y / 3) / size
+    rf = (2 / 3 * y) / size
+    sf = -qf - rf
+    q, r, s = np.rint(qf), np.rint(rf), np.rint(sf)
+    dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q = np.where(fix_q, -r - s, q)
+    r = np.where(fix_r, -q - s, r)
+
+    cell, inv = np.unique(np.column_stack([q, r]).astype(np.int64), axis=0, return_inverse=True)
+    inv = inv.ravel()
+    votes = np.bincount(inv, weights=w, minlength=len(cell))
+    places = np.bincount(inv, minlength=len(cell))
+    cq, cr = cell[:, 0].astype(float), cell[:, 1].astype(float)
+    cx = size * np.sqrt(3) * (cq + cr / 2)
+    cy = size * 1.5 * cr
+    ring_lon = lon0 + (cx[:, None] + size * np.cos(_HEX_ANGLES)) / kx
+    ring_lat = lat0 + (cy[:, None] + size * np.sin(_HEX_ANGLES)) / M_PER_DEG
+    area_km2 = 1.5 * np.sqrt(3) * size * size / 1e6
+
+    features = []
+    for i in np.argsort(-votes, kind="stable"):
+        features.append({
+            "type": "Feature",
+            "properties": {
+                PROP_VOTES: int(round(votes[i])),
+                PROP_LABEL: f"{int(places[i])} local(is)",
+                "locais": int(places[i]),
+                "votos_km2": round(float(votes[i]) / area_km2, 1),
+            },
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [np.column_stack([ring_lon[i], ring_lat[i]]).round(6).tolist()],
+            },
+        })
+    return {"type": "FeatureCollection", "features": features, "cell_m": width}
+
+
+# ---- vizinhança: k mais próximos, raio e áreas de influência (Voronoi)
+
+EARTH_R_KM = 6371.0088
+
+
+def _xyz(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    la, lo = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(la) * np.cos(lo), np.cos(la) * np.sin(lo), np.sin(la)]) * EARTH_R_KM
+
+
+def _chord(km: float) -> float:
+    return 2 * EARTH_R_KM * np.sin(min(km, np.pi * EARTH_R_KM) / (2 * EARTH_R_KM))
+
+
+def _arc(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_R_KM * np.arcsin(np.clip(np.asarray(chord) / (2 * EARTH_R_KM), 0, 1))
+
+
+class PointIndex:
+    """Índice espacial de pontos (KD-tree em coordenadas 3D; distâncias em km na esfera).
+
+    Com scipy, as consultas usam `cKDTree`; sem ele, caem numa varredura
+    vetorizada em blocos (mesmo resultado, mais lenta em bases grandes).
+    """
+
+    def __init__(self, lat, lon):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.xyz = _xyz(self.lat, self.lon)
+        self.tree = scipy_spatial.cKDTree(self.xyz) if scipy_spatial is not None and len(self.xyz) else None
+
+    def __len__(self) -> int:
+        return len(self.xyz)
+
+    @classmethod
+    def from_geojson(cls, gj: dict[str, Any]) -> "PointIndex":
+        lat, lon = [], []
+        for ft in (gj or {}).get("features") or []:
+            geom = ft.get("geometry") or {}
+            coords = geom.get("coordinates") or []
+            if geom.get("type") == "Point" and len(coords) >= 2:
+                lon.append(coords[0])
+                lat.append(coords[1])
+            else:
+                lat.append(np.nan)
+                lon.append(np.nan)
+        return cls(*fix_latlon_arrays(np.array(lat, dtype=float), np.array(lon, dtype=float)))
+
+    def knn(self, lat, lon, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """(distâncias em km, índices) dos `k` pontos mais próximos de cada consulta, shape (n, k)."""
+        q = _xyz(np.atleast_1d(lat), np.atleast_1d(lon))
+        k = max(1, min(int(k), len(self)))
+        if not len(self):
+            return np.empty((len(q), 0)), np.empty((len(q), 0), dtype=int)
+        if self.tree is not None:
+            d, i = self.tree.query(q, k=k)
+            d, i = d.reshape(len(q), k), i.reshape(len(q), k)
+        else:
+            d = np.sqrt(((q[:, None, :] - self.xyz[None, :, :]) ** 2).sum(-1))
+            i = np.argsort(d, axis=1)[:, :k]
+            d = np.take_along_axis(d, i, axis=1)
+        return _arc(d), i
+
+    def within(self, lat, lon, radius_km: float) -> list[np.ndarray]:
+        """Índices dos pontos a até `radius_km` de cada consulta."""
+        q = _xyz(np.atleast_1d(lat), np.atleast_1d(lon))
+        r = _chord(radius_km)
+        if self.tree is not None:
+            return [np.asarray(ix, dtype=int) for ix in self.tree.query_ball_point(q, r)]
+        out = []
+        for row in q:
+            d2 = ((self.xyz - row) ** 2).sum(1)
+            out.append(np.flatnonzero(d2 <= r * r))
+        return out
+
+    def sum_within(self, lat, lon, radius_km: float, weights) -> tuple[np.ndarray, np.ndarray]:
+        """(soma dos pesos, quantidade de pontos) a até `radius_km` de cada consulta."""
+        w = np.asarray(weights, dtype=float)
+        hits = self.within(lat, lon, radius_km)
+        lens = np.fromiter((len(ix) for ix in hits), dtype=int, count=len(hits))
+        flat = np.concatenate(hits) if lens.sum() else np.empty(0, dtype=int)
+        owner = np.repeat(np.arange(len(hits)), lens)
+        sums = np.bincount(owner, weights=w[flat], minlength=len(hits))
+        counts = np.bincount(owner, weights=(w[flat] > 0), minlength=len(hits)).astype(int)
+        return sums, counts
+
+
+def votos_point_index(votos_file: Path, df: pd.DataFrame) -> PointIndex:
+    """Índice dos pontos da base (posições = linhas de `df`), compartilhado entre sessões."""
+    return cache.get_or_build("indice_votos", votos_file, lambda: PointIndex(df["lat"].to_numpy(), df["lon"].to_numpy()))
+
+
+def layer_point_index(layer_path: Path, gj: dict[str, Any]) -> PointIndex:
+    """Índice de uma camada de pontos (líderes, locais...), na ordem das feições."""
+    return cache.get_or_build("indice_camada", layer_path, lambda: PointIndex.from_geojson(gj))
+
+
+def polling_places(df_points: pd.DataFrame) -> pd.DataFrame:
+    """Locais distintos da base (mesma coordenada = mesmo local) com o total de votos."""
+    local_col = "NM_LOCAL_VOTACAO" if "NM_LOCAL_VOTACAO" in df_points.columns else "local_votacao"
+    d = df_points.assign(_lat=df_points["lat"].round(6), _lon=df_points["lon"].round(6))
+    return (
+        d.groupby(["_lat", "_lon"], as_index=False, sort=False)
+        .agg(local=(local_col, "first"), votos=("qt_votos", "sum"), secoes=("qt_votos", "size"))
+        .rename(columns={"_lat": "lat", "_lon": "lon"})
+    )
+
+
+def _catchments(places: pd.DataFrame, clip_geojsons: list[dict[str, Any]]) -> dict[str, Any]:
+    pts = shapely.points(places["lon"].to_numpy(), places["lat"].to_numpy())
+    polys = [shapely.geometry.shape(ft["geometry"]) for gj in clip_geojsons for ft in (gj.get("features") or []) if ft.get("geometry")]
+    polys = [p for p in polys if p.geom_type in ("Polygon", "MultiPolygon")]
+    if polys:
+        area = shapely.union_all(shapely.make_valid(np.array(polys, dtype=object)))
+    else:
+        area = shapely.multipoints(pts).envelope.buffer(0.02)
+    cells = shapely.voronoi_polygons(shapely.multipoints(pts), extend_to=area, ordered=True)
+    cells = shapely.intersection(np.array(cells.geoms, dtype=object), area)
+    # ~1 m de precisão: menos dígitos no GeoJSON enviado ao navegador
+    cells = shapely.set_precision(cells, 1e-5)
+
+    kx = np.cos(np.radians(float(places["lat"].mean()))) * M_PER_DEG
+    feats = []
+    for i, (cell, r) in enumerate(zip(cells, places.itertuples(index=False))):
+        if cell is None or cell.is_empty:
+            continue
+        feats.append({
+            "type": "Feature",
+            "geometry": shapely.geometry.mapping(cell),
+            "properties": {
+                "local": str(r.local),
+                "votos": int(r.votos),
+                "secoes": int(r.secoes),
+                "area_km2": round(float(cell.area) * kx * M_PER_DEG / 1e6, 2),
+            },
+        })
+    return {"type": "FeatureCollection", "features": feats}
+
+
+def voronoi_catchments(votos_file: Path, df: pd.DataFrame, clip_layers: list[dict[str, Any]]) -> dict[str, Any] | None:
+    """Área de influência de cada local da base (Voronoi), recortada pelos limites dados.
+
+    `clip_layers` são camadas de `discover_layers_geojson` (municípios, distritos...);
+    sem elas, recorta pela caixa dos pontos. Calculado uma vez por base e limites.
+    """
+    if shapely is None or df.empty:
+        return None
+    places = polling_places(df)
+    if len(places) < 2:
+        return None
+    extra = tuple(cache.file_key(layer["path"]) for layer in clip_layers)
+    return cache.get_or_build(
+        "voronoi", votos_file, lambda: _catchments(places, [layer["geojson"] for layer in clip_layers]), *extra
+    )
@@ -0,0 +1,124 @@
+"""Cache compartilhado pelo processo inteiro.
+
+Todas as sessões do Streamlit rodam no mesmo processo, então bases de votos e
+camadas lidas uma vez ficam disponíveis para qualquer visitante. A chave inclui
+mtime e tamanho do arquivo: se o arquivo mudar em disco, a entrada é refeita.
+
+Cada entrada guarda seu tamanho estimado; com um teto de memória configurado
+(ver `memory.py`), as entradas menos usadas recentemente são descartadas quando
+o total passa do teto do cache.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, TypeVar
+
+from . import memory
+
+T = TypeVar("T")
+
+_lock = threading.RLock()
+_store: "OrderedDict[tuple, Any]" = OrderedDict()
+_sizes: dict[tuple, int] = {}
+_building: dict[tuple, threading.Lock] = {}
+
+
+def file_key(path: Path) -> tuple:
+    """Identifica a versão de um arquivo (caminho absoluto, mtime, tamanho)."""
+    p = Path(path)
+    try:
+        st_ = p.stat()
+        return (str(p.resolve()), st_.st_mtime_ns, st_.st_size)
+    except OSError:
+        return (str(p), None, None)
+
+
+def get_or_build(kind: str, path: Path, builder: Callable[[], T], *extra: Hashable) -> T:
+    """Devolve o artefato `kind` de `path` do cache, construindo se preciso.
+
+    Construções concorrentes da mesma chave (ex.: warm-up e um visitante ao
+    mesmo tempo) esperam uma pela outra em vez de repetir o trabalho.
+    """
+    key = (kind, file_key(path), *extra)
+    with _lock:
+        if key in _store:
+            _store.move_to_end(key)
+            return _store[key]
+        build_lock = _building.setdefault(key, threading.Lock())
+
+    with build_lock:
+        with _lock:
+            if key in _store:
+                _store.move_to_end(key)
+                return _store[key]
+        try:
+            value = builder()
+            nbytes = memory.sizeof(value)
+            with _lock:
+                # descarta versões antigas do mesmo arquivo/artefato
+                for old in [k for k in _store if k[0] == kind and k[1][0] == key[1][0] and k[2:] == key[2:]]:
+                    _drop(old)
+                _store[key] = value
+                _sizes[key] = nbytes
+        finally:
+            # também quando `builder` falha: quem estava esperando tenta de novo
+            with _lock:
+                _building.pop(key, None)
+        budget = memory.cache_budget_bytes()
+        if budget:
+            evict_to(budget, keep=key)
+        return value
+
+
+def _drop(key: tuple) -> None:
+    del _store[key]
+    _sizes.pop(key, None)
+
+
+def evict_to(max_bytes: int, keep: tuple | None = None) -> int:
+    """Descarta as entradas menos usadas até o total caber em `max_bytes`.
+
+    `keep` nunca é descartada (a entrada que acabou de ser construída).
+    Devolve quantas entradas saíram.
+    """
+    evicted = 0
+    with _lock:
+        total = sum(_sizes.values())
+        for k in list(_store):
+            if total <= max_bytes:
+                break
+            if k == keep:
+                continue
+            total -= _sizes.get(k, 0)
+            _drop(k)
+            evicted += 1
+    return evicted
+
+
+def clear(kind: str | None = None) -> None:
+    with _lock:
+        if kind is None:
+            _store.clear()
+            _sizes.clear()
+            return
+        for k in [k for k in _store if k[0] == kind]:
+            _drop(k)
+
+
+def entries() -> list[tuple[tuple, Any]]:
+    """Cópia das entradas atuais (mais antiga primeiro)."""
+    with _lock:
+        return list(_store.items())
+
+
+def sizes() -> list[tuple[str, int]]:
+    """(tipo, bytes) de cada entrada, mais antiga primeiro."""
+    with _lock:
+        return [(k[0], _sizes.get(k, 0)) for k in _store]
+
+
+def total_bytes() -> int:
+    with _lock:
+        return sum(_sizes.values())
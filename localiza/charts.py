@@ -1,8 +1,17 @@
 from __future__ import annotations
 
-import altair as alt
 import pandas as pd
 
+from .lazy import lazy_import
+from .profiling import timed
+
+# o altair só carrega no primeiro gráfico (ver lazy.py)
+alt = lazy_import("altair")
+
+def _rows(df, *args, **kwargs) -> int:
+    return len(df)
+
+@timed(rows=_rows)
 def chart_top_municipios(df: pd.DataFrame, top_n: int = 15):
     """Gráfico dos top municípios com mais votos"""
     col = "Município" if "Município" in df.columns else "municipio"
@@ -26,6 +35,7 @@ def chart_top_municipios(df: pd.DataFrame, top_n: int = 15):
         .properties(height=400)
     )
 
+@timed(rows=_rows)
 def chart_bottom_municipios(df: pd.DataFrame, bottom_n: int = 15):
     """Gráfico dos municípios com menos votos"""
     col = "Município" if "Município" in df.columns else "municipio"
@@ -49,6 +59,7 @@ def chart_bottom_municipios(df: pd.DataFrame, bottom_n: int = 15):
         .properties(height=400)
     )
 
+@timed(rows=_rows)
 def chart_top_locais(df: pd.DataFrame, top_n: int = 15):
     # Detectar coluna de local
     local_col = "NM_LOCAL_VOTACAO" if "NM_LOCAL_VOTACAO" in df.columns else "local_votacao"
@@ -73,6 +84,7 @@ def chart_top_locais(df: pd.DataFrame, top_n: int = 15):
         .properties(height=400)
     )
 
+@timed(rows=_rows)
 def chart_bottom_locais(df: pd.DataFrame, bottom_n: int = 15):
     # Detectar coluna de local
     local_col = "NM_LOCAL_VOTACAO" if "NM_LOCAL_VOTACAO" in df.columns else "local_votacao"
@@ -97,6 +109,7 @@ def chart_bottom_locais(df: pd.DataFrame, bottom_n: int = 15):
         .properties(height=400)
     )
 
+@timed(rows=_rows)
 def chart_top_bairros(df: pd.DataFrame, top_n: int = 13):
     col = "Bairro/Distrito" if "Bairro/Distrito" in df.columns else "bairro"
     by_b = (
@@ -119,6 +132,7 @@ def chart_top_bairros(df: pd.DataFrame, top_n: int = 13):
         .properties(height=340)
     )
 
+@timed(rows=_rows)
 def chart_hist_votos(df: pd.DataFrame):
     # se existir coluna 'secao' ou 'zona' no futuro, dá pra trocar.
     if "qt_votos" not in df.columns:
@@ -140,6 +154,7 @@ def chart_hist_votos(df: pd.DataFrame):
         .properties(height=240)
     )
 
+@timed(rows=_rows)
 def chart_concentracao_votos(df: pd.DataFrame):
     """Gráfico de concentração de votos (Curva de Pareto) - mostra quantos locais concentram X% dos votos"""
     local_col = "NM_LOCAL_VOTACAO" if "NM_LOCAL_VOTACAO" in df.columns else "local_votacao"
@@ -178,6 +193,7 @@ def chart_concentracao_votos(df: pd.DataFrame):
     
     return (area + line + rule).properties(height=300)
 
+@timed(rows=_rows)
 def chart_votos_por_zona(df: pd.DataFrame):
     """Gráfico de barras com votos totais e média por zona eleitoral"""
     if "NR_ZONA" not in df.columns:
@@ -212,6 +228,7 @@ def chart_votos_por_zona(df: pd.DataFrame):
     
     return alt.layer(bars, line).resolve_scale(y="independent").properties(height=350)
 
+@timed(rows=_rows)
 def chart_dispersao_geografica(df: pd.DataFrame):
     """Gráfico de dispersão geográfica com tamanho proporcional aos votos"""
     if "lat" not in df.columns or "lon" not in df.columns:
@@ -245,3 +262,58 @@ def chart_dispersao_geografica(df: pd.DataFrame):
         .properties(height=400)
         .configure_view(strokeWidth=0)
     )
+
+@timed(rows=_rows)
+def chart_votos_por_decil_renda(decis: pd.DataFrame):
+    """Votos por mil habitantes em cada decil de renda dos setores (ver income.income_stats)"""
+    if decis is None or decis.empty or decis["votos"].sum() == 0:
+        return None
+    d = decis.copy()
+    d["faixa"] = "D" + d["decil"].astype(int).astype(str)
+    order = [f"D{i}" for i in range(1, 11)]
+    return (
+        alt.Chart(d)
+        .mark_bar(color="#16a085")
+        .encode(
+            x=alt.X("faixa:N", sort=order, title="Decil de renda do setor (D1 = mais pobre)"),
+            y=alt.Y("votos_mil_hab:Q", title="Votos por mil habitantes"),
+            tooltip=[
+                alt.Tooltip("faixa:N", title="Decil"),
+                alt.Tooltip("renda_min:Q", title="Renda de", format=",.0f"),
+                alt.Tooltip("renda_max:Q", title="Renda até", format=",.0f"),
+                alt.Tooltip("votos:Q", title="Votos", format=",.0f"),
+                alt.Tooltip("pct_votos:Q", title="% dos votos", format=".1f"),
+                alt.Tooltip("votos_cem_dom:Q", title="Votos por 100 domicílios", format=".1f"),
+                alt.Tooltip("setores:Q", title="Setores"),
+            ],
+        )
+        .properties(height=300)
+    )
+
+@timed(rows=_rows)
+def chart_renda_vs_votos(setores: pd.DataFrame):
+    """Dispersão renda média x votos por mil habitantes, um ponto por setor"""
+    if setores is None or setores.empty:
+        return None
+    d = setores[(setores["votos"] > 0) & setores["renda"].notna() & setores["votos_mil_hab"].notna()]
+    if d.empty:
+        return None
+    d = d[["setor", "distrito", "renda", "populacao", "votos", "votos_mil_hab"]]
+    pts = (
+        alt.Chart(d)
+        .mark_circle(opacity=0.6, color="#8e44ad")
+        .encode(
+            x=alt.X("renda:Q", title="Renda média do setor (R$)", scale=alt.Scale(zero=False)),
+            y=alt.Y("votos_mil_hab:Q", title="Votos por mil habitantes"),
+            size=alt.Size("populacao:Q", title="População", scale=alt.Scale(range=[20, 400])),
+            tooltip=[
+                alt.Tooltip("setor:N", title="Setor"),
+                alt.Tooltip("distrito:N", title="Distrito"),
+                alt.Tooltip("renda:Q", title="Renda média", format=",.0f"),
+                alt.Tooltip("votos:Q", title="Votos", format=",.0f"),
+                alt.Tooltip("votos_mil_hab:Q", title="Votos/mil hab.", format=".1f"),
+            ],
+        )
+    )
+    trend = pts.transform_regression("renda", "votos_mil_hab").mark_line(color="#e74c3c", strokeDash=[5, 5])
+    return (pts + trend).properties(height=300)
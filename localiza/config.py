@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 APP_NAME = "Localiza Votos"
@@ -15,3 +16,68 @@ ICONS_DIR = COMMON_DATA_DIR / "icons"
 DEFAULT_MAP_HEIGHT = 720
 DEFAULT_MAP_WIDTH = 1200
 
+
+# threads usadas no pré-carregamento das bases na subida do servidor
+WARMUP_MAX_WORKERS = 4
+# quanto cada chamada do healthcheck espera pelo warm-up (abaixo dos 60 s do Streamlit)
+WARMUP_HEALTHCHECK_WAIT = 45
+
+# threads que calculam os gráficos da página (compartilhadas entre as sessões)
+CHART_MAX_WORKERS = 4
+
+# exportação dos dados filtrados (ver export.py): gerada no clique, em blocos, e
+# guardada em disco por recorte (fora do que o servidor publica)
+EXPORTS_DIR = BASE_DIR / "exports"
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_MAX_FILES = 40
+
+# mapas estáticos por candidato (gerar_snapshots.py), para qualquer host de arquivos
+SNAPSHOTS_DIR = BASE_DIR / "snapshots"
+
+# relatórios por município para impressão (gerar_relatorios.py)
+REPORTS_DIR = BASE_DIR / "relatorios"
+REPORT_DPI = 150
+
+# ferramentas de admin (ex.: tempos por etapa) aparecem com ?admin=<token>
+ADMIN_TOKEN = os.environ.get("LOCALIZA_ADMIN_TOKEN", "")
+
+# teto de memória do processo em MB; 0 = 80% do limite do container, se houver
+MEMORY_BUDGET_MB = int(os.environ.get("LOCALIZA_MEMORY_BUDGET_MB", "0") or 0)
+
+# parte do teto que o cache compartilhado pode ocupar; o resto fica para as sessões
+CACHE_BUDGET_FRACTION = 0.5
+
+# desenho do mapa: "folium" (Leaflet, padrão) ou "deck" (WebGL via pydeck, ver map_deck.py);
+# sem pydeck instalado, "deck" cai no folium
+MAP_BACKEND = os.environ.get("LOCALIZA_MAP_BACKEND", "folium").strip().lower()
+
+# folium: o mapa sem filtro vai uma vez por sessão e cada filtro só troca as camadas que dependem
+# dele (st_folium `feature_group_to_add`), sem recarregar o mapa; "0" volta a redesenhar tudo
+MAP_DELTA_UPDATES = os.environ.get("LOCALIZA_MAP_DELTA", "1").strip().lower() not in ("0", "off", "false")
+
+# camadas densas como tiles PNG desenhados no servidor (ver tiles.py):
+# "auto" = a partir de RASTER_MIN_FEATURES feições, "on" = sempre, "off" = nunca
+RASTER_TILES = os.environ.get("LOCALIZA_RASTER_TILES", "auto").strip().lower()
+RASTER_MIN_FEATURES = 5000
+# servido pelo Streamlit em /app/static/tiles (server.enableStaticServing)
+RASTER_TILES_DIR = BASE_DIR / "static" / "tiles"
+RASTER_MIN_ZOOM = 5
+RASTER_MAX_ZOOM = 14
+# acima disso, por nível de zoom, o Leaflet amplia os tiles do nível anterior
+RASTER_MAX_TILES = 3000
+# tiles desenhados antes de o mapa sair; o restante fica para uma thread
+RASTER_SYNC_TILES = 600
+# conjuntos de tiles (camada x estilo) mantidos em disco
+RASTER_MAX_SETS = 60
+# conjuntos usados há menos que isso (s) não são apagados: podem estar no mapa de outra sessão
+RASTER_KEEP_RECENT_S = 15 * 60
+
+# tiles vetoriais (MVT) gerados por `gerar_tiles.py`: o MBTiles fica fora do que é
+# servido; a cópia em .pbf vai para static/mvt/<camada>/<hash>/
+MVT_MBTILES_DIR = BASE_DIR / "tiles"
+MVT_STATIC_DIR = BASE_DIR / "static" / "mvt"
+MVT_EXTENT = 4096
+MVT_MIN_ZOOM = 5
+MVT_MAX_ZOOM = 14
+MVT_MAX_TILES = 4000
+MVT_MAX_POINTS = 2000
@@ -0,0 +1,216 @@
+"""Exportação dos dados filtrados: CSV, GeoJSON e GeoParquet.
+
+Nada é gerado na execução da página: o botão de download recebe uma função
+(`st.download_button(data=...)`) que só roda no clique, fora do script. O
+arquivo é escrito em blocos de `EXPORT_CHUNK_ROWS` linhas direto no disco
+(sem montar o texto inteiro em memória) e fica em `EXPORTS_DIR` com o hash da
+versão da base, do formato e das linhas exportadas no nome: o mesmo recorte
+sai pronto do disco para qualquer sessão. Os arquivos usados há mais tempo,
+além de `EXPORT_MAX_FILES`, são apagados.
+
+A entrega ao navegador não é em blocos: o Streamlit lê todo o conteúdo que a
+função devolve (bytes ou arquivo aberto) para o seu armazenamento de mídia em
+memória e o serve de lá, então o arquivo inteiro passa pela memória uma vez
+por clique.
+
+GeoParquet precisa de pyarrow; sem ele, o formato não aparece.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+from . import cache
+from .config import EXPORT_CHUNK_ROWS, EXPORT_MAX_FILES, EXPORTS_DIR
+from .profiling import stage
+
+# colunas normalizadas (schema.normalize_feature + build_votos_df), nesta ordem;
+# as cópias com rótulo da UI, `properties` e `geometry` ficam de fora
+EXPORT_COLUMNS = (
+    "id", "tipo", "nome", "local_votacao", "NM_LOCAL_VOTACAO", "endereco", "bairro", "distrito",
+    "municipio", "NM_MUNICIPIO", "qt_votos", "lat", "lon",
+)
+
+# formato -> (rótulo, extensão, mime)
+FORMATS = {
+    "csv": ("CSV", "csv", "text/csv"),
+    "geojson": ("GeoJSON", "geojson", "application/geo+json"),
+    "parquet": ("GeoParquet", "parquet", "application/vnd.apache.parquet"),
+}
+
+_locks_guard = threading.Lock()
+_locks: dict[str, threading.Lock] = {}
+
+
+def available_formats() -> list[str]:
+    return [f for f in FORMATS if f != "parquet" or pa is not None]
+
+
+def export_columns(df: pd.DataFrame) -> list[str]:
+    return [c for c in EXPORT_COLUMNS if c in df.columns]
+
+
+def export_key(votos_file: Path, df_sub: pd.DataFrame, fmt: str) -> str:
+    """Hash do recorte: versão do arquivo, formato e linhas (índice de `df_sub`)."""
+    h = hashlib.blake2b(digest_size=12)
+    h.update(repr(cache.file_key(votos_file)).encode())
+    h.update(fmt.encode())
+    h.update(np.ascontiguousarray(df_sub.index.to_numpy(dtype=np.int64)).tobytes())
+    return h.hexdigest()
+
+
+def file_name(votos_file: Path | None, fmt: str) -> str:
+    return f"localizavotos_{votos_file.stem if votos_file else 'dados'}.{FORMATS[fmt][1]}"
+
+
+def _chunks(df: pd.DataFrame):
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        yield df.iloc[start:start + EXPORT_CHUNK_ROWS]
+
+
+def _write_csv(df: pd.DataFrame, path: Path) -> None:
+    cols = export_columns(df)
+    # utf-8-sig: o BOM sai uma vez no início e o Excel reconhece os acentos
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        if not len(df):
+            pd.DataFrame(columns=cols).to_csv(f, index=False)
+        for i, chunk in enumerate(_chunks(df)):
+            chunk[cols].to_csv(f, index=False, header=i == 0)
+
+
+def _write_geojson(df: pd.DataFrame, path: Path) -> None:
+    cols = [c for c in export_columns(df) if c not in ("lat", "lon")]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        first = True
+        for chunk in _chunks(df):
+            props = chunk[cols].astype(object).where(chunk[cols].notna(), None).to_dict("records")
+            lines = []
+            for p, lon, lat in zip(props, chunk["lon"].to_numpy(), chunk["lat"].to_numpy()):
+                lines.append(json.dumps({
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
+                    "properties": p,
+                }, ensure_ascii=False))
+            if lines:
+                f.write(("" if first else ",\n") + ",\n".join(lines))
+                first = False
+        f.write("\n]}\n")
+
+
+def _wkb_points(lon: np.ndarray, lat: np.ndarray) -> list[bytes]:
+    """Pontos em WKB (little-endian), sem shapely: 21 bytes por ponto."""
+    rec = np.empty(len(lon), dtype=[("order", "u1"), ("kind", "<u4"), ("x", "<f8"), ("y", "<f8")])
+    rec["order"] = 1
+    rec["kind"] = 1
+    rec["x"] = lon
+    rec["y"] = lat
+    raw = rec.tobytes()
+    return [raw[i:i + 21] for i in range(0, len(raw), 21)]
+
+
+def _write_parquet(df: pd.DataFrame, path: Path) -> None:
+    cols = export_columns(df)
+    geo = {
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Point"]}},
+    }
+    props_schema = None
+    writer = None
+    try:
+        for chunk in _chunks(df) if len(df) else [df]:
+            # o esquema do primeiro bloco vale para os demais (colunas vazias não mudam de tipo)
+            table = pa.Table.from_pandas(chunk[cols], schema=props_schema, preserve_index=False)
+            props_schema = props_schema or table.schema
+            wkb = _wkb_points(chunk["lon"].to_numpy(), chunk["lat"].to_numpy())
+            table = table.append_column("geometry", pa.array(wkb, type=pa.binary()))
+            if writer is None:
+                meta = {**(table.schema.metadata or {}), b"geo": json.dumps(geo).encode()}
+                writer = pq.ParquetWriter(path, table.schema.with_metadata(meta))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+_WRITERS: dict[str, Callable[[pd.DataFrame, Path], None]] = {
+    "csv": _write_csv,
+    "geojson": _write_geojson,
+    "parquet": _write_parquet,
+}
+
+
+def _lock_for(key: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def export_path(votos_file: Path, df_sub: pd.DataFrame, fmt: str, root: Path = EXPORTS_DIR) -> Path:
+    """Arquivo do recorte no formato pedido, gerado se ainda não estiver em disco."""
+    if fmt not in available_formats():
+        raise ValueError(f"Formato de exportação indisponível: {fmt}")
+    key = export_key(votos_file, df_sub, fmt)
+    final = root / f"{key}.{FORMATS[fmt][1]}"
+    with _lock_for(key):
+        if final.exists():
+            os.utime(final)
+            return final
+        root.mkdir(parents=True, exist_ok=True)
+        tmp = root / f".{key}.{os.getpid()}.{threading.get_ident()}"
+        with stage(f"exportar.{fmt}", rows=len(df_sub)) as rec:
+            try:
+                _WRITERS[fmt](df_sub, tmp)
+                rec["bytes"] = tmp.stat().st_size
+                os.replace(tmp, final)
+            finally:
+                tmp.unlink(missing_ok=True)
+    prune(root)
+    return final
+
+
+def export_bytes(votos_file: Path, df_sub: pd.DataFrame, fmt: str) -> bytes:
+    """Conteúdo para o `st.download_button` (chamado só no clique).
+
+    Bytes, e não o arquivo aberto: o Streamlit leria o arquivo inteiro do mesmo
+    jeito e não fecharia o handle.
+    """
+    return export_path(votos_file, df_sub, fmt).read_bytes()
+
+
+def prune(root: Path = EXPORTS_DIR, keep: int = EXPORT_MAX_FILES) -> int:
+    """Apaga as exportações usadas há mais tempo além das `keep` mais recentes."""
+    files: list[tuple[float, Path]] = []
+    for path in root.glob("*.*"):
+        if path.name.startswith("."):
+            continue
+        try:
+            files.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    files.sort(reverse=True)
+    for _t, path in files[keep:]:
+        path.unlink(missing_ok=True)
+    # restos de gerações interrompidas
+    for tmp in root.glob(".*"):
+        try:
+            if time.time() - tmp.stat().st_mtime > 3600:
+                tmp.unlink(missing_ok=True)
+        except OSError:
+            continue
+    return max(0, len(files) - keep)
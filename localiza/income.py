@@ -0,0 +1,129 @@
+"""Votos x renda: cruza os pontos de voto com os setores censitários do IBGE.
+
+Camadas de setores (ex.: `renda_quixeramobim.geojson`) trazem população
+(`v0001`), domicílios (`v0002`) e renda média (`renda_media` ou
+`tabela_rendaV06004`). A tabela de setores e a atribuição ponto -> setor
+(`spatial.point_regions`) são montadas uma vez e ficam no cache; a cada mudança
+de filtro só a soma de votos por setor é refeita (`bincount`), e dela saem
+votos por habitante, por domicílio, por decil de renda e as correlações.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from . import cache
+from .schema import safe_number
+from .spatial import region_totals
+
+POP_KEYS = ("v0001",)
+DOM_KEYS = ("v0002", "v0003")
+RENDA_KEYS = ("renda_media", "tabela_rendaV06004")
+
+
+def _first(props: dict[str, Any], keys: tuple[str, ...]) -> float | None:
+    for k in keys:
+        v = safe_number(props.get(k))
+        if v is not None:
+            return v
+    return None
+
+
+def is_income_layer(gj: dict[str, Any]) -> bool:
+    """True se a camada parece de setores censitários com população e renda."""
+    feats = (gj or {}).get("features") or []
+    props = (feats[0].get("properties") or {}) if feats else {}
+    return any(k in props for k in POP_KEYS) and any(k in props for k in RENDA_KEYS)
+
+
+def income_deciles(renda: np.ndarray) -> np.ndarray:
+    """Decil (1-10) de cada setor pela renda média; 0 para setores sem renda."""
+    out = np.zeros(len(renda), dtype=np.int8)
+    ok = np.isfinite(renda) & (renda > 0)
+    n = int(ok.sum())
+    if n:
+        ranks = pd.Series(renda[ok]).rank(method="first").to_numpy()
+        out[ok] = np.ceil(ranks * 10 / n).clip(1, 10).astype(np.int8)
+    return out
+
+
+def _build_tracts(gj: dict[str, Any]) -> pd.DataFrame:
+    rows = []
+    for i, ft in enumerate(gj.get("features") or []):
+        p = ft.get("properties") or {}
+        rows.append({
+            "setor": str(p.get("CD_SETOR") or f"#{i + 1}"),
+            "distrito": str(p.get("NM_DIST") or p.get("NM_DISTRIT") or ""),
+            "populacao": _first(p, POP_KEYS) or 0.0,
+            "domicilios": _first(p, DOM_KEYS) or 0.0,
+            "renda": _first(p, RENDA_KEYS),
+        })
+    tracts = pd.DataFrame(rows, columns=["setor", "distrito", "populacao", "domicilios", "renda"])
+    tracts["renda"] = pd.to_numeric(tracts["renda"], errors="coerce")
+    tracts["decil"] = income_deciles(tracts["renda"].to_numpy(dtype=float))
+    return tracts
+
+
+def tract_table(layer_path: Path, gj: dict[str, Any]) -> pd.DataFrame:
+    """Uma linha por setor (mesma ordem das feições), compartilhada entre sessões."""
+    return cache.get_or_build("setores_renda", layer_path, lambda: _build_tracts(gj))
+
+
+def _spearman(x: np.ndarray, y: np.ndarray) -> float | None:
+    if len(x) < 3:
+        return None
+    rx = pd.Series(x).rank().to_numpy()
+    ry = pd.Series(y).rank().to_numpy()
+    return _pearson(rx, ry)
+
+
+def _pearson(x: np.ndarray, y: np.ndarray) -> float | None:
+    if len(x) < 3 or np.std(x) == 0 or np.std(y) == 0:
+        return None
+    return float(np.corrcoef(x, y)[0, 1])
+
+
+def income_stats(regions: pd.Series, df_sub: pd.DataFrame, tracts: pd.DataFrame) -> dict[str, Any]:
+    """Reagrega os votos de `df_sub` por setor e por decil de renda.
+
+    Devolve `setores` (votos, votos por mil habitantes e por cem domicílios),
+    `decis`, a cobertura (fração dos votos que caem em algum setor) e as
+    correlações renda x votos por habitante (Pearson e Spearman).
+    """
+    votos = region_totals(regions, df_sub, len(tracts))
+    setores = tracts.copy()
+    setores["votos"] = votos
+    pop = setores["populacao"].to_numpy(dtype=float)
+    dom = setores["domicilios"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        setores["votos_mil_hab"] = np.where(pop > 0, votos * 1000.0 / pop, np.nan)
+        setores["votos_cem_dom"] = np.where(dom > 0, votos * 100.0 / dom, np.nan)
+
+    com_renda = setores[setores["decil"] > 0]
+    decis = (
+        com_renda.groupby("decil", as_index=False)
+        .agg(votos=("votos", "sum"), populacao=("populacao", "sum"), domicilios=("domicilios", "sum"),
+             renda_min=("renda", "min"), renda_max=("renda", "max"), setores=("setor", "count"))
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        decis["votos_mil_hab"] = np.where(decis["populacao"] > 0, decis["votos"] * 1000.0 / decis["populacao"], np.nan)
+        decis["votos_cem_dom"] = np.where(decis["domicilios"] > 0, decis["votos"] * 100.0 / decis["domicilios"], np.nan)
+    total_votos = float(votos.sum())
+    decis["pct_votos"] = decis["votos"] * 100.0 / total_votos if total_votos else 0.0
+
+    ok = com_renda[np.isfinite(com_renda["votos_mil_hab"])]
+    x = ok["renda"].to_numpy(dtype=float)
+    y = ok["votos_mil_hab"].to_numpy(dtype=float)
+    total_sub = float(pd.to_numeric(df_sub["qt_votos"], errors="coerce").fillna(0).sum()) if not df_sub.empty else 0.0
+    return {
+        "setores": setores,
+        "decis": decis,
+        "votos_em_setores": total_votos,
+        "cobertura": total_votos / total_sub if total_sub else 0.0,
+        "pearson": _pearson(x, y),
+        "spearman": _spearman(x, y),
+        "votos_mil_hab": total_votos * 1000.0 / pop.sum() if pop.sum() else None,
+    }
@@ -0,0 +1,90 @@
+"""Ingestão de bases de votos brutas.
+
+Valida um `votos_*.geojson`, corrige coordenadas, grava o GeoJSON limpo na pasta
+do candidato e gera o sidecar binário lido por `load_votos_df`. As funções aqui
+são usadas pelo `ingest_votos.py` dentro de um pool de processos, então recebem
+e devolvem apenas valores simples (caminhos, dicts).
+"""
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from .analytics import build_votos_df, write_votos_sidecar
+from .schema import ALIASES, fix_latlon, get_latlon, pick_prop
+
+
+def validate_votos_geojson(gj: Any) -> list[dict[str, Any]]:
+    """Confere a estrutura mínima de uma base de votos e devolve as features."""
+    if not isinstance(gj, dict) or gj.get("type") != "FeatureCollection":
+        raise ValueError("não é um FeatureCollection")
+    feats = gj.get("features")
+    if not isinstance(feats, list) or not feats:
+        raise ValueError("sem features")
+    if not any(((ft or {}).get("geometry") or {}).get("type") == "Point" for ft in feats):
+        raise ValueError("nenhuma geometria Point")
+    props0 = (feats[0] or {}).get("properties") or {}
+    if pick_prop(props0, ALIASES["qt_votos"]) is None:
+        raise ValueError("coluna de votos (QT_VOTOS) ausente")
+    return feats
+
+
+def fix_votos_features(feats: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], int, int]:
+    """Reescreve a geometria de cada ponto com a coordenada corrigida.
+
+    Retorna (features válidas, quantidade corrigida, quantidade descartada).
+    """
+    out: list[dict[str, Any]] = []
+    fixed = dropped = 0
+    for ft in feats:
+        geom = (ft or {}).get("geometry") or {}
+        if geom.get("type") != "Point":
+            dropped += 1
+            continue
+        lat, lon = get_latlon((ft or {}).get("properties") or {}, geom)
+        ll = fix_latlon(lat, lon)
+        if ll is None:
+            dropped += 1
+            continue
+        coords = [ll[1], ll[0]]
+        if list(geom.get("coordinates") or [])[:2] != coords:
+            fixed += 1
+            ft["geometry"] = {"type": "Point", "coordinates": coords}
+        out.append(ft)
+    return out, fixed, dropped
+
+
+def ingest_votos_file(src: Path, dst_dir: Path) -> dict[str, Any]:
+    """Processa um arquivo bruto e grava GeoJSON + sidecar em `dst_dir`."""
+    t0 = time.perf_counter()
+    src, dst_dir = Path(src), Path(dst_dir)
+    dst = dst_dir / src.name
+    res: dict[str, Any] = {"arquivo": str(src), "destino": str(dst), "bytes": 0, "erro": None}
+    try:
+        raw = src.read_bytes()
+        res["bytes"] = len(raw)
+        gj = json.loads(raw)
+        feats = validate_votos_geojson(gj)
+        feats, fixed, dropped = fix_votos_features(feats)
+        if not feats:
+            raise ValueError("nenhum ponto com coordenada válida")
+        gj["features"] = feats
+
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        if fixed or dropped or src.resolve() != dst.resolve():
+            tmp = dst.with_suffix(".geojson.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(gj, f, ensure_ascii=False, separators=(",", ":"))
+            tmp.replace(dst)
+
+        df = build_votos_df(gj)
+        if df.empty:
+            raise ValueError("base vazia após normalização")
+        write_votos_sidecar(dst, df)
+        res.update(feicoes=len(feats), linhas=len(df), corrigidas=fixed, descartadas=dropped)
+    except Exception as exc:
+        res["erro"] = f"{type(exc).__name__}: {exc}"
+    res["segundos"] = time.perf_counter() - t0
+    return res
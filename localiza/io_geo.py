@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import hashlib
 import json
 from pathlib import Path
 from typing import Any
 
+from . import cache
+
 def read_geojson(path: Path) -> dict[str, Any]:
     try:
         with open(path, "r", encoding="utf-8") as f:
@@ -11,6 +14,18 @@ def read_geojson(path: Path) -> dict[str, Any]:
     except Exception:
         return {}
 
+def file_digest(path: Path) -> str:
+    """Hash do conteúdo (não depende de mtime, que muda a cada clone do repositório)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def read_geojson_cached(path: Path) -> dict[str, Any]:
+    """Como `read_geojson`, mas compartilhado entre sessões. Não altere o retorno."""
+    return cache.get_or_build("geojson", path, lambda: read_geojson(path))
+
 def discover_layers_geojson(data_dir: Path, exclude: set[str] | None = None) -> list[dict[str, Any]]:
     """Descobre arquivos .geojson em uma pasta e retorna metadados básicos + conteúdo."""
     exclude = exclude or set()
@@ -18,7 +33,7 @@ def discover_layers_geojson(data_dir: Path, exclude: set[str] | None = None) ->
     for p in sorted(data_dir.glob("*.geojson")):
         if p.name in exclude:
             continue
-        gj = read_geojson(p)
+        gj = read_geojson_cached(p)
         if not gj:
             continue
         feats = gj.get("features") or []
@@ -34,3 +49,25 @@ def discover_layers_geojson(data_dir: Path, exclude: set[str] | None = None) ->
             }
         )
     return layers
+
+
+# camadas com estes prefixos pertencem a uma base de votos (ex.: locais_fortaleza só com votos_fortaleza)
+BASE_LAYER_PREFIXES = ("votos_", "locais_", "distritos_", "bairros_", "zonas_", "lider_")
+
+
+def base_identifier(votos_file: Path | None) -> str:
+    """Identificador da base de votos (ex.: votos_fortaleza -> fortaleza, votos_ce_municipios -> ce)."""
+    stem = votos_file.stem.lower() if votos_file else ""
+    if not stem.startswith("votos_"):
+        return ""
+    return stem.replace("votos_", "").replace("_municipios", "")
+
+
+def layer_in_base(layer: dict[str, Any], base_id: str) -> bool:
+    """A camada aparece com a base? As que não têm prefixo conhecido aparecem sempre."""
+    if not base_id:
+        return True
+    name = layer["stem"].lower()
+    if not any(name.startswith(p) for p in BASE_LAYER_PREFIXES):
+        return True
+    return base_id in name or base_id in layer["filename"].lower()
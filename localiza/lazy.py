@@ -0,0 +1,45 @@
+"""Importação adiada das bibliotecas pesadas (altair, folium, shapely, scipy).
+
+`lazy_import("shapely")` devolve na hora um módulo substituto; a importação de
+verdade só acontece no primeiro acesso a um atributo (`shapely.points(...)`).
+Assim `import localiza.ui`, feito por toda página, não paga centenas de
+milissegundos por bibliotecas que só o mapa, os gráficos ou a seleção usam.
+
+Não é o `importlib.util.LazyLoader`: até o Python 3.11 ele não é seguro entre
+threads (cada sessão do Streamlit roda o script na sua), e o primeiro acesso
+aqui passa pelo `importlib.import_module`, que já serializa a importação.
+Biblioteca não instalada: `lazy_import` devolve None, como os
+`try: import ... except: ... = None` do resto do pacote.
+"""
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule(ModuleType):
+    """Fica no lugar do módulo `name` até o primeiro acesso a um atributo."""
+
+    def __getattr__(self, attr: str) -> Any:
+        value = getattr(importlib.import_module(self.__name__), attr)
+        # os próximos acessos não passam mais por aqui
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__name__!r}>"
+
+
+def lazy_import(name: str) -> ModuleType | None:
+    """Módulo `name` (nome absoluto) importado só quando usado; None se não estiver instalado."""
+    if name in sys.modules:
+        return sys.modules[name]
+    try:
+        # só o pacote de topo: find_spec de "a.b" já importaria "a"
+        found = importlib.util.find_spec(name.partition(".")[0]) is not None
+    except (ImportError, ValueError):
+        found = False
+    return LazyModule(name) if found else None
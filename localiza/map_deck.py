@@ -0,0 +1,302 @@
+"""Mapa em WebGL (deck.gl via `st.pydeck_chart`), alternativa ao folium.
+
+Mesma API de `map_folium` (`build_map`, `add_geojson_layer`, `add_points_layer`,
+..., `finalize_map`), mas as camadas viram objetos do deck.gl desenhados na GPU:
+os pontos vão como colunas (posição, raio, rótulo) num único `ScatterplotLayer`,
+então bases com 100 mil+ seções continuam fluidas. Sem controle de camadas nem
+desenho livre: a UI escolhe as camadas visíveis e a seleção é o clique numa
+área do coroplético. Ligado por `LOCALIZA_MAP_BACKEND=deck` (ver config).
+"""
+from __future__ import annotations
+
+import base64
+import io
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Any
+
+import branca.colormap as bcm
+import numpy as np
+import pandas as pd
+
+try:
+    import pydeck as pdk
+    from pydeck.bindings.json_tools import default_serialize
+except Exception:
+    pdk = None
+
+try:
+    from PIL import Image, ImageColor
+except Exception:
+    Image = ImageColor = None
+
+from .map_folium import density_rgba
+from .profiling import stage, timed
+from .pyramid import MAX_MARKERS
+from .spatial import PROP_LABEL, PROP_VOTES
+from .tiles import graduated_radius
+
+# dica única para todas as camadas: cada linha/feição traz "n" (título) e "v" (detalhe)
+TOOLTIP = {"html": "<b>{n}</b><br/>{v}", "style": {"fontSize": "12px"}}
+
+
+def available() -> bool:
+    return pdk is not None
+
+
+if pdk is not None:
+    class _Deck(pdk.Deck):
+        """`pdk.Deck` serializado sem indentação nem escapes (o padrão do pydeck usa indent=2,
+        que dobra o JSON de uma base grande)."""
+
+        def to_json(self):
+            return json.dumps(self, sort_keys=True, default=default_serialize, separators=(",", ":"), ensure_ascii=False)
+
+
+@dataclass
+class DeckMap:
+    """Camadas acumuladas até `finalize_map`; `show` diz se abre visível."""
+
+    center: list[float]
+    zoom: float
+    layers: list[tuple[str, Any, bool]] = field(default_factory=list)
+
+    def add(self, name: str, layer: Any, show: bool = True):
+        self.layers.append((name, layer, bool(show)))
+
+    def fit_bounds(self, bounds):
+        (s, w), (n, e) = bounds
+        self.center = [(s + n) / 2, (w + e) / 2]
+        span = max(abs(e - w), abs(n - s) / max(math.cos(math.radians(self.center[0])), 0.1), 1e-6)
+        self.zoom = max(1.0, min(18.0, math.log2(360 / span) + 0.5))
+
+    def names(self, visible_only: bool = False) -> list[str]:
+        out = []
+        for name, _layer, show in self.layers:
+            if name not in out and (show or not visible_only):
+                out.append(name)
+        return out
+
+
+def build_map(center: list[float], zoom_start: int = 11) -> DeckMap:
+    return DeckMap(center=list(center), zoom=float(zoom_start))
+
+
+def _rgba(color: Any, alpha: float = 1.0, default: str = "#2b6cb0") -> list[int]:
+    try:
+        rgb = ImageColor.getrgb(str(color or default))[:3]
+    except (ValueError, AttributeError):
+        rgb = ImageColor.getrgb(default)[:3]
+    return [*rgb, int(round(255 * max(0.0, min(1.0, float(alpha)))))]
+
+
+def _fmt(v: float) -> str:
+    return f"{int(round(v)):,}".replace(",", ".")
+
+
+def _layer_id(m: DeckMap) -> str:
+    return f"lv{len(m.layers)}"
+
+
+def _tip_props(props: dict[str, Any]) -> tuple[str, str]:
+    if PROP_VOTES in props:
+        return str(props.get(PROP_LABEL) or ""), f"🗳️ {_fmt(props[PROP_VOTES] or 0)} votos"
+    items = [(k, v) for k, v in props.items() if v not in (None, "") and not str(k).startswith("_")]
+    title = str(items[0][1]) if items else ""
+    return title, "<br/>".join(f"<b>{k}</b>: {v}" for k, v in items[1:5])
+
+
+def _with_tips(geojson: dict[str, Any], extra: dict[int, dict[str, Any]] | None = None) -> dict[str, Any]:
+    feats = []
+    for i, ft in enumerate(geojson.get("features") or []):
+        props = dict(ft.get("properties") or {})
+        props["n"], props["v"] = _tip_props(props)
+        if extra and i in extra:
+            props.update(extra[i])
+        feats.append({"type": "Feature", "properties": props, "geometry": ft.get("geometry")})
+    return {"type": "FeatureCollection", "features": feats}
+
+
+def add_geojson_layer(m: DeckMap, name: str, geojson: dict[str, Any], style: dict[str, Any]):
+    with stage(f"deck.add_geojson_layer:{name}", rows=len((geojson or {}).get("features") or [])):
+        _add_geojson_layer(m, name, geojson, style)
+
+
+def _add_geojson_layer(m: DeckMap, name: str, geojson: dict[str, Any], style: dict[str, Any]):
+    feats = (geojson or {}).get("features") or []
+    if not feats or pdk is None:
+        return
+    show = bool(style.get("show", True))
+    first = ((feats[0].get("geometry") or {}).get("type") or "").lower()
+    if first == "point":
+        rows = []
+        for ft in feats:
+            coords = (ft.get("geometry") or {}).get("coordinates") or []
+            if len(coords) >= 2:
+                n, v = _tip_props(ft.get("properties") or {})
+                rows.append((coords[0], coords[1], n, v))
+        df = pd.DataFrame(rows, columns=["x", "y", "n", "v"])
+        size = float(style.get("iconSize", 0)) / 2 or float(style.get("radius", 6))
+        # ícones viram círculos (os arquivos locais de ícone não são servidos ao deck.gl)
+        m.add(name, pdk.Layer(
+            "ScatterplotLayer", data=df, id=_layer_id(m), get_position="[x, y]",
+            get_radius=size, radius_units="pixels", pickable=True, stroked=True,
+            get_fill_color=_rgba(style.get("fillColor", style.get("color")), style.get("fillOpacity", 0.85)),
+            get_line_color=_rgba(style.get("color"), 1.0), line_width_min_pixels=1,
+        ), show)
+        return
+
+    extra = None
+    fill = _rgba(style.get("fillColor", style.get("color")), style.get("fillOpacity", 0.15))
+    if style.get("mode") == "choropleth" and PROP_VOTES in (feats[0].get("properties") or {}):
+        values = [(ft.get("properties") or {}).get(PROP_VOTES) or 0 for ft in feats]
+        cmap = _colormap(style, max(values) or 1)
+        alpha = style.get("fillOpacity", 0.6)
+        empty = _rgba(style.get("emptyColor", "#cccccc"), alpha)
+        extra = {i: {"_fill": _rgba(cmap(v), alpha) if v > 0 else empty} for i, v in enumerate(values)}
+        fill = "properties._fill"
+    m.add(name, pdk.Layer(
+        "GeoJsonLayer", data=_with_tips(geojson, extra), id=_layer_id(m),
+        pickable=True, stroked=True, filled="polygon" in first,
+        get_fill_color=fill,
+        get_line_color=_rgba(style.get("color"), style.get("opacity", 0.9)),
+        line_width_min_pixels=float(style.get("weight", 2)), line_width_units="pixels",
+        auto_highlight=True,
+    ), show)
+
+
+def _colormap(style: dict[str, Any], vmax: float):
+    colors = style.get("colors") or ["#fff5eb", "#fdae6b", "#e6550d", "#7f2704"]
+    return bcm.LinearColormap(colors, vmin=0, vmax=vmax).to_step(int(style.get("classes", 5)))
+
+
+@timed(rows=lambda m, name, df_points, *a, **k: len(df_points))
+def add_points_layer(
+    m: DeckMap,
+    name: str,
+    df_points: pd.DataFrame,
+    style: dict[str, Any],
+    popup_cols: list[str] | None = None,
+    use_heatmap: bool = False,
+):
+    """Pontos em colunas (x, y, raio, dica): um único ScatterplotLayer, qualquer que seja o tamanho."""
+    if df_points.empty or pdk is None:
+        return
+    votos = pd.to_numeric(df_points.get("qt_votos", pd.Series(0, index=df_points.index)), errors="coerce").fillna(0)
+    graduated = bool(style.get("graduated", False))
+    nome = df_points["nome"].astype(str) if "nome" in df_points.columns else pd.Series("", index=df_points.index)
+    if "municipio" in df_points.columns:
+        nome = nome + " · " + df_points["municipio"].astype(str)
+    data = pd.DataFrame({
+        "x": df_points["lon"].astype(float).round(6).to_numpy(),
+        "y": df_points["lat"].astype(float).round(6).to_numpy(),
+        "r": graduated_radius(votos.to_numpy()) if graduated else float(style.get("radius", 6)),
+        "n": nome.to_numpy(),
+        "v": ["🗳️ " + _fmt(v) + " votos" for v in votos.to_numpy()],
+    })
+    m.add(name, pdk.Layer(
+        "ScatterplotLayer", data=data, id=_layer_id(m), get_position="[x, y]", get_radius="r",
+        radius_units="pixels", pickable=True, stroked=True,
+        get_fill_color=_rgba(style.get("fillColor", style.get("color")), style.get("fillOpacity", 0.6)),
+        get_line_color=_rgba(style.get("color"), 1.0), line_width_min_pixels=1,
+    ), bool(style.get("show", True)))
+    if use_heatmap:
+        m.add(f"{name} Heat", pdk.Layer(
+            "HeatmapLayer", data=data[["x", "y"]].assign(w=votos.to_numpy()), id=_layer_id(m),
+            get_position="[x, y]", get_weight="w",
+        ), False)
+
+
+def _png_data_url(rgba: np.ndarray) -> str:
+    img = Image.fromarray((np.clip(rgba, 0, 1) * 255).astype(np.uint8), "RGBA")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+@timed(rows=lambda m, name, grid, *a, **k: int(grid["density"].size))
+def add_density_overlay(m: DeckMap, name: str, grid: dict[str, Any], show: bool = False):
+    if pdk is None or Image is None:
+        return
+    (s, w), (n, e) = grid["bounds"]
+    m.add(name, pdk.Layer(
+        "BitmapLayer", id=_layer_id(m), image=_png_data_url(density_rgba(grid["density"])),
+        bounds=[w, s, e, n], pickable=False,
+    ), show)
+
+
+@timed(rows=lambda m, name, hotspots, *a, **k: len(hotspots))
+def add_hotspots_layer(m: DeckMap, name: str, hotspots, top_n: int = 15, show: bool = False):
+    if pdk is None or hotspots is None or hotspots.empty:
+        return
+    top = hotspots.head(top_n)
+    data = pd.DataFrame({
+        "poly": [[[r.lon_min, r.lat_min], [r.lon_max, r.lat_min], [r.lon_max, r.lat_max], [r.lon_min, r.lat_max]]
+                 for r in top.itertuples(index=False)],
+        "x": top["lon"].to_numpy(), "y": top["lat"].to_numpy(),
+        "rank": top["rank"].astype(str).to_numpy(),
+        "n": [f"🔥 Aglomerado #{r}" for r in top["rank"]],
+        "v": [f"🗳️ Votos: {_fmt(v)}<br/>📍 Locais: {int(p)}" for v, p in zip(top["votos"], top["locais"])],
+    })
+    m.add(name, pdk.Layer(
+        "PolygonLayer", data=data, id=_layer_id(m), get_polygon="poly", filled=False, stroked=True,
+        get_line_color=_rgba("#bd0026"), line_width_min_pixels=2, pickable=True,
+    ), show)
+    m.add(name, pdk.Layer(
+        "TextLayer", data=data, id=_layer_id(m), get_position="[x, y]", get_text="rank",
+        get_size=14, get_color=_rgba("#bd0026"), font_weight="bold", pickable=True,
+    ), show)
+
+
+def add_hexbin_layer(m: DeckMap, name: str, hexbins: dict[str, Any], style: dict[str, Any]):
+    feats = hexbins.get("features") or []
+    if not feats or pdk is None:
+        return
+    values = [ft["properties"][PROP_VOTES] for ft in feats]
+    cmap = _colormap(style, max(values) or 1)
+    alpha = style.get("fillOpacity", 0.6)
+    extra = {
+        i: {"_fill": _rgba(cmap(v), alpha), "n": f"🗳️ {_fmt(v)} votos",
+            "v": f"📍 Locais: {ft['properties']['locais']}<br/>📐 Votos/km²: {ft['properties']['votos_km2']}"}
+        for i, (v, ft) in enumerate(zip(values, feats))
+    }
+    m.add(name, pdk.Layer(
+        "GeoJsonLayer", data=_with_tips(hexbins, extra), id=_layer_id(m), pickable=True,
+        stroked=True, filled=True, get_fill_color="properties._fill",
+        get_line_color=_rgba(style.get("color", "#555555"), style.get("opacity", 0.6)),
+        line_width_min_pixels=float(style.get("weight", 0.5)), auto_highlight=True,
+    ), bool(style.get("show", True)))
+
+
+def add_pyramid_layer(m: DeckMap, name: str, levels: dict[str, Any], show: bool = False, limit: int = MAX_MARKERS):
+    """Sem troca de nível pelo zoom (isso é JS do Leaflet): usa o nível mais fino com até `limit` totais."""
+    if pdk is None or not levels:
+        return
+    fitting = [t for t in levels.values() if len(t) <= limit]
+    t = fitting[-1] if fitting else next(iter(levels.values())).head(limit)
+    t = t[t["votos"] > 0]
+    data = pd.DataFrame({
+        "x": t["lon"].to_numpy(), "y": t["lat"].to_numpy(),
+        "label": [_fmt(v) for v in t["votos"]],
+        "n": t["nome"].astype(str).to_numpy(),
+        "v": [f"🗳️ {_fmt(v)} votos · {int(s)} seções" for v, s in zip(t["votos"], t["secoes"])],
+    })
+    m.add(name, pdk.Layer(
+        "TextLayer", data=data, id=_layer_id(m), get_position="[x, y]", get_text="label",
+        get_size=13, get_color=[255, 255, 255, 255], background=True, get_background_color=_rgba("#1976d2", 0.9),
+        background_padding=[4, 2], font_weight="bold", pickable=True,
+    ), show)
+
+
+def finalize_map(m: DeckMap, visible: list[str] | None = None):
+    """Monta o `pdk.Deck` com as camadas visíveis (`visible`, ou as que abrem ligadas)."""
+    keep = set(m.names(visible_only=True) if visible is None else visible)
+    layers = [layer for name, layer, _show in m.layers if name in keep]
+    return _Deck(
+        layers=layers,
+        initial_view_state=pdk.ViewState(latitude=m.center[0], longitude=m.center[1], zoom=m.zoom),
+        map_provider="carto",
+        map_style="light",
+        tooltip=TOOLTIP,
+    )
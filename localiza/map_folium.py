@@ -1,11 +1,21 @@
 from __future__ import annotations
 
-from typing import Any, Tuple
+from contextlib import contextmanager
+from typing import Any
 
+import base64
+import json
+
+import branca.colormap as bcm
 import folium
-from folium.plugins import MeasureControl, Fullscreen, Draw, MousePosition, HeatMap
+import numpy as np
+from folium.plugins import MeasureControl, Fullscreen, Draw, MousePosition, HeatMap, VectorGridProtobuf
+from jinja2 import Template
 
-from .schema import circle_radius
+from .profiling import stage, timed
+from .pyramid import zoom_ranges
+from .schema import circle_radius, fix_latlon
+from .spatial import PROP_ID, PROP_LABEL, PROP_VOTES
 
 
 def add_base_tiles(m: folium.Map):
@@ -20,6 +30,27 @@ def add_base_tiles(m: folium.Map):
         folium.TileLayer(tiles=t["url"], attr=t["attr"], name=t["name"], control=True).add_to(m)
 
 
+class _DrawCircleRadius(folium.MacroElement):
+    """Mantém `properties.radius` dos círculos do Draw ao editar (o st_folium só preenche ao criar)."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) -%}
+        {{ this._parent.get_name() }}.on("draw:edited", function(e) {
+            e.layers.eachLayer(function(layer) {
+                if (!(layer instanceof L.Circle)) return;
+                layer.feature = layer.feature || {type: "Feature", properties: {}};
+                layer.feature.properties = layer.feature.properties || {};
+                layer.feature.properties.radius = layer.getRadius();
+            });
+        });
+        {%- endmacro %}
+    """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = "DrawCircleRadius"
+
+
 def build_map(center: list[float], zoom_start: int = 11) -> folium.Map:
     m = folium.Map(location=center, zoom_start=zoom_start, tiles=None, control_scale=True)
     add_base_tiles(m)
@@ -57,6 +88,7 @@ def build_map(center: list[float], zoom_start: int = 11) -> folium.Map:
         },
         edit_options={"edit": True, "remove": True},
     ).add_to(m)
+    _DrawCircleRadius().add_to(m)
 
     return m
 
@@ -70,46 +102,12 @@ def _to_float(x):
         return None
 
 
-def _rescale_to_range(value: float, limit: float, max_divs: int = 12) -> float:
-    """
-    Se vier como inteiro sem vírgula (ex: -382093835), divide por 10 até caber na faixa.
-    """
-    v = float(value)
-    divs = 0
-    while abs(v) > limit and divs < max_divs:
-        v = v / 10.0
-        divs += 1
-    return v
-
-
-def _fix_latlon(lat, lon) -> Tuple[float, float] | None:
-    """
-    Retorna (lat, lon) prontos pro Folium.
-    Corrige escala quebrada e inversão.
-    """
-    lat_f = _to_float(lat)
-    lon_f = _to_float(lon)
-    if lat_f is None or lon_f is None:
-        return None
-
-    # 1) Corrige escala antes de qualquer coisa
-    lat_f = _rescale_to_range(lat_f, 90)
-    lon_f = _rescale_to_range(lon_f, 180)
-
-    # 2) Se ainda estiver estranho, tenta inverter e reescalar de novo
-    if (abs(lat_f) > 90 and abs(lon_f) <= 90) or (abs(lon_f) > 180 and abs(lat_f) <= 180):
-        lat_f, lon_f = lon_f, lat_f
-        lat_f = _rescale_to_range(lat_f, 90)
-        lon_f = _rescale_to_range(lon_f, 180)
-
-    # 3) Validação final
-    if not (-90 <= lat_f <= 90 and -180 <= lon_f <= 180):
-        return None
-
-    return lat_f, lon_f
+def add_geojson_layer(m: folium.Map, name: str, geojson: dict[str, Any], style: dict[str, Any]):
+    with stage(f"add_geojson_layer:{name}", rows=len((geojson or {}).get("features") or [])):
+        _add_geojson_layer(m, name, geojson, style)
 
 
-def add_geojson_layer(m: folium.Map, name: str, geojson: dict[str, Any], style: dict[str, Any]):
+def _add_geojson_layer(m: folium.Map, name: str, geojson: dict[str, Any], style: dict[str, Any]):
     # Colorir por região se for ce_regioes
     if "ce_regioes" in name.lower() or "regioes" in name.lower():
         region_colors = {
@@ -192,127 +190,27 @@ def add_geojson_layer(m: folium.Map, name: str, geojson: dict[str, Any], style:
         first_geom = geojson["features"][0].get("geometry", {}).get("type")
         if first_geom == "Point":
             fg = folium.FeatureGroup(name=name, show=bool(style.get("show", True)))
-            
-            # Detectar qual coluna de votos usar (case-insensitive)
-            is_municipios = "municipios" in name.lower()
-            
-            # Tentar encontrar coluna de votos (maiúsculas ou minúsculas)
-            first_props = geojson["features"][0].get("properties", {})
-            votos_col = None
-            for key in first_props.keys():
-                if key.upper() == "QT_VOTOS":
-                    votos_col = key
-                    break
-            
-            if not votos_col:
-                votos_col = "QT_VOTOS"  # fallback
-            
-            # Calcular min/max para graduação
-            votos_vals = [_to_float(f.get("properties", {}).get(votos_col)) or 0 for f in geojson["features"]]
-            min_votos = min(votos_vals) if votos_vals else 0
-            max_votos = max(votos_vals) if votos_vals else 0
-            
-            # Mapeamento de campos com emojis (case-insensitive)
-            if is_municipios:
-                field_map = {
-                    "NM_MUNICIPIO": "🏛️ Município",
-                    "NM_VOTAVEL": "👤 Nome",
-                    "NR_VOTAVEL": "🔢 N°",
-                    votos_col: "🗳️ Total Votos",
-                }
-            else:
-                field_map = {
-                    "NM_MUNICIPIO": "🏛️ Município",
-                    "NM_LOCAL_VOTACAO": "📍 Local de Votação",
-                    "NM_VOTAVEL": "👤 Nome",
-                    "NR_VOTAVEL": "🔢 N°",
-                    votos_col: "🗳️ Quant. Votos",
-                    "NR_ZONA": "📍 Zona"
-                }
-            
-            # Coletar pontos para visualização alternativa se for municipios
-            markers_data = []
-            
-            for feature in geojson.get("features", []):
-                geom = feature.get("geometry", {})
-                props = feature.get("properties", {})
-                
-                if isinstance(geom, dict) and geom.get("type") == "Point":
-                    coords = geom.get("coordinates", [])
-                    if len(coords) >= 2:
-                        votos = _to_float(props.get(votos_col)) or 0
-                        radius = _calculate_graduated_size(votos, min_votos, max_votos)
-                        
-                        # Coletar dados para marcadores com números se for municipios
-                        if is_municipios and votos > 0:
-                            markers_data.append({
-                                "coords": [coords[1], coords[0]],
-                                "votos": votos,
-                                "municipio": props.get("NM_MUNICIPIO", "")
-                            })
-                        
-                        # Criar tooltip customizado
-                        tooltip_lines = []
-                        for field, label in field_map.items():
-                            if field in props and props[field]:
-                                tooltip_lines.append(f"<b>{label}</b>: {props[field]}")
-                        tooltip_text = "<br>".join(tooltip_lines)
-                        
-                        folium.CircleMarker(
-                            location=[coords[1], coords[0]],
-                            radius=radius,
-                            color=style.get("color", "#1f6feb"),
-                            weight=2,
-                            fill=True,
-                            fill_color=style.get("fillColor", "#1f6feb"),
-                            fill_opacity=0.6,
-                            tooltip=folium.Tooltip(tooltip_text) if tooltip_text else None,
-                            popup=folium.Popup(tooltip_text, max_width=300) if tooltip_text else None,
-                        ).add_to(fg)
-            
+            for _fid, lat, lon, radius, tooltip_text in _votes_point_rows(name, geojson):
+                folium.CircleMarker(
+                    location=[lat, lon],
+                    radius=radius,
+                    color=style.get("color", "#1f6feb"),
+                    weight=2,
+                    fill=True,
+                    fill_color=style.get("fillColor", "#1f6feb"),
+                    fill_opacity=0.6,
+                    tooltip=folium.Tooltip(tooltip_text) if tooltip_text else None,
+                    popup=folium.Popup(tooltip_text, max_width=300) if tooltip_text else None,
+                ).add_to(fg)
             fg.add_to(m)
-            
-            # Adicionar camada com números de votos para municipios
-            if is_municipios and markers_data:
-                fg_numbers = folium.FeatureGroup(name=f"{name} - Números", show=False)
-                
-                for data in markers_data:
-                    votos_int = int(data["votos"])
-                    # Determinar cor baseada na quantidade de votos
-                    if votos_int >= max_votos * 0.7:
-                        color = "#d32f2f"  # Vermelho escuro
-                    elif votos_int >= max_votos * 0.4:
-                        color = "#f57c00"  # Laranja
-                    else:
-                        color = "#1976d2"  # Azul
-                    
-                    icon_html = f"""
-                    <div style="
-                        background-color: {color};
-                        color: white;
-                        border: 2px solid white;
-                        border-radius: 50%;
-                        width: 40px;
-                        height: 40px;
-                        display: flex;
-                        align-items: center;
-                        justify-content: center;
-                        font-weight: bold;
-                        font-size: 11px;
-                        box-shadow: 0 2px 6px rgba(0,0,0,0.4);
-                    ">{votos_int}</div>
-                    """
-                    
-                    folium.Marker(
-                        location=data["coords"],
-                        icon=folium.DivIcon(html=icon_html),
-                        tooltip=f"<b>{data['municipio']}</b><br>{votos_int} votos"
-                    ).add_to(fg_numbers)
-                
-                fg_numbers.add_to(m)
-            
             return
     
+    # Coroplético: polígonos coloridos pelo total de votos (ver spatial.with_totals)
+    if style.get("mode") == "choropleth" and geojson.get("features"):
+        if PROP_VOTES in (geojson["features"][0].get("properties") or {}):
+            _add_choropleth_layer(m, name, geojson, style)
+            return
+
     # Estilo padrão para polígonos e linhas
     def _style(_):
         return {
@@ -337,6 +235,129 @@ def add_geojson_layer(m: folium.Map, name: str, geojson: dict[str, Any], style:
     ).add_to(m)
 
 
+def _votes_points(name: str, geojson: dict[str, Any]) -> tuple[str, dict[str, str], list[tuple[int, float, float, float, dict]]]:
+    """Coluna de votos, campos da dica (campo -> rótulo) e (índice da feição, lat, lon, raio graduado,
+    propriedades) de cada ponto de uma camada de votos."""
+    # Detectar qual coluna de votos usar (case-insensitive)
+    is_municipios = "municipios" in name.lower()
+    
+    # Tentar encontrar coluna de votos (maiúsculas ou minúsculas)
+    first_props = geojson["features"][0].get("properties", {})
+    votos_col = None
+    for key in first_props.keys():
+        if key.upper() == "QT_VOTOS":
+            votos_col = key
+            break
+    
+    if not votos_col:
+        votos_col = "QT_VOTOS"  # fallback
+    
+    # Calcular min/max para graduação
+    votos_vals = [_to_float(f.get("properties", {}).get(votos_col)) or 0 for f in geojson["features"]]
+    min_votos = min(votos_vals) if votos_vals else 0
+    max_votos = max(votos_vals) if votos_vals else 0
+    
+    # Mapeamento de campos com emojis (case-insensitive)
+    if is_municipios:
+        field_map = {
+            "NM_MUNICIPIO": "🏛️ Município",
+            "NM_VOTAVEL": "👤 Nome",
+            "NR_VOTAVEL": "🔢 N°",
+            votos_col: "🗳️ Total Votos",
+        }
+    else:
+        field_map = {
+            "NM_MUNICIPIO": "🏛️ Município",
+            "NM_LOCAL_VOTACAO": "📍 Local de Votação",
+            "NM_VOTAVEL": "👤 Nome",
+            "NR_VOTAVEL": "🔢 N°",
+            votos_col: "🗳️ Quant. Votos",
+            "NR_ZONA": "📍 Zona"
+        }
+    
+    points = []
+    for i, feature in enumerate(geojson.get("features", [])):
+        geom = feature.get("geometry", {})
+        props = feature.get("properties", {})
+        
+        if isinstance(geom, dict) and geom.get("type") == "Point":
+            coords = geom.get("coordinates", [])
+            if len(coords) >= 2:
+                radius = _calculate_graduated_size(votos_vals[i], min_votos, max_votos)
+                points.append((i, coords[1], coords[0], radius, props))
+    return votos_col, field_map, points
+
+
+def _votes_point_rows(name: str, geojson: dict[str, Any]) -> list[tuple[int, float, float, float, str]]:
+    """(índice da feição, lat, lon, raio graduado, dica) de cada ponto de uma camada de votos."""
+    _votos_col, field_map, points = _votes_points(name, geojson)
+    rows = []
+    for i, lat, lon, radius, props in points:
+        # Criar tooltip customizado
+        tooltip_lines = []
+        for field, label in field_map.items():
+            if field in props and props[field]:
+                tooltip_lines.append(f"<b>{label}</b>: {props[field]}")
+        rows.append((i, lat, lon, radius, "<br>".join(tooltip_lines)))
+    return rows
+
+
+def _add_choropleth_layer(
+    m: folium.Map,
+    name: str,
+    geojson: dict[str, Any],
+    style: dict[str, Any],
+    tooltip: folium.GeoJsonTooltip | None = None,
+    caption: str | None = None,
+):
+    values = [(ft.get("properties") or {}).get(PROP_VOTES) or 0 for ft in geojson["features"]]
+    vmax = max(values) or 1
+    colors = style.get("colors") or ["#fff5eb", "#fdae6b", "#e6550d", "#7f2704"]
+    cmap = bcm.LinearColormap(colors, vmin=0, vmax=vmax).to_step(int(style.get("classes", 5)))
+    cmap.caption = caption or f"Votos por polígono · {name}"
+    empty = style.get("emptyColor", "#cccccc")
+
+    def _style(feature):
+        v = (feature.get("properties") or {}).get(PROP_VOTES) or 0
+        return {
+            "color": style.get("color", "#555555"),
+            "weight": style.get("weight", 1),
+            "opacity": style.get("opacity", 0.9),
+            "fillColor": cmap(v) if v > 0 else empty,
+            "fillOpacity": style.get("fillOpacity", 0.6),
+        }
+
+    def _highlight(_):
+        return {"weight": 3, "color": "#222222", "fillOpacity": min(1.0, float(style.get("fillOpacity", 0.6)) + 0.2)}
+
+    layer = folium.GeoJson(
+        geojson,
+        name=name,
+        style_function=_style,
+        highlight_function=_highlight,
+        tooltip=tooltip or folium.GeoJsonTooltip(fields=[PROP_LABEL, PROP_VOTES], aliases=["📍 Área", "🗳️ Votos"]),
+        show=bool(style.get("show", True)),
+    ).add_to(m)
+    _ChoroplethRestyle(name, cmap, empty).add_to(layer)
+    # legenda só para camadas que abrem visíveis (não some ao desligar a camada);
+    # dentro de um grupo dinâmico (ver dynamic_group) não há onde pendurá-la
+    if style.get("show", True) and isinstance(m, folium.Map):
+        cmap.add_to(m)
+
+
+@timed(rows=lambda m, name, hexbins, *a, **k: len(hexbins["features"]))
+def add_hexbin_layer(m: folium.Map, name: str, hexbins: dict[str, Any], style: dict[str, Any]):
+    """Grade hexagonal de votos (analytics.vote_hexbins), colorida como o coroplético."""
+    if not hexbins.get("features"):
+        return
+    km = float(hexbins.get("cell_m") or 0) / 1000
+    tooltip = folium.GeoJsonTooltip(
+        fields=[PROP_VOTES, "locais", "votos_km2"], aliases=["🗳️ Votos", "📍 Locais", "📐 Votos/km²"],
+    )
+    caption = f"Votos por hexágono (~{km:.1f} km)".replace(".", ",")
+    _add_choropleth_layer(m, name, hexbins, style, tooltip=tooltip, caption=caption)
+
+
 def _calculate_graduated_size(value: float, min_val: float, max_val: float, num_classes: int = 5) -> float:
     """Calcula o tamanho do círculo baseado em classes de intervalo igual."""
     if max_val == min_val:
@@ -350,6 +371,7 @@ def _calculate_graduated_size(value: float, min_val: float, max_val: float, num_
     return sizes[class_idx]
 
 
+@timed(rows=lambda m, name, df_points, *a, **k: len(df_points))
 def add_points_layer(
     m: folium.Map,
     name: str,
@@ -380,7 +402,7 @@ def add_points_layer(
             max_votos = float(votos_vals.max())
 
     for _, r in df_points.iterrows():
-        fixed = _fix_latlon(r.get("lat"), r.get("lon"))
+        fixed = fix_latlon(r.get("lat"), r.get("lon"))
         if not fixed:
             continue
         lat_f, lon_f = fixed
@@ -444,9 +466,478 @@ def add_points_layer(
         HeatMap(heat_pts, name=f"{name} Heat", show=False, min_opacity=0.3).add_to(m)
 
 
-def finalize_map(m: folium.Map):
-    folium.LayerControl(position='topleft', collapsed=True).add_to(m)
-    
+def add_raster_layer(m: folium.Map, name: str, url: str, meta: dict[str, Any], show: bool = True):
+    """Camada densa já desenhada em tiles PNG (ver tiles.ensure_tiles)."""
+    folium.TileLayer(
+        tiles=url,
+        attr="LocalizaVotos",
+        name=name,
+        overlay=True,
+        control=True,
+        show=show,
+        max_zoom=20,
+        max_native_zoom=meta["max_native_zoom"],
+        minNativeZoom=meta["min_zoom"],
+        bounds=meta["bounds"],
+    ).add_to(m)
+
+
+class _VectorTiles(VectorGridProtobuf):
+    """VectorGrid.protobuf com dica (tooltip) das propriedades ao passar o mouse."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) -%}
+        var {{ this.get_name() }} = L.vectorGrid.protobuf('{{ this.url }}', {{ this.options }});
+        {%- if this.fields %}
+        (function(layer, fields) {
+            var tip = L.tooltip({sticky: true, direction: "top"});
+            layer.on("mouseover", function(e) {
+                var p = (e.layer && e.layer.properties) || {};
+                var html = fields.filter(function(f) { return p[f[0]] !== undefined && p[f[0]] !== ""; })
+                    .map(function(f) { return "<b>" + f[1] + "</b>: " + p[f[0]]; }).join("<br>");
+                if (html && layer._map) { tip.setContent(html).setLatLng(e.latlng); layer._map.openTooltip(tip); }
+            });
+            layer.on("mouseout", function() { if (layer._map) layer._map.closeTooltip(tip); });
+        })({{ this.get_name() }}, {{ this.fields|tojson }});
+        {%- endif %}
+        {%- endmacro %}
+    """)
+
+    def __init__(self, url: str, name: str, options: str, fields: dict[str, str], show: bool = True):
+        super().__init__(url, name=name, options=options, show=show)
+        self.fields = [[k, v] for k, v in fields.items()]
+
+
+def add_vector_tile_layer(m: folium.Map, name: str, url: str, meta: dict[str, Any], style: dict[str, Any]):
+    """Camada em tiles vetoriais (vector_tiles.lookup): estilo e dicas no navegador."""
+    geom = str(meta.get("geom") or "").lower()
+    paint = {
+        "color": style.get("color", "#2b6cb0"),
+        "weight": style.get("weight", 2),
+        "opacity": style.get("opacity", 0.9),
+        "fillColor": style.get("fillColor", style.get("color", "#2b6cb0")),
+        "fillOpacity": style.get("fillOpacity", 0.15),
+        "fill": "polygon" in geom or "point" in geom,
+    }
+    if "point" in geom:
+        paint["radius"] = float(style.get("radius", 6))
+    layer_style = json.dumps(paint)
+    if meta.get("votes"):
+        # mesmas classes de _calculate_graduated_size, calculadas no navegador
+        key, vmin, vmax = meta["votes"]
+        paint.update({"color": style.get("color", "#1f6feb"), "fillColor": style.get("fillColor", "#1f6feb"),
+                      "weight": 2, "fillOpacity": 0.6})
+        layer_style = (
+            "function(p) { var v = +p[%s] || 0, lo = %r, hi = %r;"
+            " var c = hi > lo ? Math.min(Math.floor((v - lo) / ((hi - lo) / 5)), 4) : -1;"
+            " return Object.assign(%s, {radius: c < 0 ? 8 : 4 + 4 * Math.max(c, 0)}); }"
+        ) % (json.dumps(key), float(vmin), float(vmax), json.dumps(paint))
+    options = (
+        "{rendererFactory: L.canvas.tile, interactive: true, maxZoom: 20, "
+        f"minNativeZoom: {int(meta['min_zoom'])}, maxNativeZoom: {int(meta['max_native_zoom'])}, "
+        f"bounds: {json.dumps(meta['bounds'])}, "
+        f"vectorTileLayerStyles: {{{json.dumps(meta['layer'])}: {layer_style}}}}}"
+    )
+    _VectorTiles(url, name=name, options=options, fields=meta.get("fields") or {}, show=bool(style.get("show", True))).add_to(m)
+
+
+HEAT_STOPS = np.array([
+    [255, 255, 178], [254, 204, 92], [253, 141, 60], [240, 59, 32], [189, 0, 38],
+], dtype=float)
+
+
+def density_rgba(density: np.ndarray, max_alpha: float = 0.75) -> np.ndarray:
+    """Colore a grade de densidade (raiz para realçar valores médios); fundo transparente."""
+    peak = float(density.max()) or 1.0
+    t = np.sqrt(density / peak)
+    pos = t * (len(HEAT_STOPS) - 1)
+    i0 = np.clip(pos.astype(int), 0, len(HEAT_STOPS) - 2)
+    frac = (pos - i0)[..., None]
+    rgb = HEAT_STOPS[i0] * (1 - frac) + HEAT_STOPS[i0 + 1] * frac
+    alpha = np.where(t < 0.03, 0.0, np.clip(t * 1.5, 0, 1) * max_alpha)
+    return np.dstack([rgb / 255.0, alpha])
+
+
+@timed(rows=lambda m, name, grid, *a, **k: int(grid["density"].size))
+def add_density_overlay(m: folium.Map, name: str, grid: dict[str, Any], show: bool = False):
+    """Densidade de votos (analytics.vote_density_grid) como imagem sobre o mapa."""
+    folium.raster_layers.ImageOverlay(
+        image=density_rgba(grid["density"]),
+        bounds=grid["bounds"],
+        origin="upper",
+        name=name,
+        opacity=1.0,
+        interactive=False,
+        zindex=400,
+        show=show,
+    ).add_to(m)
+
+
+@timed(rows=lambda m, name, hotspots, *a, **k: len(hotspots))
+def add_hotspots_layer(m: folium.Map, name: str, hotspots, top_n: int = 15, show: bool = False):
+    """Aglomerados de votos (analytics.vote_hotspots): caixa + número do ranking."""
+    fg = folium.FeatureGroup(name=name, show=show)
+    for r in hotspots.head(top_n).itertuples(index=False):
+        tip = (
+            f"<b>🔥 Aglomerado #{r.rank}</b><br>🗳️ Votos: {int(r.votos):,}".replace(",", ".")
+            + f"<br>📍 Locais: {int(r.locais)}"
+        )
+        folium.Rectangle(
+            bounds=[[r.lat_min, r.lon_min], [r.lat_max, r.lon_max]],
+            color="#bd0026", weight=2, fill=False, dash_array="4,4", tooltip=tip,
+        ).add_to(fg)
+        folium.Marker(
+            location=[r.lat, r.lon],
+            tooltip=tip,
+            icon=folium.DivIcon(html=(
+                "<div style='background:#bd0026;color:white;border:2px solid white;border-radius:50%;"
+                "width:26px;height:26px;display:flex;align-items:center;justify-content:center;"
+                f"font-weight:bold;font-size:12px;box-shadow:0 1px 4px rgba(0,0,0,.4);'>{r.rank}</div>"
+            )),
+        ).add_to(fg)
+    fg.add_to(m)
+
+
+class _PyramidLayer(folium.map.Layer):
+    """Totais por nível (pyramid.build_pyramid): o navegador troca o nível pelo zoom
+    e desenha só os maiores totais visíveis, então o número de marcadores fica limitado."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) -%}
+        var {{ this.get_name() }} = L.layerGroup();
+        (function(group, levels, limit) {
+            var esc = function(s) { return String(s).replace(/[&<>"]/g, function(c) {
+                return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}[c]; }); };
+            var fmt = function(v) { return Math.round(v).toLocaleString("pt-BR"); };
+            function redraw() {
+                group.clearLayers();
+                var map = group._map;
+                if (!map) return;
+                var z = map.getZoom(), lv = null;
+                levels.forEach(function(l) { if (z >= l.min && (l.max === null || z < l.max)) lv = l; });
+                if (!lv || !lv.rows.length) return;
+                var view = map.getBounds().pad(0.1), top = lv.rows[0][2] || 1, n = 0;
+                for (var i = 0; i < lv.rows.length && n < limit; i++) {
+                    var r = lv.rows[i];
+                    if (!view.contains([r[0], r[1]])) continue;
+                    n++;
+                    // mesmas faixas da antiga camada "Números": 70% e 40% do maior total do nível
+                    var color = r[2] >= top * 0.7 ? "#d32f2f" : (r[2] >= top * 0.4 ? "#f57c00" : "#1976d2");
+                    var html = '<div style="background-color:' + color + ';color:white;border:2px solid white;'
+                        + 'border-radius:20px;min-width:40px;height:40px;padding:0 4px;box-sizing:border-box;'
+                        + 'display:flex;align-items:center;justify-content:center;font-weight:bold;font-size:11px;'
+                        + 'box-shadow:0 2px 6px rgba(0,0,0,0.4);transform:translate(-50%,-50%);">' + fmt(r[2]) + '</div>';
+                    L.marker([r[0], r[1]], {icon: L.divIcon({html: html, className: "", iconSize: [0, 0]})})
+                        .bindTooltip("<b>" + esc(r[4]) + "</b><br>🗳️ " + fmt(r[2]) + " votos<br>🗂️ "
+                            + r[3] + " seç" + (r[3] === 1 ? "ão" : "ões") + "<br><i>" + lv.label + "</i>")
+                        .addTo(group);
+                }
+            }
+            group.on("add", function() { group._map.on("zoomend moveend", redraw); redraw(); });
+            group.on("remove", function() { if (group._map) group._map.off("zoomend moveend", redraw); group.clearLayers(); });
+        })({{ this.get_name() }}, {{ this.levels|tojson }}, {{ this.limit }});
+        {%- endmacro %}
+    """)
+
+    def __init__(self, name: str, levels: list[dict[str, Any]], limit: int, show: bool = True):
+        super().__init__(name=name, overlay=True, show=show)
+        self._name = "PyramidLayer"
+        self.levels = levels
+        self.limit = int(limit)
+
+
+@timed(rows=lambda m, name, levels, *a, **k: sum(len(t) for t in levels.values()))
+def add_pyramid_layer(m: folium.Map, name: str, levels: dict[str, Any], show: bool = False, limit: int = 300):
+    """Camada de totais por nível (município → bairro → local) que acompanha o zoom."""
+    payload = []
+    for level, label, z0, z1 in zoom_ranges(levels):
+        t = levels[level]
+        rows = [
+            [round(float(lat), 6), round(float(lon), 6), float(v), int(n), str(nome)]
+            for lat, lon, v, n, nome in zip(t["lat"], t["lon"], t["votos"], t["secoes"], t["nome"])
+            if v > 0
+        ]
+        payload.append({"label": label, "min": z0, "max": z1, "rows": rows})
+    if payload:
+        _PyramidLayer(name, payload, limit, show=show).add_to(m)
+
+
+# ---- atualização incremental: o mapa "estático" vai uma vez por sessão; a cada filtro,
+# o st_folium só troca os grupos de `feature_group_to_add` (sem recarregar o iframe)
+
+class _ChoroplethRestyle(folium.MacroElement):
+    """Registra o coroplético para receber totais novos no navegador (ver delta_update)."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) -%}
+        (function(layer, key, index, colors, empty) {
+            var base = layer.options.style;
+            function color(v) {
+                var i = 0;
+                while (i < index.length && index[i] <= v) i++;
+                return colors[Math.min(Math.max(i - 1, 0), colors.length - 1)];
+            }
+            layer.options.style = function(f) {
+                var v = (f.properties || {}).{{ this.prop }} || 0;
+                return Object.assign({}, base ? base(f) : {}, {fillColor: v > 0 ? color(v) : empty});
+            };
+            window.lvChoropleths = window.lvChoropleths || {};
+            window.lvChoropleths[key] = function(totals) {
+                layer.eachLayer(function(l) {
+                    var p = l.feature.properties;
+                    p.{{ this.prop }} = totals[p.{{ this.id_prop }}] || 0;
+                });
+                layer.resetStyle();
+            };
+        })({{ this._parent.get_name() }}, {{ this.key|tojson }}, {{ this.index|tojson }}, {{ this.colors|tojson }}, {{ this.empty|tojson }});
+        {%- endmacro %}
+    """)
+
+    def __init__(self, key: str, cmap, empty: str):
+        super().__init__()
+        self._name = "ChoroplethRestyle"
+        self.key = key
+        self.index = [float(v) for v in cmap.index]
+        self.colors = [cmap((a + b) / 2) for a, b in zip(cmap.index[:-1], cmap.index[1:])]
+        self.empty = empty
+        self.prop = PROP_VOTES
+        self.id_prop = PROP_ID
+
+
+class _FilterablePoints(folium.map.Layer):
+    """Pontos de votos da base inteira em arrays tipados (base64), enviados uma vez.
+
+    Os filtros da página chegam depois como máscara das feições (delta_update).
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) -%}
+        var {{ this.get_name() }} = L.featureGroup();
+        (function(group, key, cols, fields, style) {
+            function typed(b64, T) {
+                var raw = atob(b64), bytes = new Uint8Array(raw.length);
+                for (var i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+                return new T(bytes.buffer);
+            }
+            var fid = typed(cols.fid, Uint32Array), lat = typed(cols.lat, Float32Array), lon = typed(cols.lon, Float32Array),
+                radius = typed(cols.radius, Float32Array);
+            fields.forEach(function(f) { f.codes = typed(f.codes, f.wide ? Uint32Array : Uint16Array); });
+            var n = fid.length, markers = new Array(n), shown = new Uint8Array(n);
+            var paint = Object.assign({renderer: L.canvas({padding: 0.5})}, style);
+            var ESC = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"};
+            function esc(v) { return String(v).replace(/[&<>"']/g, function(c) { return ESC[c]; }); }
+
+            function tip(i) {
+                var lines = [];
+                fields.forEach(function(f) {
+                    var v = f.values[f.codes[i]];
+                    if (v) lines.push("<b>" + esc(f.label) + "</b>: " + esc(v));
+                });
+                return lines.join("<br>");
+            }
+            function marker(i) {
+                if (!markers[i]) {
+                    var mk = L.circleMarker([lat[i], lon[i]], Object.assign({radius: radius[i]}, paint)), t = tip(i);
+                    if (t) mk.bindTooltip(t).bindPopup(t, {maxWidth: 300});
+                    markers[i] = mk;
+                }
+                return markers[i];
+            }
+
+            // só entra e sai do grupo o que mudou: arrastar o filtro não redesenha a base inteira
+            var bits = null;
+            function redraw() {
+                for (var i = 0; i < n; i++) {
+                    var on = bits === null || (bits[fid[i] >> 3] >> (fid[i] & 7)) & 1;
+                    if (on && !shown[i]) group.addLayer(marker(i));
+                    else if (!on && shown[i]) group.removeLayer(markers[i]);
+                    shown[i] = on ? 1 : 0;
+                }
+            }
+            group.lvFilter = function(mask) { bits = mask; redraw(); };
+            window.lvFilterable = window.lvFilterable || {};
+            window.lvFilterable[key] = group;
+            redraw();
+        })({{ this.get_name() }}, {{ this.key|tojson }}, {{ this.columns|tojson }}, {{ this.fields|tojson }}, {{ this.style|tojson }});
+        {%- endmacro %}
+    """)
+
+    def __init__(self, name: str, columns: dict[str, str], fields: list[dict[str, Any]], style: dict[str, Any], show: bool = True):
+        super().__init__(name=name, overlay=True, show=show)
+        self._name = "FilterablePoints"
+        self.key = name
+        self.columns = columns
+        self.fields = fields
+        self.style = style
+
+
+def _b64(values, dtype) -> str:
+    return base64.b64encode(np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<")).tobytes()).decode()
+
+
+def votes_columns(name: str, geojson: dict[str, Any]) -> tuple[dict[str, str], list[dict[str, Any]]]:
+    """Colunas (fid, lat, lon, raio) e campos da dica em dicionário (valores distintos +
+    códigos) de uma camada de votos, em base64 little-endian para `TypedArray` no navegador."""
+    _votos_col, field_map, points = _votes_points(name, geojson)
+    columns = {
+        "fid": _b64([p[0] for p in points], "u4"),
+        "lat": _b64([p[1] for p in points], "f4"),
+        "lon": _b64([p[2] for p in points], "f4"),
+        "radius": _b64([p[3] for p in points], "f4"),
+    }
+    fields = []
+    for field, label in field_map.items():
+        # vazio não entra na dica (como em _votes_point_rows)
+        values, codes = np.unique([str(v) if (v := p[4].get(field)) else "" for p in points], return_inverse=True)
+        wide = len(values) > 0xFFFF
+        fields.append({
+            "key": field, "label": label, "values": values.tolist(), "wide": wide,
+            "codes": _b64(codes, "u4" if wide else "u2"),
+        })
+    return columns, fields
+
+
+@timed(rows=lambda m, name, geojson, *a, **k: len(geojson.get("features") or []))
+def add_filterable_votes_layer(m: folium.Map, name: str, geojson: dict[str, Any], style: dict[str, Any]):
+    """Camada de votos da base inteira que o navegador filtra (ver delta_update); mesmo desenho da graduada."""
+    if not geojson.get("features"):
+        return
+    columns, fields = votes_columns(name, geojson)
+    paint = {
+        "color": style.get("color", "#1f6feb"), "weight": 2, "fill": True,
+        "fillColor": style.get("fillColor", "#1f6feb"), "fillOpacity": 0.6,
+    }
+    _FilterablePoints(name, columns, fields, paint, show=bool(style.get("show", True))).add_to(m)
+
+
+class _DeltaUpdate(folium.MacroElement):
+    _template = Template("""
+        {% macro script(this, kwargs) -%}
+        (function(masks, totals) {
+            var pts = window.lvFilterable || {}, ch = window.lvChoropleths || {};
+            Object.keys(masks).forEach(function(k) {
+                if (!pts[k]) return;
+                if (masks[k] === null) return pts[k].lvFilter(null);
+                var raw = atob(masks[k]), bits = new Uint8Array(raw.length);
+                for (var i = 0; i < raw.length; i++) bits[i] = raw.charCodeAt(i);
+                pts[k].lvFilter(bits);
+            });
+            Object.keys(totals).forEach(function(k) { if (ch[k]) ch[k](totals[k]); });
+        })({{ this.masks|tojson }}, {{ this.totals|tojson }});
+        {%- endmacro %}
+    """)
+
+    def __init__(self, masks: dict[str, str | None], totals: dict[str, list[int]]):
+        super().__init__()
+        self._name = "DeltaUpdate"
+        self.masks = masks
+        self.totals = totals
+
+
+def delta_update(
+    visible: dict[str, np.ndarray | None] | None = None,
+    totals: dict[str, np.ndarray] | None = None,
+) -> folium.FeatureGroup:
+    """O que muda com o filtro nas camadas já enviadas, em poucos KB.
+
+    `visible`: camada de add_filterable_votes_layer -> índices das feições no filtro
+    (None = todas), enviados como bitmap em base64. `totals`: coroplético -> total por polígono.
+    """
+    masks = {}
+    for key, fids in (visible or {}).items():
+        if fids is None:
+            masks[key] = None
+            continue
+        fids = np.asarray(fids, dtype=np.int64)
+        bits = np.zeros(int(fids.max()) + 1 if len(fids) else 1, dtype=bool)
+        bits[fids] = True
+        masks[key] = base64.b64encode(np.packbits(bits, bitorder="little").tobytes()).decode()
+    fg = folium.FeatureGroup(name="lv_delta", control=False)
+    _DeltaUpdate(masks, {k: [int(v) for v in t] for k, t in (totals or {}).items()}).add_to(fg)
+    return fg
+
+
+class _DynamicVisibility(folium.MacroElement):
+    """O st_folium sempre liga os grupos novos; este script desliga os que devem abrir ocultos."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) -%}
+        (function(group, name, show) {
+            var on = (window.lvVisible || {})[name];
+            if (on === undefined ? !show : !on) {
+                setTimeout(function() { if (group._map) group._map.removeLayer(group); }, 0);
+            }
+        })({{ this._parent.get_name() }}, {{ this.layer|tojson }}, {{ this.show|tojson }});
+        {%- endmacro %}
+    """)
+
+    def __init__(self, layer: str, show: bool):
+        super().__init__()
+        self._name = "DynamicVisibility"
+        self.layer = layer
+        self.show = bool(show)
+
+
+def dynamic_group(name: str, show: bool = True) -> folium.FeatureGroup:
+    """Grupo de uma camada refeita a cada filtro (vai em `feature_group_to_add`).
+
+    Abre como `show` ou como o usuário a deixou no controle de camadas.
+    """
+    fg = folium.FeatureGroup(name=name)
+    _DynamicVisibility(name, show).add_to(fg)
+    return fg
+
+
+class _LayerMemory(folium.MacroElement):
+    """Lembra as camadas ligadas/desligadas pelo usuário (lidas por _DynamicVisibility)."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) -%}
+        window.lvVisible = window.lvVisible || {};
+        {{ this._parent.get_name() }}.on("overlayadd overlayremove", function(e) {
+            if (window.layer_control && !window.layer_control._handlingClick) return;
+            window.lvVisible[e.name] = e.type === "overlayadd";
+        });
+        {%- endmacro %}
+    """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = "LayerMemory"
+
+
+@contextmanager
+def reusable(m: folium.Map):
+    """Desfaz, na saída, os filhos que render() e o st_folium penduram nos elementos do mapa
+    (SetIcon dos marcadores, grupos, controle de camadas): o mesmo mapa sai igual da próxima vez."""
+    seen = []
+    todo = [m.get_root()]
+    while todo:
+        el = todo.pop()
+        children = getattr(el, "_children", None)
+        if children is None:
+            continue
+        seen.append((el, set(children)))
+        todo.extend(children.values())
+    try:
+        yield m
+    finally:
+        for el, keys in seen:
+            for name in [k for k in el._children if k not in keys]:
+                del el._children[name]
+
+
+def layer_control() -> folium.LayerControl:
+    return folium.LayerControl(position='topleft', collapsed=True)
+
+
+def finalize_map(m: folium.Map, control: bool = True):
+    """Controle de camadas e CSS. Com `control=False`, o controle vai pelo st_folium
+    (`layer_control=`), para incluir os grupos dinâmicos."""
+    if control:
+        layer_control().add_to(m)
+    _LayerMemory().add_to(m)
+
     # CSS para garantir visibilidade dos controles em todas as telas
     css = """
     <style>
@@ -0,0 +1,227 @@
+"""Contabilidade de memória: por sessão, do cache compartilhado e do processo.
+
+- `sizeof(obj)` estima os bytes de um objeto seguindo referências (DataFrames,
+  GeoJSON em dict/list, árvores de elementos do folium).
+- `record_session(...)` guarda, por sessão do Streamlit, os bytes por categoria
+  (DataFrames, GeoJSON, mapa) medidos no fim de cada execução da página.
+- `budget_bytes()` é o teto do processo: `LOCALIZA_MEMORY_BUDGET_MB` ou, se não
+  definido, 80% do limite de memória do container (cgroup). O cache compartilhado
+  usa uma fração desse teto e descarta as entradas menos usadas ao passar dele;
+  `relieve_pressure()` esvazia metade do cache quando o processo inteiro passa do teto.
+"""
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+from .config import CACHE_BUDGET_FRACTION, MEMORY_BUDGET_MB
+
+log = logging.getLogger(__name__)
+
+_SCALARS = (str, bytes, bytearray, int, float, complex, bool, type(None))
+_OPAQUE = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType, threading.Thread)
+
+# coleções maiores que isso são medidas por amostragem (feições, marcadores do mapa)
+SAMPLE_OVER = 2000
+SAMPLE_SIZE = 200
+
+# sessões sem execução há mais tempo que isso saem do relatório
+SESSION_TTL_S = 30 * 60
+
+_sessions_lock = threading.Lock()
+_sessions: dict[str, dict[str, Any]] = {}
+_budget: int | None = None
+
+
+def sizeof(obj: Any, seen: set[int] | None = None) -> int:
+    """Bytes aproximados de `obj` e de tudo que ele referencia.
+
+    Objetos cujo id já está em `seen` não são contados (use para excluir o que é
+    compartilhado ou já medido). Funções, classes e módulos são ignorados.
+    Listas e dicts com mais de `SAMPLE_OVER` itens são estimados a partir de
+    uma amostra espaçada, o que mantém a medição de 25 mil feições em milissegundos.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        i = id(o)
+        if i in seen:
+            continue
+        seen.add(i)
+        if isinstance(o, _SCALARS):
+            total += sys.getsizeof(o)
+        elif isinstance(o, pd.DataFrame):
+            total += int(o.memory_usage(deep=True, index=True).sum())
+        elif isinstance(o, (pd.Series, pd.Index)):
+            total += int(o.memory_usage(deep=True))
+        elif isinstance(o, np.ndarray):
+            # view: getsizeof não inclui os dados
+            total += sys.getsizeof(o) if o.base is None else o.nbytes
+        elif isinstance(o, _OPAQUE):
+            continue
+        elif isinstance(o, dict):
+            total += sys.getsizeof(o)
+            if len(o) > SAMPLE_OVER:
+                total += _sampled(list(o.items()), seen)
+            else:
+                stack.extend(o.keys())
+                stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            total += sys.getsizeof(o)
+            if len(o) > SAMPLE_OVER:
+                total += _sampled(o if isinstance(o, (list, tuple)) else list(o), seen)
+            else:
+                stack.extend(o)
+        else:
+            total += sys.getsizeof(o)
+            d = getattr(o, "__dict__", None)
+            if d is not None:
+                stack.append(d)
+    return total
+
+
+def _sampled(items, seen: set[int]) -> int:
+    step = max(1, len(items) // SAMPLE_SIZE)
+    sample = items[::step]
+    return int(sum(sizeof(x, seen) for x in sample) * len(items) / len(sample))
+
+
+def shared_ids() -> set[int]:
+    """Ids dos objetos do cache compartilhado (incluindo as feições de GeoJSON).
+
+    Usado como `seen` inicial ao medir uma sessão, para que o que ela só
+    referencia do cache não seja contado de novo.
+    """
+    from . import cache
+
+    ids: set[int] = set()
+    for _key, value in cache.entries():
+        ids.add(id(value))
+        if isinstance(value, dict) and isinstance(value.get("features"), list):
+            ids.add(id(value["features"]))
+            for ft in value["features"]:
+                ids.add(id(ft))
+                if isinstance(ft, dict):
+                    # cópias rasas das feições (ex.: coroplético) ainda apontam para a geometria
+                    ids.add(id(ft.get("geometry")))
+    return ids
+
+
+def rss_bytes() -> int | None:
+    """Memória residente do processo agora (Linux); pico, em outros sistemas."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+def container_limit_bytes() -> int | None:
+    """Limite de memória do container (cgroup v2 ou v1), se houver."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            raw = Path(path).read_text().strip()
+        except OSError:
+            continue
+        if raw.isdigit() and int(raw) < 1 << 60:
+            return int(raw)
+    return None
+
+
+def budget_bytes() -> int | None:
+    """Teto de memória do processo (None = sem teto)."""
+    global _budget
+    if _budget is None:
+        if MEMORY_BUDGET_MB > 0:
+            _budget = MEMORY_BUDGET_MB * 1024 * 1024
+        else:
+            limit = container_limit_bytes()
+            _budget = int(limit * 0.8) if limit else 0
+    return _budget or None
+
+
+def cache_budget_bytes() -> int | None:
+    budget = budget_bytes()
+    return int(budget * CACHE_BUDGET_FRACTION) if budget else None
+
+
+def relieve_pressure() -> bool:
+    """Se o processo passou do teto, esvazia metade do cache (mais antigos primeiro).
+
+    Chamado no início de cada execução da página; barato quando não há pressão.
+    """
+    from . import cache
+
+    budget = budget_bytes()
+    rss = rss_bytes()
+    if not budget or rss is None or rss <= budget:
+        return False
+    before = cache.total_bytes()
+    evicted = cache.evict_to(before // 2)
+    gc.collect()
+    log.warning(
+        "memória acima do teto (%.0f MB > %.0f MB): %d entradas do cache descartadas (%.0f MB)",
+        rss / 2**20, budget / 2**20, evicted, (before - cache.total_bytes()) / 2**20,
+    )
+    return evicted > 0
+
+
+def record_session(session_id: str, label: str, categories: dict[str, Iterable[Any]]) -> dict[str, int]:
+    """Mede os objetos de uma execução por categoria e guarda o resultado da sessão.
+
+    `categories` mapeia nome -> objetos (ex.: {"dataframes": [df_f, df_sel]}).
+    O que está no cache compartilhado não entra na conta da sessão.
+    """
+    seen = shared_ids()
+    sizes = {name: sum(sizeof(o, seen) for o in objs if o is not None) for name, objs in categories.items()}
+    now = time.time()
+    with _sessions_lock:
+        _sessions[session_id] = {"label": label, "t": now, "bytes": sizes}
+        for sid in [s for s, v in _sessions.items() if now - v["t"] > SESSION_TTL_S]:
+            del _sessions[sid]
+    return sizes
+
+
+def sessions() -> dict[str, dict[str, Any]]:
+    with _sessions_lock:
+        return {k: {**v, "bytes": dict(v["bytes"])} for k, v in _sessions.items()}
+
+
+def report() -> dict[str, Any]:
+    """Resumo para o painel de admin: processo, teto, cache e sessões."""
+    from . import cache
+
+    by_kind: dict[str, dict[str, int]] = {}
+    for kind, nbytes in cache.sizes():
+        agg = by_kind.setdefault(kind, {"entradas": 0, "bytes": 0})
+        agg["entradas"] += 1
+        agg["bytes"] += nbytes
+    sess = sessions()
+    return {
+        "rss": rss_bytes(),
+        "teto": budget_bytes(),
+        "teto_cache": cache_budget_bytes(),
+        "cache": cache.total_bytes(),
+        "cache_por_tipo": by_kind,
+        "sessoes": sess,
+        "sessoes_total": sum(sum(v["bytes"].values()) for v in sess.values()),
+    }
@@ -0,0 +1,163 @@
+"""Medição de tempo por etapa (carregamento, filtros, mapa, gráficos...).
+
+Uso:
+    with stage("mapa.montar") as rec:
+        ...
+        rec["rows"] = len(df)
+
+    @timed("chart_top_locais", rows=lambda df, *a, **k: len(df))
+    def chart_top_locais(df, ...): ...
+
+Cada rerun da página abre uma execução (`start_run`/`end_run`); as etapas medidas
+durante ela são acumuladas e, no fim, vão para o log `localiza.perf` como uma
+linha JSON. Fora de uma execução (ex.: warm-up) as etapas só vão para o log em
+nível DEBUG.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+log = logging.getLogger("localiza.perf")
+if os.environ.get("LOCALIZA_PERF_LOG", "1") != "0" and not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+_run: ContextVar[dict[str, Any] | None] = ContextVar("localiza_perf_run", default=None)
+
+
+def start_run(label: str, detailed: bool = False) -> dict[str, Any]:
+    """Abre uma execução. `detailed` liga medições caras (bytes de HTML/JSON)."""
+    run = {"id": uuid.uuid4().hex[:12], "label": label, "detailed": detailed, "t0": time.perf_counter(), "depth": 0, "stages": []}
+    _run.set(run)
+    return run
+
+
+def end_run() -> dict[str, Any] | None:
+    """Fecha a execução corrente e emite o resumo estruturado no log."""
+    run = _run.get()
+    if run is None:
+        return None
+    _run.set(None)
+    run["total_ms"] = (time.perf_counter() - run["t0"]) * 1000
+    log.info(json.dumps({
+        "event": "run",
+        "run": run["id"],
+        "label": run["label"],
+        "total_ms": round(run["total_ms"], 1),
+        "stages": [{k: v for k, v in s.items() if v is not None} for s in run["stages"]],
+    }, ensure_ascii=False))
+    return run
+
+
+def current_run() -> dict[str, Any] | None:
+    return _run.get()
+
+
+def detailed() -> bool:
+    """True se a execução corrente pediu medições caras (ex.: tamanho do HTML)."""
+    run = _run.get()
+    return bool(run and run["detailed"])
+
+
+def begin(name: str, rows: int | None = None, nbytes: int | None = None) -> dict[str, Any]:
+    """Abre uma etapa sem `with` (para trechos longos). Feche com `finish`."""
+    rec: dict[str, Any] = {"stage": name, "ms": None, "rows": rows, "bytes": nbytes, "depth": 0}
+    run = _run.get()
+    if run is not None:
+        # registrado na entrada para que etapas aninhadas apareçam depois da etapa-mãe
+        rec["depth"] = run["depth"]
+        run["stages"].append(rec)
+        run["depth"] += 1
+    rec["_t0"] = time.perf_counter()
+    rec["_run"] = run
+    return rec
+
+
+def finish(rec: dict[str, Any]) -> None:
+    if rec.get("ms") is not None:
+        return
+    rec["ms"] = round((time.perf_counter() - rec.pop("_t0")) * 1000, 2)
+    run = rec.pop("_run")
+    if run is not None:
+        run["depth"] -= 1
+    elif log.isEnabledFor(logging.DEBUG):
+        log.debug(json.dumps({"event": "stage", **rec}, ensure_ascii=False))
+
+
+@contextmanager
+def stage(name: str, rows: int | None = None, nbytes: int | None = None) -> Iterator[dict[str, Any]]:
+    """Mede o bloco. O dict devolvido aceita `rows` e `bytes` preenchidos dentro do bloco."""
+    rec = begin(name, rows, nbytes)
+    try:
+        yield rec
+    finally:
+        finish(rec)
+
+
+def timed(name: str | None = None, rows: Callable[..., int] | None = None):
+    """Decorador: mede a função como uma etapa. `rows(*args, **kwargs)` conta as linhas de entrada."""
+
+    def deco(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(label) as rec:
+                if rows is not None:
+                    try:
+                        rec["rows"] = int(rows(*args, **kwargs))
+                    except Exception:
+                        pass
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+def in_run(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Envolve `fn` para rodar noutra thread (ex.: pool) medindo na execução corrente.
+
+    A lista de etapas é compartilhada; a profundidade é da thread, para etapas
+    simultâneas não se aninharem umas nas outras.
+    """
+    run = _run.get()
+    depth = run["depth"] if run is not None else 0
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _run.set({**run, "depth": depth} if run is not None else None)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _run.reset(token)
+
+    return wrapper
+
+
+def summarize(run: dict[str, Any] | None) -> list[dict[str, Any]]:
+    """Linhas prontas para tabela: etapa (recuada se aninhada), ms, % do total, linhas, bytes."""
+    if not run:
+        return []
+    total = run.get("total_ms") or sum(s["ms"] or 0 for s in run["stages"] if s["depth"] == 0) or 1.0
+    return [
+        {
+            "Etapa": "\u00a0\u00a0" * s["depth"] + s["stage"],
+            "ms": s["ms"],
+            "%": round(100.0 * (s["ms"] or 0) / total, 1),
+            "Linhas": s["rows"],
+            "Bytes": s["bytes"],
+        }
+        for s in run["stages"]
+    ]
@@ -0,0 +1,162 @@
+"""Pirâmide de totais de votos por nível (município → bairro/distrito ou zona → local).
+
+Cada nível é uma tabela pequena (nome, posição ponderada pelos votos, total,
+quantidade de seções), ordenada do maior para o menor total. O mapa mostra um
+nível por faixa de zoom: totais municipais no estado inteiro, bairros/distritos
+na cidade e os locais de votação de perto. As seções de um local ficam no mesmo
+ponto, então o nível mais fino é o local (com o número de seções na dica).
+
+A pirâmide da base inteira é montada na ingestão e gravada num sidecar
+(`votos_*.piramide.parquet`, ao lado do sidecar da base); com filtros, ela é
+refeita a partir das linhas filtradas (um `groupby` por nível).
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+from . import cache
+from .io_geo import file_digest
+
+# (nível, rótulo, zoom a partir do qual aparece)
+LEVELS = (
+    ("municipio", "🏛️ Município", 0),
+    ("bairro", "🏘️ Bairro/Distrito", 10),
+    ("zona", "🗳️ Zona eleitoral", 10),  # no lugar do bairro, quando a base não tem bairro
+    ("local", "📍 Local de votação", 13),
+)
+
+# níveis com mais linhas que isso não vão para o navegador (o anterior segue valendo)
+MAX_ROWS = 8000
+
+# marcadores desenhados de uma vez (os maiores totais dentro da tela)
+MAX_MARKERS = 300
+
+PYRAMID_FORMAT = 2
+_SIDECAR_META = b"localiza"
+
+
+def _column(df: pd.DataFrame, *names: str) -> str | None:
+    for name in names:
+        if name in df.columns and (df[name].astype(str).str.strip() != "").any():
+            return name
+    return None
+
+
+def _aggregate(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    w = pd.to_numeric(df["qt_votos"], errors="coerce").fillna(0.0)
+    tmp = pd.DataFrame({
+        "votos": w,
+        "wlat": df["lat"] * w,
+        "wlon": df["lon"] * w,
+        "lat": df["lat"],
+        "lon": df["lon"],
+        **{f"k{i}": df[k].astype(str) for i, k in enumerate(keys)},
+    })
+    g = tmp.groupby([f"k{i}" for i in range(len(keys))], sort=False)
+    out = g.agg(votos=("votos", "sum"), wlat=("wlat", "sum"), wlon=("wlon", "sum"),
+                lat=("lat", "mean"), lon=("lon", "mean"), secoes=("votos", "size"))
+    # posição ponderada pelos votos (cai onde os votos estão); média simples se o total é zero
+    pos = out["votos"] > 0
+    out.loc[pos, "lat"] = out.loc[pos, "wlat"] / out.loc[pos, "votos"]
+    out.loc[pos, "lon"] = out.loc[pos, "wlon"] / out.loc[pos, "votos"]
+    names = out.index.get_level_values(len(keys) - 1) if len(keys) > 1 else out.index
+    out = out.assign(nome=[str(n) for n in names]).reset_index(drop=True)
+    cols = ["nome", "lat", "lon", "votos", "secoes"]
+    return out[cols].sort_values("votos", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def build_pyramid(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Nível -> tabela de totais, só com os níveis que existem na base e cabem em `MAX_ROWS`."""
+    if df.empty or "qt_votos" not in df.columns:
+        return {}
+    mun = _column(df, "NM_MUNICIPIO", "Município")
+    bairro = _column(df, "Bairro/Distrito")
+    local = _column(df, "NM_LOCAL_VOTACAO", "local_votacao")
+    if mun and not bairro and "properties" in df.columns:
+        zona = df["properties"].map(lambda p: p.get("NR_ZONA") if isinstance(p, dict) else None)
+        if zona.notna().any():
+            df = df.assign(_zona=("Zona " + zona.astype(str)).where(zona.notna(), ""))
+    keys = {
+        "municipio": [mun] if mun else None,
+        "bairro": [mun, bairro] if mun and bairro else None,
+        "zona": [mun, "_zona"] if mun and "_zona" in df.columns else None,
+        "local": [mun, local] if mun and local else None,
+    }
+    levels: dict[str, pd.DataFrame] = {}
+    prev = None
+    for name, _label, _zoom in LEVELS:
+        if not keys[name]:
+            continue
+        table = _aggregate(df, keys[name])
+        # nível que não detalha o anterior (ex.: um único bairro por município) não acrescenta nada
+        if len(table) > MAX_ROWS or (prev is not None and len(table) <= prev):
+            continue
+        levels[name] = table
+        prev = len(table)
+    return levels
+
+
+def zoom_ranges(levels: dict[str, pd.DataFrame]) -> list[tuple[str, str, int, int | None]]:
+    """(nível, rótulo, zoom inicial, zoom final exclusivo) dos níveis presentes, sem buracos."""
+    present = [(n, label, z) for n, label, z in LEVELS if n in levels]
+    out = []
+    for i, (name, label, z) in enumerate(present):
+        start = 0 if i == 0 else z
+        end = present[i + 1][2] if i + 1 < len(present) else None
+        out.append((name, label, start, end))
+    return out
+
+
+def pyramid_sidecar_path(votos_file: Path) -> Path:
+    return Path(votos_file).with_suffix(".piramide.parquet")
+
+
+def write_pyramid_sidecar(votos_file: Path, df: pd.DataFrame, digest: str | None = None) -> Path | None:
+    """Grava a pirâmide da base (todos os níveis numa tabela, coluna `nivel`), amarrada ao hash do GeoJSON."""
+    if pq is None:
+        return None
+    out = pyramid_sidecar_path(votos_file)
+    levels = build_pyramid(df)
+    table = pa.Table.from_pandas(
+        pd.concat([t.assign(nivel=name) for name, t in levels.items()], ignore_index=True)
+        if levels else pd.DataFrame(columns=["nome", "lat", "lon", "votos", "secoes", "nivel"]),
+        preserve_index=False,
+    )
+    meta = {"format": PYRAMID_FORMAT, "source_digest": digest or file_digest(votos_file), "levels": list(levels)}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _SIDECAR_META: json.dumps(meta).encode()})
+    tmp = out.with_suffix(".tmp")
+    pq.write_table(table, tmp)
+    tmp.replace(out)
+    return out
+
+
+def read_pyramid_sidecar(votos_file: Path) -> dict[str, pd.DataFrame] | None:
+    side = pyramid_sidecar_path(votos_file)
+    if pq is None or not side.exists():
+        return None
+    try:
+        meta = json.loads((pq.read_schema(side).metadata or {}).get(_SIDECAR_META, b"{}"))
+        if meta.get("format") != PYRAMID_FORMAT or meta.get("source_digest") != file_digest(votos_file):
+            return None
+        rows = pq.read_table(side).to_pandas()
+        return {
+            name: rows[rows["nivel"] == name].drop(columns="nivel").reset_index(drop=True)
+            for name in meta.get("levels") or []
+        }
+    except Exception:
+        return None
+
+
+def votos_pyramid(votos_file: Path, df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Pirâmide da base inteira: sidecar da ingestão ou, sem ele, montada uma vez e compartilhada."""
+    return cache.get_or_build("piramide", votos_file, lambda: read_pyramid_sidecar(votos_file) or build_pyramid(df))
@@ -0,0 +1,281 @@
+"""Relatórios para impressão (PDF/PNG), um por município de cada base de votos.
+
+Cada página A4 traz os números do município (votos, participação no total do
+candidato na base, posição, locais e pontos), o mapa dos pontos de votação e
+os gráficos de `charts` (top locais e faixas de votos). Tudo é desenhado
+offline com Pillow: o mapa sai dos mesmos círculos graduados dos tiles
+(`tiles.render_view`, sem mapa de fundo) e os gráficos Altair viram PNG pelo
+vl-convert (`vl-convert-python`, em requirements.txt); se ele faltar ou
+falhar, as barras são desenhadas a partir dos dados e da codificação do
+próprio gráfico.
+
+`build_report` é uma função de módulo, para rodar em processos separados
+(`gerar_relatorios.py`). O arquivo leva no nome o hash de (candidato, versão
+da base, município, `REPORT_FORMAT`): se já existe, não é refeito; versões
+antigas do mesmo município são apagadas ao gravar a nova.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    import vl_convert
+except Exception:
+    vl_convert = None
+
+from . import cache
+from .analytics import load_votos_df_cached
+from .charts import chart_hist_votos, chart_top_locais
+from .config import REPORT_DPI, REPORTS_DIR
+from .profiling import stage
+from .styles import load_layer_styles, resolve_layer_style
+from .tiles import BOUNDS_PAD, render_view, votes_raster
+
+# mude ao alterar o layout: força refazer todos
+REPORT_FORMAT = 2
+
+# A4 em pixels no REPORT_DPI
+PAGE_SIZE = (round(8.27 * REPORT_DPI), round(11.69 * REPORT_DPI))
+MARGIN = round(0.4 * REPORT_DPI)
+INK = "#1f2933"
+MUTED = "#616e7c"
+LINE = "#cbd2d9"
+CONTEXT_STYLE = {"color": "#9aa5b1", "fillColor": "#9aa5b1"}
+
+
+@dataclass
+class ReportJob:
+    candidate: str
+    title: str
+    votos_file: Path
+    municipio: str
+    out_dir: Path = REPORTS_DIR
+    png: bool = False
+    force: bool = False
+
+
+def municipio_column(df: pd.DataFrame) -> str:
+    return "NM_MUNICIPIO" if "NM_MUNICIPIO" in df.columns else "municipio"
+
+
+def municipio_totals(votos_file: Path) -> pd.Series:
+    """Votos por município na base, do maior para o menor (sem nomes vazios)."""
+    def build() -> pd.Series:
+        df = load_votos_df_cached(votos_file)
+        names = df[municipio_column(df)].astype(str).str.strip()
+        totals = df["qt_votos"].groupby(names).sum()
+        return totals[totals.index != ""].sort_values(ascending=False)
+
+    return cache.get_or_build("relatorio_totais", votos_file, build)
+
+
+def slug(text: str) -> str:
+    plain = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", plain.lower()).strip("_") or "municipio"
+
+
+def report_key(candidate: str, votos_file: Path, municipio: str) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    h.update(f"formato={REPORT_FORMAT}\n{candidate}\n{municipio}\n".encode())
+    h.update(repr(cache.file_key(votos_file)).encode())
+    return h.hexdigest()
+
+
+def report_path(job: ReportJob, ext: str = "pdf") -> Path:
+    key = report_key(job.candidate, job.votos_file, job.municipio)
+    return job.out_dir / job.candidate / job.votos_file.stem / f"{slug(job.municipio)}-{key}.{ext}"
+
+
+def _font(size: int) -> ImageFont.ImageFont:
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        pass
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1: só a fonte bitmap, de tamanho fixo
+        return ImageFont.load_default()
+
+
+def _fmt_int(n: float) -> str:
+    return f"{int(round(n)):,}".replace(",", ".")
+
+
+def _fit(img: Image.Image, box: tuple[int, int]) -> Image.Image:
+    img = img.convert("RGB")
+    img.thumbnail(box, Image.LANCZOS)
+    return img
+
+
+def _bars(chart, size: tuple[int, int]) -> Image.Image:
+    """Barras simples a partir dos dados e da codificação x/y do gráfico (sem vl-convert)."""
+    spec = chart.to_dict()
+    enc = spec.get("encoding") or {}
+    mark = spec.get("mark") or {}
+    color = (mark.get("color") if isinstance(mark, dict) else None) or "#4c78a8"
+    x, y = enc.get("x") or {}, enc.get("y") or {}
+    horizontal = x.get("type") == "quantitative"
+    value, label = (x, y) if horizontal else (y, x)
+    data = chart.data
+    labels = data[label["field"]].astype(str).tolist()
+    values = pd.to_numeric(data[value["field"]], errors="coerce").fillna(0).tolist()
+    top = max(values) if values and max(values) > 0 else 1
+
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    font = _font(16)
+    w, h = size
+    if horizontal:
+        label_w = min(int(w * 0.45), max(int(draw.textlength(t[:48], font=font)) for t in labels) + 12)
+        row = min(36, (h - 10) / max(len(labels), 1))
+        bar_h = max(4, row * 0.7)
+        for i, (t, v) in enumerate(zip(labels, values)):
+            cy = 5 + row * i + row / 2
+            draw.text((label_w - 8, cy), t[:48], fill=INK, font=font, anchor="rm")
+            end = label_w + (w - label_w - 90) * v / top
+            draw.rectangle((label_w, cy - bar_h / 2, end, cy + bar_h / 2), fill=color)
+            draw.text((end + 6, cy), _fmt_int(v), fill=MUTED, font=font, anchor="lm")
+    else:
+        col = (w - 20) / max(len(labels), 1)
+        base = h - 30
+        for i, (t, v) in enumerate(zip(labels, values)):
+            cx = 10 + col * i + col / 2
+            top_y = base - (base - 30) * v / top
+            draw.rectangle((cx - col * 0.35, top_y, cx + col * 0.35, base), fill=color)
+            draw.text((cx, top_y - 4), _fmt_int(v), fill=MUTED, font=font, anchor="mb")
+            draw.text((cx, base + 6), t, fill=INK, font=font, anchor="mt")
+        draw.line((0, base, w, base), fill=LINE, width=1)
+    return img
+
+
+def chart_image(chart, size: tuple[int, int]) -> Image.Image:
+    """Gráfico Altair em imagem do tamanho da caixa (vl-convert ou barras desenhadas aqui)."""
+    if vl_convert is not None:
+        try:
+            # "fit": eixos e rótulos entram na caixa (metade do tamanho, scale=2)
+            spec = chart.properties(
+                width=size[0] // 2, height=size[1] // 2, autosize={"type": "fit", "contains": "padding"},
+            ).to_json()
+            png = vl_convert.vegalite_to_png(vl_spec=spec, scale=2)
+            return _fit(Image.open(io.BytesIO(png)), size)
+        except Exception:
+            pass
+    return _bars(chart, size)
+
+
+def map_image(votos_file: Path, df_mun: pd.DataFrame, size: tuple[int, int]) -> Image.Image:
+    """Pontos do município sobre os demais pontos da base (cinza), enquadrados no município."""
+    stem = votos_file.stem
+    style = resolve_layer_style({"stem": stem, "filename": votos_file.name, "geom": "Point", "type": stem}, load_layer_styles())
+    context = cache.get_or_build(
+        "relatorio_contexto", votos_file, lambda: votes_raster(load_votos_df_cached(votos_file), CONTEXT_STYLE),
+    )
+    layer = votes_raster(df_mun, style)
+    layers = [lyr for lyr in (context, layer) if lyr is not None]
+    if layer is None:
+        return Image.new("RGB", size, "#f4f6f8")
+    bounds = layer.bounds()
+    # um ponto só (ex.: base por município): mostra os municípios vizinhos
+    pad = 0.6
+    if bounds[1][0] - bounds[0][0] <= 2 * BOUNDS_PAD and bounds[1][1] - bounds[0][1] <= 2 * BOUNDS_PAD:
+        bounds = [[bounds[0][0] - pad, bounds[0][1] - pad], [bounds[1][0] + pad, bounds[1][1] + pad]]
+    return render_view(layers, bounds, size)
+
+
+def kpis(votos_file: Path, df_mun: pd.DataFrame, municipio: str) -> list[tuple[str, str]]:
+    totals = municipio_totals(votos_file)
+    votos = float(df_mun["qt_votos"].sum())
+    total = float(totals.sum())
+    rank = list(totals.index).index(municipio) + 1 if municipio in totals.index else None
+    local_col = "NM_LOCAL_VOTACAO" if "NM_LOCAL_VOTACAO" in df_mun.columns else "local_votacao"
+    locais = df_mun[local_col].astype(str).str.strip() if local_col in df_mun.columns else pd.Series(dtype=str)
+    return [
+        ("Votos", _fmt_int(votos)),
+        ("do total na base", f"{100 * votos / total:.1f}%".replace(".", ",") if total else "–"),
+        ("posição na base", f"{rank}º de {len(totals)}" if rank else "–"),
+        ("locais / pontos", f"{_fmt_int(locais[locais != ''].nunique())} / {_fmt_int(len(df_mun))}"),
+    ]
+
+
+def compose_page(job: ReportJob, df_mun: pd.DataFrame) -> Image.Image:
+    """Página A4: título, números, mapa e gráficos."""
+    page = Image.new("RGB", PAGE_SIZE, "white")
+    draw = ImageDraw.Draw(page)
+    w, h = PAGE_SIZE
+    inner = w - 2 * MARGIN
+    y = MARGIN
+
+    draw.text((MARGIN, y), f"{job.title} — {job.municipio}", fill=INK, font=_font(40))
+    y += 56
+    draw.text(
+        (MARGIN, y), f"Base {job.votos_file.stem} · gerado em {datetime.now():%d/%m/%Y %H:%M}", fill=MUTED, font=_font(20),
+    )
+    y += 50
+
+    cards = kpis(job.votos_file, df_mun, job.municipio)
+    gap = 20
+    card_w = (inner - gap * (len(cards) - 1)) // len(cards)
+    for i, (label, value) in enumerate(cards):
+        x = MARGIN + i * (card_w + gap)
+        draw.rounded_rectangle((x, y, x + card_w, y + 110), radius=10, outline=LINE, width=2)
+        draw.text((x + 18, y + 16), value, fill=INK, font=_font(34))
+        draw.text((x + 18, y + 70), label, fill=MUTED, font=_font(18))
+    y += 140
+
+    map_h = 540
+    with stage("relatorio.mapa", rows=len(df_mun)):
+        page.paste(map_image(job.votos_file, df_mun, (inner, map_h)), (MARGIN, y))
+    draw.rectangle((MARGIN, y, MARGIN + inner, y + map_h), outline=LINE, width=2)
+    y += map_h + 30
+
+    sections = [
+        ("Locais com mais votos", chart_top_locais(df_mun, top_n=12), 400),
+        ("Pontos por faixa de votos", chart_hist_votos(df_mun), h - MARGIN - y - 400 - 2 * 46),
+    ]
+    for heading, chart, box_h in sections:
+        draw.text((MARGIN, y), heading, fill=INK, font=_font(24))
+        y += 36
+        if chart is None:
+            draw.text((MARGIN, y), "Sem dados", fill=MUTED, font=_font(18))
+        else:
+            with stage("relatorio.grafico"):
+                page.paste(chart_image(chart, (inner, box_h)), (MARGIN, y))
+        y += box_h + 10
+    return page
+
+
+def build_report(job: ReportJob) -> dict[str, Any]:
+    """Gera (ou reaproveita) o relatório do município; devolve caminho e se saiu do cache."""
+    pdf = report_path(job)
+    png = report_path(job, "png")
+    if not job.force and pdf.exists() and (png.exists() or not job.png):
+        return {"municipio": job.municipio, "path": pdf, "cached": True}
+
+    df = load_votos_df_cached(job.votos_file)
+    df_mun = df[df[municipio_column(df)].astype(str).str.strip() == job.municipio]
+    with stage(f"relatorio:{job.candidate}/{job.votos_file.stem}", rows=len(df_mun)) as rec:
+        page = compose_page(job, df_mun)
+        pdf.parent.mkdir(parents=True, exist_ok=True)
+        outputs = [(pdf, "PDF")] + ([(png, "PNG")] if job.png else [])
+        for path, fmt in outputs:
+            tmp = path.with_name(f".{path.name}")
+            page.save(tmp, fmt, resolution=REPORT_DPI)
+            tmp.replace(path)
+        rec["bytes"] = pdf.stat().st_size
+
+    # versões anteriores (layout ou arquivo da base mudaram) do mesmo município
+    for old in pdf.parent.glob(f"{slug(job.municipio)}-*.*"):
+        if old.stem.rpartition("-")[0] == slug(job.municipio) and old.stem != pdf.stem:
+            old.unlink(missing_ok=True)
+    return {"municipio": job.municipio, "path": pdf, "cached": False}
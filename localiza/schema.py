@@ -97,13 +97,18 @@ def safe_number(v: Any) -> float | None:
 def pick_prop(props: dict[str, Any], keys: Iterable[str]) -> Any:
     if not isinstance(props, dict):
         return None
+    lower: dict[str, Any] | None = None
     for k in keys:
         if k in props:
             return props.get(k)
-        # tenta case-insensitive
-        for kk in props.keys():
-            if str(kk).lower() == str(k).lower():
-                return props.get(kk)
+        # tenta case-insensitive (mapa montado uma vez só, na primeira falha)
+        if lower is None:
+            lower = {}
+            for kk in props.keys():
+                lower.setdefault(str(kk).lower(), kk)
+        kk = lower.get(str(k).lower())
+        if kk is not None:
+            return props.get(kk)
     return None
 
 
@@ -128,6 +133,48 @@ def get_latlon(props: dict[str, Any], geom: dict[str, Any]) -> tuple[float | Non
     return None, None
 
 
+def rescale_to_range(value: float, limit: float, max_divs: int = 12) -> float:
+    """
+    Se vier como inteiro sem vírgula (ex: -382093835), divide por 10 até caber na faixa.
+    """
+    v = float(value)
+    divs = 0
+    while abs(v) > limit and divs < max_divs:
+        v = v / 10.0
+        divs += 1
+    return v
+
+
+def fix_latlon(lat, lon) -> tuple[float, float] | None:
+    """
+    Retorna (lat, lon) prontos pro Folium.
+    Corrige escala quebrada e inversão.
+    """
+    try:
+        lat_f = float(lat)
+        lon_f = float(lon)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(lat_f) or math.isnan(lon_f):
+        return None
+
+    # 1) Corrige escala antes de qualquer coisa
+    lat_f = rescale_to_range(lat_f, 90)
+    lon_f = rescale_to_range(lon_f, 180)
+
+    # 2) Se ainda estiver estranho, tenta inverter e reescalar de novo
+    if (abs(lat_f) > 90 and abs(lon_f) <= 90) or (abs(lon_f) > 180 and abs(lat_f) <= 180):
+        lat_f, lon_f = lon_f, lat_f
+        lat_f = rescale_to_range(lat_f, 90)
+        lon_f = rescale_to_range(lon_f, 180)
+
+    # 3) Validação final
+    if not (-90 <= lat_f <= 90 and -180 <= lon_f <= 180):
+        return None
+
+    return lat_f, lon_f
+
+
 def normalize_feature(ft: dict[str, Any], tipo: str | None = None, force_nome_from: str | None = None) -> dict[str, Any]:
     props = (ft or {}).get("properties") or {}
     geom = (ft or {}).get("geometry") or {}
@@ -176,11 +223,14 @@ def normalize_feature(ft: dict[str, Any], tipo: str | None = None, force_nome_fr
 def normalize_geojson(gj: dict[str, Any], tipo: str | None = None, force_nome_from: str | None = None) -> list[dict[str, Any]]:
     feats = (gj or {}).get("features") or []
     rows: list[dict[str, Any]] = []
-    for ft in feats:
+    for i, ft in enumerate(feats):
         try:
-            rows.append(normalize_feature(ft, tipo=tipo, force_nome_from=force_nome_from))
+            row = normalize_feature(ft, tipo=tipo, force_nome_from=force_nome_from)
         except Exception:
             continue
+        # posição da feature no GeoJSON de origem (permite recortar a camada sem reprocessar)
+        row["_fid"] = i
+        rows.append(row)
     return rows
 
 
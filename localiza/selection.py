@@ -0,0 +1,231 @@
+"""Seleção de pontos por formas desenhadas no mapa (plugin Draw do folium).
+
+Cada forma vira uma chave (hash da geometria) e o conjunto de linhas da base
+dentro dela (posições em `df`, ordenadas) fica no cache compartilhado:
+
+- polígonos e retângulos: só os pontos do índice espacial no círculo que
+  envolve a forma passam pelo `contains_xy`;
+- círculos (Point + `properties.radius` em metros, como o st_folium devolve):
+  consulta por raio no mesmo índice (distância na esfera).
+
+As formas se combinam na ordem em que foram desenhadas, cada uma com sua
+operação sobre o resultado até ali: união, interseção ou subtração (operações
+de conjunto do NumPy sobre arrays ordenados). A cada evento do mapa só as
+formas novas ou editadas são testadas; os conjuntos das demais ficam guardados
+na seleção, e eventos que não mudam formas nem operações devolvem a mesma
+seleção, sem refazer nada.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from functools import reduce
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+import pandas as pd
+
+from . import cache
+from .analytics import PointIndex, _arc, _xyz, votos_point_index
+from .lazy import lazy_import
+from .profiling import stage
+from .schema import _flatten_coords
+
+# só carregam no primeiro uso (ver lazy.py)
+shapely = lazy_import("shapely")
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+# operação de cada forma sobre o resultado das anteriores (a primeira sempre entra inteira)
+OP_UNION = "uniao"
+OP_INTERSECT = "intersecao"
+OP_SUBTRACT = "subtracao"
+OPS = {
+    OP_UNION: np.union1d,
+    OP_INTERSECT: lambda a, b: np.intersect1d(a, b, assume_unique=True),
+    OP_SUBTRACT: lambda a, b: np.setdiff1d(a, b, assume_unique=True),
+}
+OP_LABELS = {OP_UNION: "∪ somar", OP_INTERSECT: "∩ cruzar", OP_SUBTRACT: "− tirar"}
+
+
+@dataclass(frozen=True)
+class DrawSelection:
+    """Formas desenhadas (chaves, na ordem do mapa), operações e linhas de `df` no resultado."""
+
+    keys: tuple[str, ...] = ()
+    ops: tuple[str, ...] = ()
+    labels: tuple[str, ...] = ()
+    rows: np.ndarray = field(default_factory=lambda: EMPTY)
+    parts: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.keys)
+
+
+def _circle(feature: dict[str, Any] | None) -> tuple[float, float, float] | None:
+    """(lat, lon, raio em km) de um círculo do Draw, senão None."""
+    geom = (feature or {}).get("geometry") or {}
+    radius = ((feature or {}).get("properties") or {}).get("radius")
+    coords = geom.get("coordinates") or []
+    if geom.get("type") != "Point" or radius is None or len(coords) < 2:
+        return None
+    try:
+        return float(coords[1]), float(coords[0]), float(radius) / 1000
+    except (TypeError, ValueError):
+        return None
+
+
+def _geometry(feature: dict[str, Any] | None) -> dict[str, Any] | None:
+    geom = (feature or {}).get("geometry") or {}
+    if str(geom.get("type") or "").lower() in ("polygon", "multipolygon") and geom.get("coordinates"):
+        return geom
+    return None
+
+
+def shape_key(feature: dict[str, Any] | None) -> str | None:
+    """Hash da geometria (coordenadas a ~1 cm); None se a forma não seleciona pontos."""
+    circle = _circle(feature)
+    geom = _geometry(feature)
+    if circle is None and geom is None:
+        return None
+    h = hashlib.blake2b(digest_size=12)
+    if circle is not None:
+        h.update(b"circle")
+        h.update(json.dumps(_round(list(circle))).encode())
+    else:
+        h.update(str(geom["type"]).lower().encode())
+        h.update(json.dumps(_round(geom["coordinates"])).encode())
+    return h.hexdigest()
+
+
+def shape_label(feature: dict[str, Any]) -> str:
+    """Descrição curta da forma para a interface."""
+    circle = _circle(feature)
+    if circle is not None:
+        return f"círculo de {circle[2]:.2f} km".replace(".", ",")
+    return "polígono"
+
+
+def _round(coords: Any) -> Any:
+    if isinstance(coords, (list, tuple)):
+        return [_round(c) for c in coords]
+    return round(float(coords), 7)
+
+
+def _candidates(index: PointIndex, pts: list) -> np.ndarray:
+    """Pontos do índice no círculo (na esfera) que envolve os vértices."""
+    arr = np.asarray(pts, dtype=float)
+    lat0 = (arr[:, 1].min() + arr[:, 1].max()) / 2
+    lon0 = (arr[:, 0].min() + arr[:, 0].max()) / 2
+    chord = np.sqrt(((_xyz(arr[:, 1], arr[:, 0]) - _xyz(np.array([lat0]), np.array([lon0]))) ** 2).sum(1))
+    radius = float(_arc(chord).max()) * 1.001 + 1e-3
+    return np.sort(index.within(lat0, lon0, radius)[0])
+
+
+def polygon_rows(index: PointIndex, feature: dict[str, Any]) -> np.ndarray:
+    """Posições (ordenadas) dos pontos do índice dentro da forma."""
+    geom = _geometry(feature)
+    pts = _flatten_coords(geom["coordinates"]) if geom else []
+    if not pts or not len(index):
+        return EMPTY
+    cand = _candidates(index, pts)
+    if not len(cand):
+        return EMPTY
+    lat, lon = index.lat[cand], index.lon[cand]
+    if shapely is None:
+        arr = np.asarray(pts, dtype=float)
+        inside = (
+            (lon >= arr[:, 0].min()) & (lon <= arr[:, 0].max())
+            & (lat >= arr[:, 1].min()) & (lat <= arr[:, 1].max())
+        )
+    else:
+        try:
+            poly = shapely.geometry.shape(geom)
+        except Exception:
+            return EMPTY
+        inside = shapely.contains_xy(poly, lon, lat)
+    return cand[inside].astype(np.int64)
+
+
+def circle_rows(index: PointIndex, lat: float, lon: float, radius_km: float) -> np.ndarray:
+    """Posições (ordenadas) dos pontos do índice a até `radius_km` do centro."""
+    if not len(index) or radius_km <= 0:
+        return EMPTY
+    return np.sort(index.within(lat, lon, radius_km)[0]).astype(np.int64)
+
+
+def shape_rows(votos_file: Path, df: pd.DataFrame, feature: dict[str, Any], key: str | None = None) -> np.ndarray:
+    """Linhas da base dentro da forma, no cache compartilhado por versão do arquivo e hash da forma."""
+    key = key or shape_key(feature)
+    if key is None:
+        return EMPTY
+
+    def build() -> np.ndarray:
+        index = votos_point_index(votos_file, df)
+        circle = _circle(feature)
+        return circle_rows(index, *circle) if circle is not None else polygon_rows(index, feature)
+
+    return cache.get_or_build("selecao_forma", votos_file, build, key)
+
+
+def combine(parts: Sequence[np.ndarray], ops: Sequence[str]) -> np.ndarray:
+    """Aplica as operações da esquerda para a direita; a operação da primeira forma é ignorada."""
+    if not len(parts):
+        return EMPTY
+    rows = parts[0]
+    for part, op in zip(parts[1:], ops[1:]):
+        rows = OPS.get(op, np.union1d)(rows, part)
+    return rows
+
+
+def drawn_shapes(drawings: list[dict[str, Any]] | None) -> dict[str, dict[str, Any]]:
+    """Formas que selecionam pontos, por chave, na ordem do desenho (repetidas contam uma vez)."""
+    shapes: dict[str, dict[str, Any]] = {}
+    for ft in drawings or []:
+        key = shape_key(ft)
+        if key is not None:
+            shapes.setdefault(key, ft)
+    return shapes
+
+
+def update(
+    prev: DrawSelection | None,
+    drawings: list[dict[str, Any]] | None,
+    votos_file: Path,
+    df: pd.DataFrame,
+    ops: Sequence[str] = (),
+) -> DrawSelection:
+    """Seleção após um evento do mapa; devolve `prev` (o mesmo objeto) se nada mudou.
+
+    `ops[i]` é a operação da i-ésima forma (na ordem do desenho); faltando, vale a união.
+    """
+    prev = prev or DrawSelection()
+    shapes = drawn_shapes(drawings)
+    keys = tuple(shapes)
+    ops = tuple(ops[i] if i < len(ops) and ops[i] in OPS else OP_UNION for i in range(len(keys)))
+    if keys == prev.keys and ops == prev.ops:
+        return prev
+
+    with stage("selecao.atualizar", rows=len(df)):
+        # só formas novas ou editadas (chave nova) passam pelo índice
+        parts = {k: prev.parts[k] if k in prev.parts else shape_rows(votos_file, df, shapes[k], k) for k in keys}
+        added = [k for k in keys if k not in prev.parts]
+        only_union = all(op == OP_UNION for op in ops + prev.ops)
+        if only_union and set(prev.keys) <= set(keys):
+            rows = reduce(np.union1d, (parts[k] for k in added), prev.rows)
+        else:
+            rows = combine([parts[k] for k in keys], ops)
+    labels = tuple(shape_label(ft) for ft in shapes.values())
+    return DrawSelection(keys, ops, labels, rows.astype(np.int64), parts)
+
+
+def rows_in_selection(df: pd.DataFrame, df_sub: pd.DataFrame, rows: np.ndarray) -> pd.DataFrame:
+    """Linhas de `df_sub` (recorte de `df`) cujas posições em `df` estão em `rows`."""
+    mask = np.zeros(len(df), dtype=bool)
+    mask[rows] = True
+    if df_sub is df:
+        return df[mask]
+    pos = df.index.get_indexer(df_sub.index)
+    return df_sub[mask[pos]]
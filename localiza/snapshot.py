@@ -0,0 +1,242 @@
+"""Mapas estáticos (HTML) por candidato e base, para servir de qualquer host sem Python.
+
+Cada página é o mapa completo do candidato sem filtros: fundo, camadas comuns e
+do candidato (coropléticos com o total da base) e os votos como arrays tipados,
+com o filtro rápido do próprio mapa. O HTML sai compacto (sem indentação) e os
+dados das camadas GeoJSON vão para `assets/<hash>.js`: uma camada comum
+idêntica em vários candidatos vira um único arquivo, baixado uma vez pelo
+navegador.
+
+`manifest.json` guarda, por página, o hash do conteúdo dos arquivos de entrada
+(módulo do candidato, base, camadas, estilos); numa nova geração, só as páginas
+cujo hash mudou são refeitas, e os assets que nenhuma página usa são apagados.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from html import escape
+from pathlib import Path
+from typing import Any
+
+from .analytics import load_votos_df_cached
+from .config import COMMON_DATA_DIR, LAYER_STYLE_FILE
+from .io_geo import base_identifier, discover_layers_geojson, file_digest, layer_in_base, read_geojson_cached
+from .map_folium import add_filterable_votes_layer, add_geojson_layer, build_map, finalize_map
+from .profiling import stage
+from .schema import bounds_center_from_geojson
+from .spatial import point_regions, region_totals, with_totals
+from .styles import load_layer_styles, resolve_layer_style
+
+# mude ao alterar o que vai nas páginas: força refazer todas
+SNAPSHOT_FORMAT = 1
+
+# chamada que o folium gera para os dados de cada GeoJson
+_GEOJSON_ADD = re.compile(r"(geo_json_[0-9a-f]+_add)\(")
+# dados menores que isso ficam no próprio HTML
+MIN_ASSET_BYTES = 2048
+
+
+@dataclass
+class SnapshotPage:
+    candidate: str
+    title: str
+    module: Path
+    votos_file: Path
+    bounds_file: Path | None = None
+
+    @property
+    def rel(self) -> str:
+        return f"{self.candidate}/{self.votos_file.stem}.html"
+
+
+def candidate_pages(py_file: Path, module: Any) -> list[SnapshotPage]:
+    """Uma página por base de votos do candidato (`VOTOS_FILES` do módulo)."""
+    bounds = getattr(module, "BOUNDS_FILE", None)
+    title = getattr(module, "CANDIDATE_TITLE", py_file.parent.name.replace("_", " "))
+    return [
+        SnapshotPage(py_file.parent.name, title, py_file, Path(v), Path(bounds) if bounds and Path(bounds).exists() else None)
+        for v in getattr(module, "VOTOS_FILES", []) or []
+        if Path(v).exists()
+    ]
+
+
+def _layers(page: SnapshotPage, common_dir: Path) -> list[dict[str, Any]]:
+    exclude = {page.votos_file.name}
+    base_id = base_identifier(page.votos_file)
+    layers = discover_layers_geojson(common_dir, exclude=exclude) + discover_layers_geojson(page.module.parent, exclude=exclude)
+    return [layer for layer in layers if layer_in_base(layer, base_id)]
+
+
+def page_inputs(page: SnapshotPage, common_dir: Path = COMMON_DATA_DIR) -> list[Path]:
+    """Arquivos que definem a página (o hash deles decide se ela é refeita)."""
+    paths = [page.module, page.votos_file, LAYER_STYLE_FILE]
+    if page.bounds_file:
+        paths.append(page.bounds_file)
+    if "municipios" in page.votos_file.stem.lower():
+        paths.append(common_dir / "ce_regioes.geojson")
+    paths += [layer["path"] for layer in _layers(page, common_dir)]
+    return [p for p in paths if p.exists()]
+
+
+def inputs_digest(paths: list[Path], root: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"formato={SNAPSHOT_FORMAT}".encode())
+    for p in sorted(paths):
+        try:
+            rel = p.resolve().relative_to(root.resolve())
+        except ValueError:
+            rel = p
+        h.update(f"{rel}={file_digest(p)}\n".encode())
+    return h.hexdigest()
+
+
+def build_page_map(page: SnapshotPage, common_dir: Path = COMMON_DATA_DIR):
+    """O mapa da página, como o app monta sem filtros (sem tiles: não há servidor)."""
+    df = load_votos_df_cached(page.votos_file)
+    votos_gj = read_geojson_cached(page.votos_file)
+    is_municipios = "municipios" in page.votos_file.stem.lower()
+
+    bounds, center, zoom = None, None, 10
+    regioes = common_dir / "ce_regioes.geojson"
+    if is_municipios and regioes.exists():
+        bounds, center = bounds_center_from_geojson(read_geojson_cached(regioes))
+        zoom = 7
+    elif page.bounds_file:
+        bounds, center = bounds_center_from_geojson(read_geojson_cached(page.bounds_file))
+    if center is None:
+        center = [float(df["lat"].mean()), float(df["lon"].mean())] if len(df) else [-5.2, -39.5]
+
+    m = build_map(center=center, zoom_start=zoom)
+    if is_municipios and bounds:
+        m.fit_bounds(bounds)
+
+    styles = load_layer_styles()
+    for layer in _layers(page, common_dir):
+        stl = resolve_layer_style(
+            {"stem": layer["stem"], "filename": layer["filename"], "geom": layer.get("geom"), "type": layer["stem"]}, styles,
+        )
+        gj = layer["geojson"]
+        if stl.get("mode") == "choropleth" and len(df):
+            regions = point_regions(page.votos_file, df, layer["path"], gj)
+            if regions is not None:
+                gj = with_totals(layer["stem"], gj, region_totals(regions, df, layer["features"]), stl.get("labelField"))
+        add_geojson_layer(m, layer["stem"], gj, stl)
+
+    if votos_gj:
+        stem = page.votos_file.stem
+        stl = resolve_layer_style({"stem": stem, "filename": page.votos_file.name, "geom": "Point", "type": stem}, styles)
+        add_filterable_votes_layer(m, stem, votos_gj, stl)
+    finalize_map(m)
+    return m
+
+
+def externalize_geojson(html: str, assets_dir: Path) -> tuple[str, list[str]]:
+    """Troca os dados inline de cada GeoJson por um `assets/<hash>.js` compartilhado."""
+    decoder = json.JSONDecoder()
+    parts: list[str] = []
+    assets: list[str] = []
+    pos = 0
+    for match in _GEOJSON_ADD.finditer(html):
+        start = match.end()
+        if start < pos:
+            continue
+        try:
+            data, end = decoder.raw_decode(html, start)
+        except ValueError:
+            continue
+        if end - start < MIN_ASSET_BYTES:
+            continue
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        digest = hashlib.blake2b(body.encode(), digest_size=10).hexdigest()
+        asset = assets_dir / f"{digest}.js"
+        if not asset.exists():
+            asset.parent.mkdir(parents=True, exist_ok=True)
+            tmp = asset.with_suffix(".tmp")
+            tmp.write_text(f"(window.lvAssets=window.lvAssets||{{}})[{json.dumps(digest)}]={body};\n", encoding="utf-8")
+            tmp.replace(asset)
+        if digest not in assets:
+            assets.append(digest)
+        parts.append(html[pos:start])
+        parts.append(f"window.lvAssets[{json.dumps(digest)}]")
+        pos = end
+    parts.append(html[pos:])
+    out = "".join(parts)
+    if assets:
+        tags = "".join(f'<script src="../assets/{d}.js"></script>' for d in assets)
+        out = out.replace("</head>", tags + "</head>", 1)
+    return out, assets
+
+
+def minify_html(html: str) -> str:
+    """Tira a indentação e as linhas vazias (o folium indenta cada bloco)."""
+    return "\n".join(line.strip() for line in html.splitlines() if line.strip()) + "\n"
+
+
+def render_page(page: SnapshotPage, out_dir: Path, common_dir: Path = COMMON_DATA_DIR) -> dict[str, Any]:
+    """Gera o HTML da página; devolve a entrada do manifesto (sem o hash das entradas)."""
+    with stage(f"snapshot:{page.rel}") as rec:
+        m = build_page_map(page, common_dir)
+        html = m.get_root().render()
+        html = html.replace("<head>", f"<head><title>{escape(page.title)} · {escape(page.votos_file.stem)}</title>", 1)
+        html, assets = externalize_geojson(html, out_dir / "assets")
+        html = minify_html(html)
+        target = out_dir / page.rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(html, encoding="utf-8")
+        rec["bytes"] = len(html.encode())
+    return {
+        "candidato": page.candidate,
+        "titulo": page.title,
+        "base": page.votos_file.stem,
+        "assets": assets,
+        "bytes": rec["bytes"],
+        "gerado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def read_manifest(out_dir: Path) -> dict[str, Any]:
+    try:
+        manifest = json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"formato": SNAPSHOT_FORMAT, "paginas": {}}
+    if manifest.get("formato") != SNAPSHOT_FORMAT:
+        return {"formato": SNAPSHOT_FORMAT, "paginas": {}}
+    return manifest
+
+
+def write_manifest(out_dir: Path, manifest: dict[str, Any]) -> None:
+    tmp = out_dir / "manifest.json.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(out_dir / "manifest.json")
+
+
+def write_index(out_dir: Path, manifest: dict[str, Any]) -> None:
+    """Página inicial com um link por candidato e base."""
+    rows = []
+    for rel, entry in sorted(manifest["paginas"].items()):
+        rows.append(f'<li><a href="{escape(rel)}">{escape(entry["titulo"])}</a> — {escape(entry["base"])}</li>')
+    html = (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8"><title>Localiza Votos · mapas</title>'
+        '<meta name="viewport" content="width=device-width, initial-scale=1"></head>'
+        f'<body><h1>🗺️ Mapas</h1><ul>{"".join(rows)}</ul></body></html>\n'
+    )
+    (out_dir / "index.html").write_text(html, encoding="utf-8")
+
+
+def prune(out_dir: Path, manifest: dict[str, Any]) -> int:
+    """Apaga páginas fora do manifesto e assets que nenhuma página usa."""
+    used = {a for entry in manifest["paginas"].values() for a in entry["assets"]}
+    removed = 0
+    for asset in (out_dir / "assets").glob("*.js"):
+        if asset.stem not in used:
+            asset.unlink(missing_ok=True)
+            removed += 1
+    for html in out_dir.glob("*/*.html"):
+        if html.relative_to(out_dir).as_posix() not in manifest["paginas"]:
+            html.unlink(missing_ok=True)
+            removed += 1
+    return removed
@@ -0,0 +1,124 @@
+"""Junção espacial pontos de voto -> polígonos (regionais, distritos, setores).
+
+Cada ponto de uma base é atribuído, uma única vez, ao polígono que o contém em
+cada camada de limites (índice STRtree do shapely, consulta vetorizada). A
+atribuição fica no cache compartilhado; a partir dela, o total por polígono de
+qualquer recorte (filtros, faixa de votos) é um `bincount`, e filtrar os pontos
+de um polígono clicado é uma comparação de inteiros.
+
+Sem shapely, `point_regions` devolve None e as camadas voltam ao estilo normal.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from . import cache
+from .lazy import lazy_import
+from .profiling import stage
+from .schema import pick_prop
+
+# só carregam no primeiro uso (ver lazy.py)
+shapely = lazy_import("shapely")
+
+# propriedades injetadas nas feições do coroplético (lidas de volta no clique)
+PROP_LAYER = "lv_camada"
+PROP_ID = "lv_id"
+PROP_VOTES = "lv_votos"
+PROP_LABEL = "lv_nome"
+
+LABEL_KEYS = (
+    "NM_BAIRRO", "bairro", "Bairro", "NM_DISTRIT", "NM_DIST", "distrito", "regiao_adm", "Região",
+    "regiao", "NM_REGIAO", "CD_SETOR", "nome", "NOME", "Nome", "name",
+)
+
+
+def polygon_label(props: dict[str, Any], i: int, field: str | None = None) -> str:
+    """Nome legível do polígono (campo configurado, campos usuais ou posição)."""
+    v = props.get(field) if field else pick_prop(props, LABEL_KEYS)
+    return str(v) if v not in (None, "") else f"#{i + 1}"
+
+
+def _polygons(gj: dict[str, Any]) -> list[Any]:
+    geoms = []
+    for ft in (gj or {}).get("features") or []:
+        try:
+            geoms.append(shapely.geometry.shape(ft.get("geometry")))
+        except Exception:
+            geoms.append(None)
+    return geoms
+
+
+def assign_points(lon: np.ndarray, lat: np.ndarray, polygons_gj: dict[str, Any]) -> np.ndarray:
+    """Índice do polígono que contém cada ponto (-1 se nenhum).
+
+    Em polígonos sobrepostos vale o primeiro na ordem do arquivo.
+    """
+    out = np.full(len(lon), -1, dtype=np.int32)
+    if shapely is None or not len(lon):
+        return out
+    geoms = _polygons(polygons_gj)
+    valid = [i for i, g in enumerate(geoms) if g is not None and g.geom_type in ("Polygon", "MultiPolygon")]
+    if not valid:
+        return out
+    tree = shapely.STRtree([geoms[i] for i in valid])
+    pts = shapely.points(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+    pt_idx, poly_idx = tree.query(pts, predicate="within")
+    poly_idx = np.asarray(valid, dtype=np.int32)[poly_idx]
+    # ordem decrescente: na atribuição, o último (menor índice de polígono) prevalece
+    order = np.lexsort((-poly_idx, pt_idx))
+    out[pt_idx[order]] = poly_idx[order]
+    return out
+
+
+def point_regions(votos_file: Path, df: pd.DataFrame, layer_path: Path, layer_gj: dict[str, Any]) -> pd.Series | None:
+    """Polígono de `layer_path` de cada linha de `df` (base `votos_file`), com o índice de `df`.
+
+    Calculado uma vez por (base, camada) e compartilhado entre sessões.
+    """
+    if shapely is None or df.empty:
+        return None
+
+    def build():
+        with stage(f"spatial.atribuir:{Path(layer_path).stem}", rows=len(df)):
+            idx = assign_points(df["lon"].to_numpy(), df["lat"].to_numpy(), layer_gj)
+        return pd.Series(idx, index=df.index, name=Path(layer_path).stem)
+
+    return cache.get_or_build("regioes", votos_file, build, cache.file_key(layer_path))
+
+
+def region_totals(regions: pd.Series, df_sub: pd.DataFrame, n_polygons: int, value_col: str = "qt_votos") -> np.ndarray:
+    """Soma de `value_col` por polígono para as linhas de `df_sub` (subconjunto de df)."""
+    if df_sub.empty:
+        return np.zeros(n_polygons)
+    idx = regions.reindex(df_sub.index).fillna(-1).to_numpy(dtype=np.int64)
+    w = pd.to_numeric(df_sub[value_col], errors="coerce").fillna(0.0).to_numpy()
+    return np.bincount(idx + 1, weights=w, minlength=n_polygons + 1)[1:n_polygons + 1]
+
+
+def rows_in_region(regions: pd.Series, df_sub: pd.DataFrame, region_id: int) -> pd.DataFrame:
+    """Linhas de `df_sub` dentro do polígono `region_id` (sem geometria: só o índice)."""
+    mask = regions.reindex(df_sub.index).to_numpy() == region_id
+    return df_sub[mask]
+
+
+def with_totals(layer: str, gj: dict[str, Any], totals: np.ndarray, label_field: str | None = None) -> dict[str, Any]:
+    """Cópia rasa do GeoJSON com total, id e nome de cada polígono nas propriedades."""
+    feats = []
+    for i, ft in enumerate(gj.get("features") or []):
+        props = ft.get("properties") or {}
+        feats.append({
+            "type": "Feature",
+            "geometry": ft.get("geometry"),
+            "properties": {
+                **props,
+                PROP_LAYER: layer,
+                PROP_ID: i,
+                PROP_LABEL: polygon_label(props, i, label_field),
+                PROP_VOTES: int(totals[i]) if i < len(totals) else 0,
+            },
+        })
+    return {"type": "FeatureCollection", "features": feats}
@@ -68,3 +68,23 @@ def resolve_layer_style(layer_meta: dict[str, Any], styles: dict[str, Any]) -> d
     base = merge_dict(base, per_kind)
 
     return base
+
+# agregação hexagonal dos votos (analytics.vote_hexbins); "enabled": false desliga a camada
+HEXBIN_DEFAULTS = {
+    "enabled": True,
+    "cells": 60,
+    "colors": ["#ffffcc", "#a1dab4", "#41b6c4", "#2c7fb8", "#253494"],
+    "classes": 5,
+    "color": "#555555",
+    "weight": 0.5,
+    "opacity": 0.6,
+    "fillOpacity": 0.6,
+    "show": False,
+}
+
+def resolve_hexbin_style(stem: str, styles: dict[str, Any]) -> dict[str, Any]:
+    """Estilo da grade hexagonal: padrão < `defaults.hexbin` < `layers.<stem>.hexbin`."""
+    defaults = (styles or {}).get("defaults", {})
+    layers_cfg = (styles or {}).get("layers", {})
+    per = layers_cfg.get(stem) or layers_cfg.get(stem.lower()) or {}
+    return merge_dict(merge_dict(HEXBIN_DEFAULTS, defaults.get("hexbin") or {}), per.get("hexbin") or {})
@@ -0,0 +1,477 @@
+"""Camadas densas como tiles PNG (XYZ) desenhados no servidor.
+
+Bases de votos estaduais e setores censitários têm dezenas de milhares de
+feições; como vetor (GeoJSON/marcadores) elas pesam demais nos celulares da
+equipe de campo. Aqui a camada vira imagens 256x256 desenhadas com NumPy/Pillow
+(círculos graduados para os votos, preenchimento e contorno para polígonos),
+gravadas em `static/tiles/<camada>/<hash do estilo e dos dados>/z/x/y.png` e
+servidas pelo próprio Streamlit (`server.enableStaticServing`). O navegador só
+baixa as imagens da área visível, qualquer que seja o tamanho da base.
+
+Só os tiles com algum desenho são gerados. Os níveis vão de `RASTER_MIN_ZOOM`
+até o último em que a camada cabe em `RASTER_MAX_TILES` tiles; acima dele o
+Leaflet amplia os tiles do último nível (`maxNativeZoom`). Os zooms menores
+saem na hora; os mais próximos, em segundo plano, numa única thread
+compartilhada por todas as sessões.
+
+Cada conjunto é desenhado uma vez por (camada, estilo, dados): a base de votos
+só vira PNG sem filtro (com filtro, o mapa usa a pirâmide de totais), para
+que mexer num filtro não desenhe centenas de tiles.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+
+from . import cache
+from .config import (
+    RASTER_KEEP_RECENT_S, RASTER_MAX_SETS, RASTER_MAX_TILES, RASTER_MAX_ZOOM, RASTER_MIN_FEATURES,
+    RASTER_MIN_ZOOM, RASTER_SYNC_TILES, RASTER_TILES, RASTER_TILES_DIR,
+)
+from .profiling import stage
+
+log = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+# desenha em 2x e reduz: Pillow não suaviza bordas
+SUPERSAMPLE = 2
+MAX_LAT = 85.05112878
+# folga nos limites da camada (graus) para não cortar círculos e contornos da borda
+BOUNDS_PAD = 0.01
+
+_locks_guard = threading.Lock()
+_locks: dict[str, threading.Lock] = {}
+# níveis em segundo plano: uma thread só, em fila (o servidor pode ter 1 CPU)
+_tile_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="localiza-tiles")
+# conjuntos com tiles ainda na fila ou sendo desenhados: prune() não os apaga
+_pending: set[Path] = set()
+
+
+def use_raster(n_features: int, style: dict[str, Any]) -> bool:
+    """A camada deve virar tiles PNG? (`"raster": true/false` no estilo força.)"""
+    if style.get("mode") in ("icon", "choropleth"):
+        return False
+    if "raster" in style:
+        return bool(style["raster"])
+    if RASTER_TILES == "on":
+        return True
+    return RASTER_TILES == "auto" and n_features >= RASTER_MIN_FEATURES
+
+
+def mercator_px(lon: np.ndarray, lat: np.ndarray, z: int) -> tuple[np.ndarray, np.ndarray]:
+    """Pixels globais (Web Mercator, origem no canto superior esquerdo) no zoom `z`."""
+    n = TILE_SIZE * (1 << z)
+    s = np.sin(np.radians(np.clip(np.asarray(lat, dtype=float), -MAX_LAT, MAX_LAT)))
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * n
+    y = (0.5 - np.log((1 + s) / (1 - s)) / (4 * np.pi)) * n
+    return x, y
+
+
+def graduated_radius(values: np.ndarray, num_classes: int = 5) -> np.ndarray:
+    """Raio em pixels por classes de intervalo igual (mesma regra dos marcadores de votos)."""
+    v = np.nan_to_num(np.asarray(values, dtype=float))
+    if not len(v):
+        return v
+    lo, hi = float(v.min()), float(v.max())
+    if hi == lo:
+        return np.full(len(v), 8.0)
+    cls = np.clip(((v - lo) / ((hi - lo) / num_classes)).astype(int), 0, num_classes - 1)
+    return 4.0 + 4.0 * cls
+
+
+def _rgb(color: Any, default: str) -> tuple[int, int, int]:
+    try:
+        return tuple(ImageColor.getrgb(str(color or default))[:3])
+    except ValueError:
+        return tuple(ImageColor.getrgb(default)[:3])
+
+
+def group_by_tile(tile_keys: np.ndarray, items: np.ndarray, n_items: int, z: int) -> dict[tuple[int, int], np.ndarray]:
+    """(x, y) do tile -> itens que o tocam, em ordem crescente e sem repetição."""
+    if not len(tile_keys):
+        return {}
+    pairs = np.unique(tile_keys * n_items + items)
+    keys, idx = pairs // n_items, pairs % n_items
+    ukeys, starts = np.unique(keys, return_index=True)
+    side = 1 << z
+    return {(int(k // side), int(k % side)): part for k, part in zip(ukeys, np.split(idx, starts[1:]))}
+
+
+class RasterLayer:
+    """Geometrias de uma camada em arrays + estilo; sabe quais tiles toca e desenha cada um.
+
+    Pontos: `lon`, `lat` e `radius` (pixels). Polígonos: anéis concatenados em
+    `coords` (lon, lat) com `offsets`; anéis internos (buracos) vêm logo após o
+    externo e são recortados do preenchimento.
+    """
+
+    def __init__(self, kind: str, style: dict[str, Any], *, lon=None, lat=None, radius=None,
+                 coords=None, offsets=None, holes=None):
+        self.kind = kind
+        self.style = style
+        self.lon = lon
+        self.lat = lat
+        self.radius = radius
+        self.coords = coords
+        self.offsets = offsets
+        self.holes = holes
+        self._px: tuple[int, np.ndarray, np.ndarray] | None = None
+        self.digest = self._digest()
+
+    @classmethod
+    def points(cls, lon, lat, radius, style: dict[str, Any]) -> RasterLayer | None:
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), lon.shape)
+        ok = np.isfinite(lon) & np.isfinite(lat) & np.isfinite(radius)
+        if not ok.any():
+            return None
+        return cls("point", style, lon=lon[ok], lat=lat[ok], radius=np.ascontiguousarray(radius[ok]))
+
+    @classmethod
+    def from_geojson(cls, gj: dict[str, Any], style: dict[str, Any]) -> RasterLayer | None:
+        """Camada de polígonos ou de pontos (raio fixo do estilo); None para linhas."""
+        rings: list[np.ndarray] = []
+        holes: list[bool] = []
+        pts: list[tuple[float, float]] = []
+        for ft in (gj or {}).get("features") or []:
+            geom = ft.get("geometry") or {}
+            gtype, coords = geom.get("type"), geom.get("coordinates") or []
+            polys = [coords] if gtype == "Polygon" else coords if gtype == "MultiPolygon" else []
+            for poly in polys:
+                for k, ring in enumerate(poly):
+                    arr = np.asarray(ring, dtype=float)
+                    if arr.ndim == 2 and len(arr) >= 3:
+                        rings.append(arr[:, :2])
+                        holes.append(k > 0)
+            if gtype == "Point" and len(coords) >= 2:
+                pts.append((coords[0], coords[1]))
+        if rings:
+            offsets = np.cumsum([0] + [len(r) for r in rings])
+            return cls("polygon", style, coords=np.concatenate(rings), offsets=offsets, holes=np.array(holes))
+        if pts:
+            arr = np.asarray(pts, dtype=float)
+            return cls.points(arr[:, 0], arr[:, 1], float(style.get("radius", 6)), style)
+        return None
+
+    def _digest(self) -> str:
+        h = hashlib.blake2b(digest_size=8)
+        h.update(json.dumps(self.style, sort_keys=True, default=str).encode())
+        h.update(self.kind.encode())
+        for arr in (self.lon, self.lat, self.radius, self.coords, self.offsets, self.holes):
+            if arr is not None:
+                h.update(np.ascontiguousarray(arr).tobytes())
+        return h.hexdigest()
+
+    def bounds(self) -> list[list[float]]:
+        lon = self.lon if self.kind == "point" else self.coords[:, 0]
+        lat = self.lat if self.kind == "point" else self.coords[:, 1]
+        return [
+            [float(lat.min()) - BOUNDS_PAD, float(lon.min()) - BOUNDS_PAD],
+            [float(lat.max()) + BOUNDS_PAD, float(lon.max()) + BOUNDS_PAD],
+        ]
+
+    def _project(self, z: int) -> tuple[np.ndarray, np.ndarray]:
+        # só o último zoom fica guardado: os tiles são desenhados zoom a zoom
+        cached = self._px
+        if cached is not None and cached[0] == z:
+            return cached[1], cached[2]
+        if self.kind == "point":
+            x, y = mercator_px(self.lon, self.lat, z)
+        else:
+            x, y = mercator_px(self.coords[:, 0], self.coords[:, 1], z)
+        self._px = (z, x, y)
+        return x, y
+
+    def _margin(self) -> float:
+        return float(self.style.get("weight", 1)) / 2 + 1
+
+    def __len__(self) -> int:
+        return len(self.lon) if self.kind == "point" else len(self.offsets) - 1
+
+    def tiles(self, z: int, limit: int | None = None) -> dict[tuple[int, int], np.ndarray] | None:
+        """Tiles do zoom `z` com algum desenho -> índices de pontos ou anéis que os tocam.
+
+        None se a camada passaria de `limit` tiles neste zoom.
+        """
+        x, y = self._project(z)
+        pad = self._margin()
+        if self.kind == "point":
+            r = self.radius + pad
+            x0, x1 = ((x - r) // TILE_SIZE).astype(np.int64), ((x + r) // TILE_SIZE).astype(np.int64)
+            y0, y1 = ((y - r) // TILE_SIZE).astype(np.int64), ((y + r) // TILE_SIZE).astype(np.int64)
+            side = 1 << z
+            idx = np.arange(len(x))
+            # um círculo toca no máximo 2x2 tiles
+            keys = np.concatenate([x0 * side + y0, x0 * side + y1, x1 * side + y0, x1 * side + y1])
+            groups = group_by_tile(keys, np.tile(idx, 4), len(x), z)
+            return None if limit is not None and len(groups) > limit else groups
+
+        starts = self.offsets[:-1]
+        x0 = ((np.minimum.reduceat(x, starts) - pad) // TILE_SIZE).astype(np.int64)
+        x1 = ((np.maximum.reduceat(x, starts) + pad) // TILE_SIZE).astype(np.int64)
+        y0 = ((np.minimum.reduceat(y, starts) - pad) // TILE_SIZE).astype(np.int64)
+        y1 = ((np.maximum.reduceat(y, starts) + pad) // TILE_SIZE).astype(np.int64)
+        w, h = x1 - x0 + 1, y1 - y0 + 1
+        counts = w * h
+        if limit is not None and counts.sum() > 50 * limit:
+            # polígonos grandes neste zoom: nem vale enumerar
+            return None
+        ring = np.repeat(np.arange(len(counts)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        tx = x0[ring] + local % w[ring]
+        ty = y0[ring] + local // w[ring]
+        groups = group_by_tile(tx * (1 << z) + ty, ring, len(counts), z)
+        return None if limit is not None and len(groups) > limit else groups
+
+    def render(self, z: int, x: int, y: int, items: np.ndarray) -> bytes | None:
+        """PNG do tile (x, y, z) com os itens `items`; None se nada ficou visível."""
+        size = TILE_SIZE * SUPERSAMPLE
+        fill = Image.new("L", (size, size), 0)
+        line = Image.new("L", (size, size), 0)
+        draw_fill, draw_line = ImageDraw.Draw(fill), ImageDraw.Draw(line)
+        px, py = self._project(z)
+        ox, oy = x * TILE_SIZE, y * TILE_SIZE
+        width = int(round(float(self.style.get("weight", 1)) * SUPERSAMPLE))
+
+        if self.kind == "point":
+            cx = (px[items] - ox) * SUPERSAMPLE
+            cy = (py[items] - oy) * SUPERSAMPLE
+            rr = self.radius[items] * SUPERSAMPLE
+            half = width / 2
+            for a, b, r in zip(cx.tolist(), cy.tolist(), rr.tolist()):
+                draw_fill.ellipse((a - r, b - r, a + r, b + r), fill=255)
+                if width:
+                    # contorno centrado na borda, como no Leaflet
+                    draw_line.ellipse((a - r - half, b - r - half, a + r + half, b + r + half), outline=255, width=width)
+        else:
+            for i in items.tolist():
+                s, e = self.offsets[i], self.offsets[i + 1]
+                pts = np.column_stack(((px[s:e] - ox) * SUPERSAMPLE, (py[s:e] - oy) * SUPERSAMPLE)).ravel().tolist()
+                draw_fill.polygon(pts, fill=0 if self.holes[i] else 255)
+                if width:
+                    draw_line.line(pts + pts[:2], fill=255, width=width)
+
+        fill, line = fill.reduce(SUPERSAMPLE), line.reduce(SUPERSAMPLE)
+        if fill.getbbox() is None and line.getbbox() is None:
+            return None
+        fill_img, line_img = self._paints()
+        fill_img.putalpha(fill.point(self._fill_lut))
+        line_img.putalpha(line.point(self._line_lut))
+        buf = io.BytesIO()
+        Image.alpha_composite(fill_img, line_img).save(buf, "PNG", compress_level=3)
+        return buf.getvalue()
+
+    def _paints(self) -> tuple[Image.Image, Image.Image]:
+        """Imagens de cor sólida do preenchimento e do contorno (alfa vem das máscaras)."""
+        if not hasattr(self, "_fill_lut"):
+            default = "#2b6cb0" if self.kind == "polygon" else "#1f6feb"
+            fill_op = float(self.style.get("fillOpacity", 0.15 if self.kind == "polygon" else 0.6))
+            line_op = float(self.style.get("opacity", 0.9))
+            ramp = np.arange(256, dtype=float)
+            self._fill_lut = (ramp * fill_op).round().astype(np.uint8).tolist()
+            self._line_lut = (ramp * line_op).round().astype(np.uint8).tolist()
+            self._fill_rgb = _rgb(self.style.get("fillColor"), self.style.get("color") or default)
+            self._line_rgb = _rgb(self.style.get("color"), default)
+        size = (TILE_SIZE, TILE_SIZE)
+        return Image.new("RGBA", size, self._fill_rgb), Image.new("RGBA", size, self._line_rgb)
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9_-]+", "_", name.lower()).strip("_") or "camada"
+
+
+def _lock_for(key: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _plan(layer: RasterLayer) -> list[tuple[int, dict[tuple[int, int], np.ndarray]]]:
+    """Tiles a desenhar por zoom, do menor até o último que cabe em `RASTER_MAX_TILES`."""
+    plan = []
+    for z in range(RASTER_MIN_ZOOM, RASTER_MAX_ZOOM + 1):
+        groups = layer.tiles(z, limit=None if z == RASTER_MIN_ZOOM else RASTER_MAX_TILES)
+        if groups is None:
+            break
+        plan.append((z, groups))
+    return plan
+
+
+def _write(layer: RasterLayer, out_dir: Path, jobs: list[tuple[int, int, int, np.ndarray]]) -> int:
+    written = 0
+    for z, x, y, items in jobs:
+        png = layer.render(z, x, y, items)
+        if png is None:
+            continue
+        path = out_dir / str(z) / str(x) / f"{y}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(png)
+        written += 1
+    return written
+
+
+def _write_later(layer: RasterLayer, out_dir: Path, jobs: list[tuple[int, int, int, np.ndarray]]):
+    try:
+        n = _write(layer, out_dir, jobs)
+        log.info("tiles %s: %d desenhados em segundo plano", out_dir, n)
+    except OSError:
+        # conjunto apagado por fora (ex.: pasta static/ limpa à mão)
+        log.warning("tiles %s: geração em segundo plano interrompida", out_dir)
+    finally:
+        with _locks_guard:
+            _pending.discard(out_dir)
+
+
+def ensure_tiles(name: str, layer: RasterLayer, root: Path = RASTER_TILES_DIR) -> dict[str, Any]:
+    """Garante os tiles da camada em disco e devolve seus metadados.
+
+    O diretório é `<root>/<camada>/<digest>`: mudar estilo ou arquivo gera outro
+    conjunto; conjuntos já gerados (por qualquer sessão) são reaproveitados.
+    Os primeiros `RASTER_SYNC_TILES` tiles (zooms menores) saem antes do retorno;
+    os níveis mais próximos entram na fila da thread de tiles.
+    """
+    slug = _slug(name)
+    final = root / slug / layer.digest
+    meta_file = final / "meta.json"
+    with _lock_for(str(final)):
+        if meta_file.exists():
+            os.utime(meta_file)
+        else:
+            tmp = final.parent / f".{layer.digest}.{os.getpid()}.{threading.get_ident()}"
+            shutil.rmtree(tmp, ignore_errors=True)
+            tmp.mkdir(parents=True)
+            with stage(f"tiles.desenhar:{slug}", rows=len(layer)) as rec:
+                plan = _plan(layer)
+                jobs = [(z, x, y, items) for z, groups in plan for (x, y), items in groups.items()]
+                written = _write(layer, tmp, jobs[:RASTER_SYNC_TILES])
+                rec["bytes"] = sum(p.stat().st_size for p in tmp.rglob("*.png"))
+            meta = {
+                "min_zoom": RASTER_MIN_ZOOM,
+                "max_native_zoom": plan[-1][0] if plan else RASTER_MIN_ZOOM,
+                "bounds": layer.bounds(),
+                "tiles": written,
+                "pendentes": max(0, len(jobs) - RASTER_SYNC_TILES),
+            }
+            (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+            try:
+                os.replace(tmp, final)
+            except OSError:
+                # outro processo gerou o mesmo conjunto antes
+                shutil.rmtree(tmp, ignore_errors=True)
+            else:
+                if jobs[RASTER_SYNC_TILES:]:
+                    with _locks_guard:
+                        _pending.add(final)
+                    _tile_pool.submit(_write_later, layer, final, jobs[RASTER_SYNC_TILES:])
+            prune(root)
+    meta = json.loads(meta_file.read_text(encoding="utf-8"))
+    meta["path"] = f"tiles/{slug}/{layer.digest}"
+    return meta
+
+
+def tile_url(meta: dict[str, Any], base_url_path: str = "", ext: str = "png") -> str:
+    """Modelo `{z}/{x}/{y}` da URL dos tiles servidos pelo Streamlit (`meta["path"]` relativo a static/)."""
+    base = "/" + base_url_path.strip("/") if base_url_path.strip("/") else ""
+    return f"{base}/app/static/{meta['path']}/{{z}}/{{x}}/{{y}}.{ext}"
+
+
+def prune(root: Path = RASTER_TILES_DIR, keep: int = RASTER_MAX_SETS, recent: float = RASTER_KEEP_RECENT_S) -> int:
+    """Apaga os conjuntos de tiles usados há mais tempo além dos `keep` mais recentes.
+
+    Nunca apaga um conjunto usado nos últimos `recent` segundos (o mapa de outra
+    sessão ainda pode pedir tiles dele) nem um que ainda está sendo desenhado.
+    """
+    sets = []
+    for meta_file in root.glob("*/*/meta.json"):
+        try:
+            sets.append((meta_file.stat().st_mtime, meta_file.parent))
+        except OSError:
+            continue
+    sets.sort(reverse=True)
+    now = time.time()
+    with _locks_guard:
+        pending = set(_pending)
+    removed = 0
+    for t, path in sets[keep:]:
+        if now - t < recent or path in pending:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    # restos de gerações interrompidas
+    for tmp in root.glob("*/.*"):
+        try:
+            if time.time() - tmp.stat().st_mtime > 3600:
+                shutil.rmtree(tmp, ignore_errors=True)
+        except OSError:
+            continue
+    return removed
+
+
+def layer_raster(layer_path: Path, gj: dict[str, Any], style: dict[str, Any]) -> RasterLayer | None:
+    """Camada de arquivo em arrays, montada uma vez por (arquivo, estilo)."""
+    key = json.dumps(style, sort_keys=True, default=str)
+    return cache.get_or_build("raster", layer_path, lambda: RasterLayer.from_geojson(gj, style), key)
+
+
+def votes_raster(df_points, style: dict[str, Any]) -> RasterLayer | None:
+    """Círculos graduados por `qt_votos`, com as cores e a opacidade dos marcadores de votos."""
+    paint = {
+        "color": style.get("color", "#1f6feb"),
+        "fillColor": style.get("fillColor", "#1f6feb"),
+        "weight": 2,
+        "fillOpacity": 0.6,
+    }
+    return RasterLayer.points(df_points["lon"], df_points["lat"], graduated_radius(df_points["qt_votos"]), paint)
+
+
+def base_votes_raster(votos_file: Path, df_points, style: dict[str, Any]) -> RasterLayer | None:
+    """`votes_raster` da base inteira, montada uma vez por (arquivo, estilo)."""
+    key = json.dumps(style, sort_keys=True, default=str)
+    return cache.get_or_build("raster_votos", votos_file, lambda: votes_raster(df_points, style), key)
+
+
+def render_view(
+    layers: list[RasterLayer],
+    bounds: list[list[float]],
+    size: tuple[int, int],
+    background: str = "#f4f6f8",
+    max_zoom: int = RASTER_MAX_ZOOM,
+) -> Image.Image:
+    """Imagem `size` (largura, altura) das camadas, no maior zoom em que `bounds` cabe (sem mapa de fundo)."""
+    (lat0, lon0), (lat1, lon1) = bounds
+    width, height = size
+    z = max_zoom
+    while z > 0:
+        x, y = mercator_px(np.array([lon0, lon1]), np.array([lat0, lat1]), z)
+        if abs(x[1] - x[0]) <= width * 0.9 and abs(y[1] - y[0]) <= height * 0.9:
+            break
+        z -= 1
+    x, y = mercator_px(np.array([lon0, lon1]), np.array([lat0, lat1]), z)
+    ox, oy = int(x.mean() - width / 2), int(y.mean() - height / 2)
+    tx0, tx1 = ox // TILE_SIZE, (ox + width - 1) // TILE_SIZE
+    ty0, ty1 = oy // TILE_SIZE, (oy + height - 1) // TILE_SIZE
+
+    canvas = Image.new("RGB", size, background)
+    for layer in layers:
+        for (tx, ty), items in (layer.tiles(z) or {}).items():
+            if not (tx0 <= tx <= tx1 and ty0 <= ty <= ty1):
+                continue
+            png = layer.render(z, tx, ty, items)
+            if png is None:
+                continue
+            tile = Image.open(io.BytesIO(png))
+            canvas.paste(tile, (tx * TILE_SIZE - ox, ty * TILE_SIZE - oy), tile)
+    return canvas
@@ -0,0 +1,351 @@
+"""Divisão do arquivo de votação por seção do TSE em bases por candidato.
+
+O CSV estadual do TSE (`votacao_secao_<ano>_<UF>.csv`, separado por `;`, em
+latin-1) tem uma linha por seção e votável. Aqui ele é lido em streaming, numa
+única passada: cada linha é ligada ao local de votação (coordenadas vindas dos
+`locais_*.geojson`) por um índice hash (zona, local) e os votos são somados por
+(candidato, local) em blocos NumPy. A memória cresce com o tamanho da saída
+(pares candidato × local), não com o número de linhas da entrada.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import random
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+import numpy as np
+
+from .analytics import build_votos_df, write_votos_sidecar
+from .io_geo import read_geojson
+from .schema import fix_latlon, get_latlon, pick_prop, safe_number, safe_text
+
+# votos brancos, nulos e anulados em separado não são candidatos
+NAO_CANDIDATOS = {95, 96, 97}
+# cargos proporcionais (CD_CARGO): deputados federal, estadual e distrital e vereador.
+# Neles, NR_VOTAVEL de 2 dígitos é voto na legenda (partido), não em candidato;
+# nos majoritários (prefeito, governador, presidente) o candidato tem o número do partido.
+CARGOS_PROPORCIONAIS = {"6", "7", "8", "13"}
+
+ZONA_KEYS = ["NR_ZONA", "Zona_eleitoral", "ZONA", "zona"]
+LOCAL_KEYS = ["NR_LOCAL_VOTACAO", "Numero_do_local", "Cod_Local", "NR_LOCAL"]
+CODIGO_KEYS = ["CODIGO_UNICO"]
+BAIRRO_KEYS = ["Bairro", "Bairro_ou_Localidade", "BAIRRO"]
+
+CSV_COLUMNS = [
+    "ANO_ELEICAO", "NR_TURNO", "SG_UF", "CD_MUNICIPIO", "NM_MUNICIPIO", "NR_ZONA", "NR_SECAO",
+    "CD_CARGO", "DS_CARGO", "NR_VOTAVEL", "NM_VOTAVEL", "QT_VOTOS", "NR_LOCAL_VOTACAO",
+    "NM_LOCAL_VOTACAO", "DS_LOCAL_VOTACAO_ENDERECO",
+]
+
+
+@dataclass
+class Local:
+    zona: int
+    local: int
+    lat: float
+    lon: float
+    props: dict[str, Any] = field(default_factory=dict)
+
+
+def _int(v: Any) -> int | None:
+    n = safe_number(v)
+    return int(n) if n is not None else None
+
+
+def local_key(props: dict[str, Any]) -> tuple[int, int] | None:
+    """Chave (zona, local) de um local de votação, aceitando as variações dos arquivos."""
+    zona = _int(pick_prop(props, ZONA_KEYS))
+    local = _int(pick_prop(props, LOCAL_KEYS))
+    if zona is None or local is None:
+        # CODIGO_UNICO no formato "zzzz-llll"
+        codigo = safe_text(pick_prop(props, CODIGO_KEYS))
+        if "-" in codigo:
+            z, _, l = codigo.partition("-")
+            zona, local = _int(z), _int(l)
+    if zona is None or local is None:
+        return None
+    return zona, local
+
+
+def build_locais_index(locais_files: Iterable[Path]) -> dict[tuple[int, int], Local]:
+    """Índice hash (zona, local) -> Local a partir de um ou mais `locais_*.geojson`."""
+    index: dict[tuple[int, int], Local] = {}
+    for path in locais_files:
+        for ft in (read_geojson(path).get("features") or []):
+            props = (ft or {}).get("properties") or {}
+            key = local_key(props)
+            ll = fix_latlon(*get_latlon(props, (ft or {}).get("geometry") or {}))
+            if key is None or ll is None:
+                continue
+            index.setdefault(key, Local(key[0], key[1], ll[0], ll[1], props))
+    return index
+
+
+@contextmanager
+def open_tse_csv(path: Path) -> Iterator[io.TextIOBase]:
+    """Abre o CSV do TSE em streaming, direto do .zip oficial se for o caso."""
+    path = Path(path)
+    if path.suffix.lower() == ".zip":
+        with zipfile.ZipFile(path) as zf:
+            member = next(n for n in zf.namelist() if n.lower().endswith(".csv"))
+            with zf.open(member) as raw:
+                yield io.TextIOWrapper(raw, encoding="latin-1", newline="")
+    else:
+        with open(path, "r", encoding="latin-1", newline="") as f:
+            yield f
+
+
+class _Aggregator:
+    """Soma votos por chave inteira em blocos, sem guardar as linhas lidas."""
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.keys = np.empty(0, dtype=np.int64)
+        self.vals = np.empty(0, dtype=np.int64)
+        self._buf_k: list[int] = []
+        self._buf_v: list[int] = []
+
+    def add(self, key: int, votos: int):
+        self._buf_k.append(key)
+        self._buf_v.append(votos)
+        if len(self._buf_k) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buf_k:
+            return
+        k = np.concatenate([self.keys, np.asarray(self._buf_k, dtype=np.int64)])
+        v = np.concatenate([self.vals, np.asarray(self._buf_v, dtype=np.int64)])
+        self.keys, inv = np.unique(k, return_inverse=True)
+        self.vals = np.bincount(inv, weights=v, minlength=len(self.keys)).astype(np.int64)
+        self._buf_k.clear()
+        self._buf_v.clear()
+
+
+def split_tse_csv(
+    csv_path: Path,
+    locais_files: Iterable[Path],
+    out_root: Path,
+    slug_fn: Callable[[str], str],
+    cargo: str | None = None,
+    turno: int | None = None,
+    base_name: str | None = None,
+    chunk_size: int = 500_000,
+) -> dict[str, Any]:
+    """Lê o CSV uma vez e grava `votos_<base>.geojson` + `votos_municipios.geojson` por candidato.
+
+    `cargo` filtra por DS_CARGO ou CD_CARGO (ex.: "Deputado Estadual" ou "7").
+    As linhas usadas precisam ser de um só cargo e turno: o CSV estadual traz
+    todos, e o mesmo número e nome em dois cargos não podem virar um candidato
+    só (ValueError pedindo `cargo`/`turno`). Votos de legenda dos cargos
+    proporcionais ficam de fora (`stats["legenda"]`).
+    Cada base ganha também o sidecar binário lido por `load_votos_df`.
+    """
+    index = build_locais_index(locais_files)
+    place_ids: dict[tuple[int, int], int] = {}
+    places: list[tuple[Local | None, dict[str, str]]] = []
+    cand_ids: dict[tuple[int, str], int] = {}
+    cands: list[tuple[int, str]] = []
+    votos_agg = _Aggregator(chunk_size)
+    secoes_agg = _Aggregator(chunk_size)
+    stats = {"linhas": 0, "usadas": 0, "sem_local": 0, "legenda": 0, "uf": ""}
+    eleicao: tuple[str, str] | None = None
+    sem_local: set[tuple[int, int]] = set()
+    cargo_norm = (cargo or "").strip().lower()
+
+    with open_tse_csv(csv_path) as f:
+        reader = csv.reader(f, delimiter=";")
+        header = next(reader)
+        col = {name: i for i, name in enumerate(h.strip() for h in header)}
+        missing = [c for c in ("NR_ZONA", "NR_SECAO", "NR_VOTAVEL", "NM_VOTAVEL", "QT_VOTOS", "NR_LOCAL_VOTACAO") if c not in col]
+        if missing:
+            raise ValueError(f"colunas ausentes no CSV: {', '.join(missing)}")
+
+        def get(row: list[str], name: str) -> str:
+            return row[col[name]] if name in col else ""
+
+        for row in reader:
+            stats["linhas"] += 1
+            if cargo_norm and cargo_norm not in (get(row, "DS_CARGO").strip().lower(), get(row, "CD_CARGO").strip()):
+                continue
+            if turno is not None and get(row, "NR_TURNO").strip() != str(turno):
+                continue
+            try:
+                nr = int(row[col["NR_VOTAVEL"]])
+                votos = int(row[col["QT_VOTOS"]])
+                key = (int(row[col["NR_ZONA"]]), int(row[col["NR_LOCAL_VOTACAO"]]))
+            except (ValueError, IndexError):
+                continue
+            if nr in NAO_CANDIDATOS or votos <= 0:
+                continue
+            cd_cargo = get(row, "CD_CARGO").strip()
+            this = (cd_cargo or get(row, "DS_CARGO").strip().upper(), get(row, "NR_TURNO").strip())
+            if eleicao is None:
+                eleicao = this
+            elif this != eleicao:
+                raise ValueError(
+                    f"o CSV tem mais de um cargo/turno (cargo {eleicao[0]} turno {eleicao[1]}, "
+                    f"cargo {this[0]} turno {this[1]}): escolha com --cargo e --turno"
+                )
+            if nr < 100 and (cd_cargo in CARGOS_PROPORCIONAIS or _proporcional(get(row, "DS_CARGO"))):
+                stats["legenda"] += votos
+                continue
+
+            pid = place_ids.get(key)
+            if pid is None:
+                loc = index.get(key)
+                if loc is None:
+                    sem_local.add(key)
+                pid = place_ids[key] = len(places)
+                places.append((loc, {
+                    "NM_MUNICIPIO": get(row, "NM_MUNICIPIO").strip(),
+                    "NM_LOCAL_VOTACAO": get(row, "NM_LOCAL_VOTACAO").strip(),
+                    "DS_LOCAL_VOTACAO_ENDERECO": get(row, "DS_LOCAL_VOTACAO_ENDERECO").strip(),
+                }))
+                stats["uf"] = stats["uf"] or get(row, "SG_UF").strip()
+            if places[pid][0] is None:
+                stats["sem_local"] += votos
+                continue
+
+            ckey = (nr, row[col["NM_VOTAVEL"]].strip())
+            cid = cand_ids.get(ckey)
+            if cid is None:
+                cid = cand_ids[ckey] = len(cands)
+                cands.append(ckey)
+
+            # chave combinada candidato × local (local < 2**32)
+            k = (cid << 32) | pid
+            votos_agg.add(k, votos)
+            secoes_agg.add(k, 1)
+            stats["usadas"] += 1
+
+    votos_agg.flush()
+    secoes_agg.flush()
+    stats["locais_sem_coordenada"] = len(sem_local)
+    stats["candidatos"] = {}
+
+    base = base_name or (stats["uf"].lower() or "estado")
+    cand_of = votos_agg.keys >> 32
+    place_of = votos_agg.keys & 0xFFFFFFFF
+    order = np.argsort(cand_of, kind="stable")
+    bounds = np.searchsorted(cand_of[order], np.arange(len(cands) + 1))
+
+    folders = candidate_folders(cands, slug_fn)
+    for cid, (nr, nome) in enumerate(cands):
+        sel = order[bounds[cid]:bounds[cid + 1]]
+        if len(sel) == 0:
+            continue
+        folder = Path(out_root) / folders[cid]
+        folder.mkdir(parents=True, exist_ok=True)
+        feats = []
+        for i in sel:
+            loc, info = places[int(place_of[i])]
+            props = {
+                "NM_MUNICIPIO": info["NM_MUNICIPIO"],
+                "NR_ZONA": loc.zona,
+                "NR_LOCAL_VOTACAO": loc.local,
+                "NM_LOCAL_VOTACAO": info["NM_LOCAL_VOTACAO"],
+                # alias de ALIASES["local_votacao"]: sem ele o nome do ponto cairia no Bairro
+                "local_votacao": info["NM_LOCAL_VOTACAO"],
+                "DS_LOCAL_VOTACAO_ENDERECO": info["DS_LOCAL_VOTACAO_ENDERECO"],
+                "Bairro": safe_text(pick_prop(loc.props, BAIRRO_KEYS)),
+                "NR_VOTAVEL": nr,
+                "NM_VOTAVEL": nome,
+                "QT_VOTOS": int(votos_agg.vals[i]),
+                "QT_SECOES": int(secoes_agg.vals[i]),
+                "Latitude": loc.lat,
+                "Longitude": loc.lon,
+            }
+            feats.append({"type": "Feature", "geometry": {"type": "Point", "coordinates": [loc.lon, loc.lat]}, "properties": props})
+
+        _write_base(folder / f"votos_{base}.geojson", feats)
+        _write_base(folder / "votos_municipios.geojson", _municipio_features(feats, nr, nome))
+        stats["candidatos"][folder.name] = {"locais": len(feats), "votos": int(votos_agg.vals[sel].sum())}
+    return stats
+
+
+def _proporcional(ds_cargo: str) -> bool:
+    """Cargo proporcional pelo nome, para CSVs sem CD_CARGO."""
+    ds = ds_cargo.strip().upper()
+    return ds.startswith("DEPUTADO") or ds == "VEREADOR"
+
+
+def candidate_folders(cands: list[tuple[int, str]], slug_fn: Callable[[str], str]) -> list[str]:
+    """Pasta de cada (número, nome): o slug do nome, com o número quando dois candidatos
+    cairiam na mesma pasta (homônimos, nomes que só diferem em acentos)."""
+    slugs = [slug_fn(nome) for _nr, nome in cands]
+    count = Counter(slugs)
+    folders = [slug_fn(f"{nome} {nr}") if count[s] > 1 else s for s, (nr, nome) in zip(slugs, cands)]
+    dup = sorted(f for f, n in Counter(folders).items() if n > 1)
+    if dup:
+        raise ValueError(f"candidatos diferentes na mesma pasta: {', '.join(dup)}")
+    return folders
+
+
+def _municipio_features(feats: list[dict[str, Any]], nr: int, nome: str) -> list[dict[str, Any]]:
+    """Um ponto por município (centroide dos locais ponderado pelos votos)."""
+    acc: dict[str, list[float]] = {}
+    for ft in feats:
+        p = ft["properties"]
+        a = acc.setdefault(p["NM_MUNICIPIO"], [0.0, 0.0, 0.0, 0])
+        w = max(p["QT_VOTOS"], 1)
+        a[0] += p["Latitude"] * w
+        a[1] += p["Longitude"] * w
+        a[2] += w
+        a[3] += p["QT_VOTOS"]
+    out = []
+    for mun, (slat, slon, w, votos) in sorted(acc.items()):
+        lat, lon = slat / w, slon / w
+        props = {"NR_VOTAVEL": nr, "NM_VOTAVEL": nome, "NM_MUNICIPIO": mun, "QT_VOTOS": votos, "LATITUDE": lat, "LONGITUDE": lon}
+        out.append({"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}, "properties": props})
+    return out
+
+
+def _write_base(path: Path, feats: list[dict[str, Any]]):
+    gj = {"type": "FeatureCollection", "features": feats}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(gj, f, ensure_ascii=False, separators=(",", ":"))
+    write_votos_sidecar(path, build_votos_df(gj))
+
+
+def write_synthetic_tse_csv(
+    path: Path,
+    locais: Iterable[tuple[int, int, str]],
+    n_candidatos: int = 20,
+    secoes_por_local: int = 6,
+    seed: int = 42,
+    cargo: str = "DEPUTADO ESTADUAL",
+    uf: str = "CE",
+    cd_cargo: int = 7,
+) -> int:
+    """Gera um CSV no layout do TSE (sem rede) para testes e benchmarks.
+
+    `locais` são tuplas (zona, local, município). Retorna o número de linhas.
+    """
+    rng = random.Random(seed)
+    cands = [(10000 + i * 7, f"CANDIDATO SINTETICO {i:03d}") for i in range(n_candidatos)]
+    cands += [(95, "VOTO BRANCO"), (96, "VOTO NULO")]
+    n = 0
+    with open(path, "w", encoding="latin-1", newline="") as f:
+        w = csv.writer(f, delimiter=";", quoting=csv.QUOTE_ALL)
+        w.writerow(CSV_COLUMNS)
+        for zona, local, municipio in locais:
+            for s in range(secoes_por_local):
+                secao = local * 10 + s
+                for nr, nome in cands:
+                    votos = rng.randint(0, 40)
+                    if votos == 0:
+                        continue
+                    w.writerow([
+                        2024, 1, uf, 10000 + zona, municipio, zona, secao, cd_cargo, cargo, nr, nome, votos,
+                        local, f"ESCOLA {local}", f"RUA {local}, {s}",
+                    ])
+                    n += 1
+    return n
@@ -1,25 +1,58 @@
 from __future__ import annotations
 
 import importlib.util
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Callable
 
+import numpy as np
 import streamlit as st
 import pandas as pd
 
-from .config import APP_NAME, CANDIDATOS_DIR
-from .analytics import load_votos_df, filter_points_within_polygon
-from .io_geo import discover_layers_geojson, read_geojson
-from .schema import bounds_center_from_geojson
-from .styles import load_layer_styles, resolve_layer_style
-from .map_folium import build_map, add_geojson_layer, add_points_layer, finalize_map
-from .charts import chart_top_locais, chart_bottom_locais, chart_top_bairros, chart_hist_votos, chart_top_municipios, chart_bottom_municipios, chart_concentracao_votos, chart_votos_por_zona, chart_dispersao_geografica
+from .config import ADMIN_TOKEN, APP_NAME, CANDIDATOS_DIR, CHART_MAX_WORKERS, LAYER_STYLE_FILE, MAP_BACKEND, MAP_DELTA_UPDATES, RASTER_MIN_FEATURES
+from .analytics import (
+    layer_point_index,
+    load_votos_df_cached,
+    select_votos_features,
+    vote_density_grid,
+    vote_hexbins,
+    vote_hotspots,
+    voronoi_catchments,
+    votos_point_index,
+)
+from .io_geo import base_identifier, discover_layers_geojson, layer_in_base, read_geojson_cached
+from .spatial import PROP_ID, PROP_LABEL, PROP_LAYER, point_regions, region_totals, rows_in_region, with_totals
+from .schema import bounds_center_from_geojson, pick_prop
+from .styles import load_layer_styles, resolve_hexbin_style, resolve_layer_style
+from . import cache, export, selection
+from .lazy import lazy_import
+from .profiling import begin, detailed, end_run, finish, in_run, stage, start_run, summarize
+from . import memory
+from .charts import chart_top_locais, chart_bottom_locais, chart_top_bairros, chart_hist_votos, chart_top_municipios, chart_bottom_municipios, chart_concentracao_votos, chart_votos_por_zona, chart_dispersao_geografica, chart_votos_por_decil_renda, chart_renda_vs_votos
+from .income import income_stats, is_income_layer, tract_table
+from .pyramid import MAX_MARKERS, build_pyramid, votos_pyramid
+from .tiles import RasterLayer, base_votes_raster, ensure_tiles, layer_raster, tile_url, use_raster
+from .vector_tiles import lookup as vector_tiles_lookup
+from .warmup import start_warmup
+
+# folium, branca e pydeck só carregam ao montar o primeiro mapa (ver lazy.py)
+map_folium = lazy_import(f"{__package__}.map_folium")
+map_deck = lazy_import(f"{__package__}.map_deck")
+streamlit_folium = lazy_import("streamlit_folium")
 
 try:
-    from streamlit_folium import st_folium
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
 except Exception:
-    st_folium = None
+    get_script_run_ctx = None
+
+# gráficos calculados fora do script da página (ver _chart_slot)
+_chart_pool = ThreadPoolExecutor(max_workers=CHART_MAX_WORKERS, thread_name_prefix="localiza-charts")
+
+# toda página importa este módulo: o servidor começa a aquecer as bases na
+# primeira página carregada, qualquer que seja (scripts de linha de comando não)
+if st.runtime.exists():
+    start_warmup()
 
 @dataclass
 class CandidateSpec:
@@ -117,12 +150,16 @@ def discover_candidates(candidatos_dir: Path = CANDIDATOS_DIR) -> list[Path]:
     return out
 
 def load_candidate_module(py_file: Path):
-    spec = importlib.util.spec_from_file_location(py_file.stem, py_file)
-    if spec is None or spec.loader is None:
-        raise RuntimeError(f"Não consegui importar {py_file}")
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)  # type: ignore
-    return module
+    """Módulo do candidato, executado uma vez por versão do arquivo (cache compartilhado)."""
+    def build():
+        spec = importlib.util.spec_from_file_location(py_file.stem, py_file)
+        if spec is None or spec.loader is None:
+            raise RuntimeError(f"Não consegui importar {py_file}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)  # type: ignore
+        return module
+
+    return cache.get_or_build("modulo_candidato", py_file, build)
 
 def pick_candidate(candidates_py: list[Path]) -> Path | None:
     if not candidates_py:
@@ -142,11 +179,222 @@ def pick_candidate(candidates_py: list[Path]) -> Path | None:
             return py
     return items[0][1]
 
+def is_admin() -> bool:
+    """Ferramentas de admin: abrir a página com ?admin=<LOCALIZA_ADMIN_TOKEN>."""
+    return bool(ADMIN_TOKEN) and st.query_params.get("admin") == ADMIN_TOKEN
+
+def _altair_chart(ch, **kwargs):
+    with stage("st.altair_chart") as rec:
+        if detailed():
+            rec["bytes"] = len(ch.to_json())
+        st.altair_chart(ch, **kwargs)
+
+@dataclass
+class _ChartSlot:
+    box: Any  # st.empty() no lugar do gráfico
+    future: Future
+    empty: str | None = None  # aviso quando não há dados
+    caption: str | None = None
+    kwargs: dict[str, Any] = field(default_factory=dict)
+
+
+def _chart_slot(build: Callable[[], Any], empty: str | None = None, caption: str | None = None, **kwargs) -> _ChartSlot:
+    """Reserva o lugar do gráfico e dispara `build` no pool; o desenho fica para _fill_charts."""
+    box = st.empty()
+    box.caption("⏳ Calculando...")
+    return _ChartSlot(box, _chart_pool.submit(in_run(build)), empty, caption, kwargs)
+
+
+def _fill_charts(slots: list[_ChartSlot]):
+    """Desenha cada gráfico no seu lugar assim que fica pronto (o mais lento não segura os outros)."""
+    by_future = {slot.future: slot for slot in slots}
+    with stage("graficos.aguardar", rows=len(slots)):
+        for fut in as_completed(by_future):
+            slot = by_future[fut]
+            ch = fut.result()
+            if ch is None:
+                if slot.empty:
+                    slot.box.info(slot.empty)
+                else:
+                    slot.box.empty()
+                continue
+            with slot.box.container():
+                _altair_chart(ch, **slot.kwargs)
+                if slot.caption:
+                    st.caption(slot.caption)
+
+
+def _show_perf(run):
+    rows = summarize(run)
+    if not rows:
+        return
+    with st.expander(f"⏱️ Tempos desta execução: {run['total_ms']:.0f} ms", expanded=True):
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        _show_memory()
+
+def _session_id() -> str:
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    return ctx.session_id if ctx else "local"
+
+def _record_memory(candidate_folder: Path, **categories):
+    """Guarda os bytes desta sessão por categoria (o que vem do cache compartilhado não conta)."""
+    with stage("memoria.medir"):
+        memory.record_session(_session_id(), candidate_folder.name, categories)
+
+def _mb(nbytes: int | None) -> str:
+    return f"{nbytes / 2**20:,.1f} MB" if nbytes else "-"
+
+def _show_memory():
+    rep = memory.report()
+    st.caption(
+        f"🧠 Processo: {_mb(rep['rss'])} (teto {_mb(rep['teto'])}) | "
+        f"cache compartilhado: {_mb(rep['cache'])} (teto {_mb(rep['teto_cache'])}) | "
+        f"sessões: {_mb(rep['sessoes_total'])}"
+    )
+    me = _session_id()
+    rows = [
+        {"Origem": ("➡️ " if sid == me else "") + f"sessão {sid[:8]}", "Item": v["label"], **{k: _mb(b) for k, b in v["bytes"].items()}}
+        for sid, v in sorted(rep["sessoes"].items(), key=lambda kv: -sum(kv[1]["bytes"].values()))
+    ]
+    rows += [
+        {"Origem": "cache", "Item": f"{kind} ({agg['entradas']})", "total": _mb(agg["bytes"])}
+        for kind, agg in rep["cache_por_tipo"].items()
+    ]
+    if rows:
+        st.dataframe(pd.DataFrame(rows).fillna(""), use_container_width=True, hide_index=True)
+
+def _fragment_rerun() -> bool:
+    """True quando só um fragmento (st.fragment) está sendo refeito, não a página inteira."""
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    return bool(ctx and getattr(ctx, "fragment_ids_this_run", None))
+
+
+def _static_serving() -> bool:
+    try:
+        return bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        return False
+
+
+def _add_raster(m, name: str, layer: RasterLayer | None, style: dict[str, Any]) -> bool:
+    """Desenha a camada em tiles PNG e a coloca no mapa; False se não há o que desenhar."""
+    if layer is None or not len(layer):
+        return False
+    meta = ensure_tiles(name, layer)
+    url = tile_url(meta, st.get_option("server.baseUrlPath") or "")
+    map_folium.add_raster_layer(m, name, url, meta, show=bool(style.get("show", True)))
+    return True
+
+
+def _add_vector_tiles(m, name: str, layer_path: Path, style: dict[str, Any]) -> bool:
+    """Usa os tiles vetoriais pré-gerados (gerar_tiles.py) da camada, se existirem e estiverem em dia."""
+    if style.get("mode") in ("icon", "choropleth"):
+        return False
+    meta = vector_tiles_lookup(layer_path)
+    if meta is None:
+        return False
+    url = tile_url(meta, st.get_option("server.baseUrlPath") or "", ext="pbf")
+    map_folium.add_vector_tile_layer(m, name, url, meta, style)
+    return True
+
+
+def _deck_selection(event) -> dict[str, Any] | None:
+    """Feição clicada no mapa deck.gl, no formato do `last_active_drawing` do st_folium."""
+    selection = (event or {}).get("selection") or {}
+    for objs in (selection.get("objects") or {}).values():
+        for obj in objs or []:
+            if isinstance(obj, dict) and obj.get("geometry"):
+                return obj
+    return None
+
+
+def _fmt_corr(v: float | None) -> str:
+    return "-" if v is None else f"{v:+.2f}"
+
+@st.fragment
+def _render_leaders(votos_file: Path, df: pd.DataFrame, base_df: pd.DataFrame, layers: list[dict[str, Any]], candidate_folder: Path):
+    """Por líder: local de votação mais próximo e votos (do filtro atual) num raio de R km."""
+    st.markdown("🧭 Líderes: votos ao redor")
+    raio = st.slider("Raio (km)", min_value=0.5, max_value=20.0, value=2.0, step=0.5, key=f"lv_raio_{candidate_folder.name}")
+
+    with stage("lideres.consultar", rows=len(base_df)) as rec:
+        idx = votos_point_index(votos_file, df)
+        # pesos só das linhas no filtro: o índice é da base inteira
+        w = df["qt_votos"].where(df.index.isin(base_df.index), 0).to_numpy(dtype=float)
+        local_col = "NM_LOCAL_VOTACAO" if "NM_LOCAL_VOTACAO" in df.columns else "local_votacao"
+        total = w.sum() or 1.0
+        rows = []
+        for layer in layers:
+            lid = layer_point_index(layer["path"], layer["geojson"])
+            ok = np.isfinite(lid.lat) & np.isfinite(lid.lon)
+            if not ok.any():
+                continue
+            feats = layer["geojson"].get("features") or []
+            sums, counts = idx.sum_within(lid.lat[ok], lid.lon[ok], raio, w)
+            dist, near = idx.knn(lid.lat[ok], lid.lon[ok], k=1)
+            for j, fi in enumerate(np.flatnonzero(ok)):
+                props = feats[fi].get("properties") or {}
+                rows.append({
+                    "Líder": str(pick_prop(props, ("Nome", "nome", "NOME", "name")) or f"#{fi + 1}"),
+                    "Comunidade": str(pick_prop(props, ("comunidade", "Comunidade", "local", "Local")) or ""),
+                    "Local mais próximo": str(df[local_col].iloc[near[j, 0]]) if near.size else "",
+                    "Distância (km)": round(float(dist[j, 0]), 2) if dist.size else None,
+                    "Locais no raio": int(counts[j]),
+                    "Votos no raio": int(sums[j]),
+                    "% dos votos": round(100.0 * sums[j] / total, 1),
+                })
+        rec["rows"] = len(rows)
+    if not rows:
+        st.info("Sem líderes com coordenadas.")
+        return
+    out = pd.DataFrame(rows).sort_values("Votos no raio", ascending=False)
+    st.dataframe(out, use_container_width=True, hide_index=True)
+    st.caption("ℹ️ Raios podem se sobrepor: um mesmo voto conta para todos os líderes próximos.")
+
+def _render_income(votos_file: Path, df: pd.DataFrame, base_df: pd.DataFrame, layer: dict[str, Any]):
+    """Votos x renda para uma camada de setores censitários (só reagrega; a junção fica no cache)."""
+    regions = point_regions(votos_file, df, layer["path"], layer["geojson"])
+    if regions is None:
+        return
+    with stage(f"renda.reagregar:{layer['stem']}", rows=len(base_df)):
+        stats = income_stats(regions, base_df, tract_table(layer["path"], layer["geojson"]))
+    if stats["votos_em_setores"] <= 0:
+        return
+
+    st.markdown(f"💰 Votos x Renda ({layer['stem'].replace('_', ' ')})")
+    st.caption(
+        f"{stats['cobertura'] * 100:.0f}% dos votos do filtro caem nos setores desta camada | "
+        f"{stats['votos_mil_hab'] or 0:.1f} votos por mil habitantes | "
+        f"correlação renda x votos/hab.: Pearson {_fmt_corr(stats['pearson'])}, Spearman {_fmt_corr(stats['spearman'])}"
+    )
+    g1, g2 = st.columns(2)
+    with g1:
+        ch = chart_votos_por_decil_renda(stats["decis"])
+        if ch is not None:
+            _altair_chart(ch, use_container_width=True)
+            st.caption("ℹ️ Setores divididos em 10 faixas de renda média; barra = votos por mil habitantes.")
+    with g2:
+        ch = chart_renda_vs_votos(stats["setores"])
+        if ch is not None:
+            _altair_chart(ch, use_container_width=True)
+            st.caption("ℹ️ Um ponto por setor com votos; tamanho = população. Linha tracejada = tendência.")
+
 def render_candidate(candidate_folder: Path, title: str, subtitle: str, votos_files: list[Path], bounds_file: Path | None = None):
     header(title, subtitle)
 
+    show_perf = is_admin() and st.toggle("⏱️ Mostrar tempos por etapa", key="lv_perf")
+    memory.relieve_pressure()
+    run = start_run(f"render_candidate:{candidate_folder.name}", detailed=show_perf)
+    try:
+        _render_candidate(candidate_folder, votos_files, bounds_file)
+    finally:
+        end_run()
+        if show_perf:
+            _show_perf(run)
+
+def _render_candidate(candidate_folder: Path, votos_files: list[Path], bounds_file: Path | None = None):
     # ---- filtros na página (sem sidebar)
-    col1, col2, col3, col4 = st.columns([2,2,2,2])
+    col1, *_ = st.columns([2,2,2,2])
 
     votos_file = votos_files[0] if votos_files else None
     with col1:
@@ -159,44 +407,99 @@ def render_candidate(candidate_folder: Path, title: str, subtitle: str, votos_fi
         else:
             st.caption(f"Base de votos. {votos_file.name if votos_file else 'Sem arquivo'}")
 
-    df = load_votos_df(votos_file) if votos_file else pd.DataFrame()
+    with stage("votos.carregar") as rec:
+        df = load_votos_df_cached(votos_file) if votos_file else pd.DataFrame()
+        rec["rows"] = len(df)
 
     if df.empty:
         st.error("Sem dados de votos ou sem coordenadas válidas.")
         st.stop()
 
-    # Detectar colunas a usar (priorizar colunas originais do GeoJSON)
-    if "NM_MUNICIPIO" in df.columns:
-        municipios = sorted([m for m in df["NM_MUNICIPIO"].dropna().astype(str).unique() if m.strip()])
-        mun_col = "NM_MUNICIPIO"
-    else:
-        municipios = sorted([m for m in df["Município"].dropna().astype(str).unique() if m.strip()]) if "Município" in df.columns else []
-        mun_col = "Município"
+    with stage("filtros.opcoes", rows=len(df)):
+        # Detectar colunas a usar (priorizar colunas originais do GeoJSON)
+        if "NM_MUNICIPIO" in df.columns:
+            municipios = sorted([m for m in df["NM_MUNICIPIO"].dropna().astype(str).unique() if m.strip()])
+            mun_col = "NM_MUNICIPIO"
+        else:
+            municipios = sorted([m for m in df["Município"].dropna().astype(str).unique() if m.strip()]) if "Município" in df.columns else []
+            mun_col = "Município"
     
-    bairros = sorted([b for b in df["Bairro/Distrito"].dropna().astype(str).unique() if b.strip()]) if "Bairro/Distrito" in df.columns else []
+        bairros = sorted([b for b in df["Bairro/Distrito"].dropna().astype(str).unique() if b.strip()]) if "Bairro/Distrito" in df.columns else []
     
-    if "NM_LOCAL_VOTACAO" in df.columns:
-        locais = sorted([l for l in df["NM_LOCAL_VOTACAO"].dropna().astype(str).unique() if l.strip()])
-        local_col = "NM_LOCAL_VOTACAO"
-    else:
-        locais = sorted([l for l in df["local_votacao"].dropna().astype(str).unique() if l.strip()]) if "local_votacao" in df.columns else []
-        local_col = "local_votacao"
+        if "NM_LOCAL_VOTACAO" in df.columns:
+            locais = sorted([l for l in df["NM_LOCAL_VOTACAO"].dropna().astype(str).unique() if l.strip()])
+            local_col = "NM_LOCAL_VOTACAO"
+        else:
+            locais = sorted([l for l in df["local_votacao"].dropna().astype(str).unique() if l.strip()]) if "local_votacao" in df.columns else []
+            local_col = "local_votacao"
 
-    with col2:
+    # Detectar se é arquivo de municípios
+    is_municipios = "municipios" in (votos_file.stem.lower() if votos_file else "")
+
+    # ---- Filtros, KPIs e mapa (fragmento)
+    mapa_out = _render_filtered(candidate_folder, votos_file, bounds_file, df, municipios, locais, mun_col, local_col, is_municipios)
+    df_f = mapa_out["df_f"]
+    choropleths = mapa_out["choropleths"]
+
+    df_sel = df_f
+    region = st.session_state.get("selection_region")
+    if region and region["layer"] in choropleths:
+        df_sel = rows_in_region(choropleths[region["layer"]], df_f, region["id"])
+        total_sel = int(df_sel["qt_votos"].sum())
+        st.markdown(
+            f"<div class='lv-card'><b>Área: {region['nome']}</b> ({region['layer']})<br/>Total de votos na área: <b>{total_sel:,}".replace(",", ".")
+            + f"</b><br/>Pontos dentro: <b>{len(df_sel):,}".replace(",", ".") + "</b></div>",
+            unsafe_allow_html=True,
+        )
+    elif (draw := _draw_selection(votos_file)):
+        df_sel = selection.rows_in_selection(df, df_f, draw.rows)
+        
+        # Formatar números sem vírgula
+        total_sel = int(df_sel["qt_votos"].sum())
+        pontos_sel = len(df_sel)
+        titulo = f"Seleção por {draw.labels[0]}" if len(draw.keys) == 1 else f"Seleção por {len(draw.keys)} formas"
+
+        st.markdown(
+            f"<div class='lv-card'><b>{titulo}</b><br/>Total de votos na área: <b>{total_sel:,}".replace(",", ".") + f"</b><br/>Pontos dentro: <b>{pontos_sel:,}".replace(",", ".") + "</b></div>",
+            unsafe_allow_html=True,
+        )
+
+    _record_memory(candidate_folder, dataframes=[df_f, df_sel], geojson=[mapa_out["votos_gj"]], mapa=[mapa_out["map"]])
+
+    # ---- Gráficos
+    base_df = df_sel
+    if base_df.empty:
+        st.subheader("📊 Gráficos")
+        st.info("Sem dados para gráficos com os filtros e a seleção atual.")
+        return
+    slots = _render_charts(votos_file, df, base_df, is_municipios, mapa_out["income_layers"], mapa_out["leader_layers"], candidate_folder)
+
+    # ---- Tabela (fragmento)
+    _render_table(votos_file, base_df, is_municipios, mun_col, local_col)
+
+    _fill_charts(slots)
+
+
+@st.fragment
+def _render_filtered(candidate_folder: Path, votos_file: Path | None, bounds_file: Path | None, df: pd.DataFrame,
+                     municipios: list[str], locais: list[str], mun_col: str, local_col: str, is_municipios: bool) -> dict[str, Any]:
+    """Filtros, KPIs e mapa. Fragmento: mexer num filtro refaz só esta parte (o mapa recebe a
+    máscara nova); gráficos e tabela esperam o botão de atualizar."""
+    col1, col2, *_ = st.columns([2,2,2,2])
+    with col1:
         mun = st.multiselect("Município", municipios, default=[], placeholder="Selecione")
-    with col3:
+    with col2:
         loc = st.multiselect("Buscar Local de Votação", locais, default=[], placeholder="Selecione")
-    with col4:
-        # Coluna vazia para manter layout
-        st.empty()
 
-    df_f = df.copy()
-    if mun:
-        df_f = df_f[df_f[mun_col].isin(mun)]
-    if loc:
-        df_f = df_f[df_f[local_col].isin(loc)]
+    with stage("filtros.aplicar", rows=len(df)):
+        df_f = df.copy()
+        if mun:
+            df_f = df_f[df_f[mun_col].isin(mun)]
+        if loc:
+            df_f = df_f[df_f[local_col].isin(loc)]
 
     # ---- Slider de filtro por quantidade de votos (ANTES dos KPIs)
+    faixa = None
     if not df_f.empty and "qt_votos" in df_f.columns:
         min_votos = int(df_f["qt_votos"].min())
         max_votos = int(df_f["qt_votos"].max())
@@ -254,13 +557,11 @@ def render_candidate(candidate_folder: Path, title: str, subtitle: str, votos_fi
             
             # Aplicar filtro de intervalo
             df_f = df_f[(df_f["qt_votos"] >= final_min) & (df_f["qt_votos"] <= final_max)]
+            faixa = (final_min, final_max)
 
     # KPIs (DEPOIS do filtro de quantidade de votos)
     c1, c2, c3, c4 = st.columns(4)
     
-    # Detectar se é arquivo de municípios
-    is_municipios = "municipios" in (votos_file.stem.lower() if votos_file else "")
-    
     total_votos = int(df_f["qt_votos"].sum()) if not df_f.empty else 0
     total_pontos = int(len(df_f))
     
@@ -295,7 +596,62 @@ def render_candidate(candidate_folder: Path, title: str, subtitle: str, votos_fi
         c3.markdown(f"<div class='lv-card lv-kpi'><div class='v'>{format_number(top_local_v)}</div><div class='l'>Top local</div></div>", unsafe_allow_html=True)
         c4.markdown(f"<div class='lv-card lv-kpi'><div class='v'>{top_local_name}</div><div class='l'>Onde apertar</div></div>", unsafe_allow_html=True)
 
-    # ---- Mapa
+
+    # filtros desta execução; na página inteira, são os que gráficos e tabela usam
+    filtros = (tuple(mun), tuple(loc), faixa)
+    if not _fragment_rerun():
+        st.session_state["filtros_graficos"] = filtros
+    elif st.session_state.get("filtros_graficos") != filtros:
+        col_aviso, col_botao = st.columns([6, 2])
+        col_aviso.info("📊 Gráficos e tabela ainda mostram o filtro anterior.")
+        if col_botao.button("🔄 Atualizar gráficos e tabela", use_container_width=True):
+            st.rerun()
+
+    mapa_out = _render_map(candidate_folder, votos_file, bounds_file, df, df_f, is_municipios)
+    return {**mapa_out, "df_f": df_f}
+
+
+def _draw_selection(votos_file: Path | None) -> selection.DrawSelection | None:
+    """Seleção desenhada da sessão, se for da base `votos_file` (posições mudam de uma base para outra)."""
+    saved = st.session_state.get("selection_draw")
+    if votos_file is None or not saved or saved[0] != cache.file_key(votos_file):
+        return None
+    return saved[1]
+
+
+def _selection_ops(candidate_folder: Path, drawings: list[dict[str, Any]] | None) -> list[str]:
+    """Operação de cada forma desenhada sobre as anteriores (a partir da segunda)."""
+    shapes = list(selection.drawn_shapes(drawings).values())
+    ops = [selection.OP_UNION]
+    if len(shapes) < 2:
+        return ops
+    st.caption("✏️ Formas desenhadas, combinadas na ordem do desenho:")
+    cols = st.columns(min(len(shapes) - 1, 4))
+    for i, ft in enumerate(shapes[1:], start=1):
+        with cols[(i - 1) % len(cols)]:
+            ops.append(st.selectbox(
+                f"Forma {i + 1} ({selection.shape_label(ft)})",
+                list(selection.OP_LABELS),
+                format_func=selection.OP_LABELS.get,
+                key=f"selecao_op_{candidate_folder.name}_{i}",
+            ))
+    return ops
+
+
+def _selection_changed(before: tuple, after: tuple) -> bool:
+    """Compara (região, seleção desenhada) pelos pontos: editar uma forma sem mudar os pontos não conta."""
+    if before[0] != after[0]:
+        return True
+    rows_a = before[1].rows if before[1] else None
+    rows_b = after[1].rows if after[1] else None
+    if rows_a is None or rows_b is None:
+        return (rows_a is None) != (rows_b is None)
+    return not np.array_equal(rows_a, rows_b)
+
+
+def _render_map(candidate_folder: Path, votos_file: Path | None, bounds_file: Path | None, df: pd.DataFrame, df_f: pd.DataFrame, is_municipios: bool) -> dict[str, Any]:
+    """Mapa e seleção por polígono. Roda dentro de _render_filtered: desenhar ou clicar no mapa
+    refaz só o fragmento, e a página inteira só se a seleção mudar."""
     st.subheader("🗺️ Mapa")
 
     # Se for municípios, usar bounds do ce_regioes
@@ -305,66 +661,93 @@ def render_candidate(candidate_folder: Path, title: str, subtitle: str, votos_fi
         ce_regioes_file = common_data_dir / "ce_regioes.geojson"
         
         if ce_regioes_file.exists():
-            ce_regioes_gj = read_geojson(ce_regioes_file)
+            ce_regioes_gj = read_geojson_cached(ce_regioes_file)
             if ce_regioes_gj:
                 bounds, center = bounds_center_from_geojson(ce_regioes_gj)
                 zoom_start = 7  # Zoom mais afastado para ver todo o estado
             else:
-                bounds_gj = read_geojson(bounds_file) if bounds_file else {}
+                bounds_gj = read_geojson_cached(bounds_file) if bounds_file else {}
                 bounds, center = bounds_center_from_geojson(bounds_gj) if bounds_gj else (None, None)
                 zoom_start = 11
         else:
-            bounds_gj = read_geojson(bounds_file) if bounds_file else {}
+            bounds_gj = read_geojson_cached(bounds_file) if bounds_file else {}
             bounds, center = bounds_center_from_geojson(bounds_gj) if bounds_gj else (None, None)
             zoom_start = 11
     else:
-        bounds_gj = read_geojson(bounds_file) if bounds_file else {}
+        bounds_gj = read_geojson_cached(bounds_file) if bounds_file else {}
         bounds, center = bounds_center_from_geojson(bounds_gj) if bounds_gj else (None, None)
         zoom_start = 10
     
+    # folium (padrão) ou deck.gl; os dois módulos têm a mesma API de montagem
+    deck = MAP_BACKEND == "deck" and map_deck.available()
+    mapa = map_deck if deck else map_folium
+    # folium: o mapa sem filtro (fundo, limites, votos da base inteira) vai uma vez por sessão;
+    # a cada filtro seguem só as camadas que dependem dele e uma atualização incremental
+    delta = MAP_DELTA_UPDATES and not deck
+
     if center is None:
-        center = [float(df_f["lat"].mean()), float(df_f["lon"].mean())]
+        center_df = df if delta else df_f
+        center = [float(center_df["lat"].mean()), float(center_df["lon"].mean())]
         if not is_municipios:
             zoom_start = 10
 
-    m = build_map(center=center, zoom_start=zoom_start)
-    
-    # Ajustar bounds do mapa se for municípios e tiver bounds
-    if is_municipios and bounds:
-        m.fit_bounds(bounds)
+    rec_mapa = begin("mapa.montar")
 
     # camadas comuns e do candidato
     exclude = {votos_file.name} if votos_file else set()
-    common_layers = discover_layers_geojson(Path(st.session_state.get("COMMON_DATA_DIR", "data")), exclude=exclude)
-    cand_layers = discover_layers_geojson(candidate_folder, exclude=exclude)
+    with stage("camadas.descobrir") as rec:
+        common_layers = discover_layers_geojson(Path(st.session_state.get("COMMON_DATA_DIR", "data")), exclude=exclude)
+        cand_layers = discover_layers_geojson(candidate_folder, exclude=exclude)
+        rec["rows"] = len(common_layers) + len(cand_layers)
 
     styles = load_layer_styles()
     
     # Extrair identificador da base de votos (ex: votos_fortaleza -> fortaleza, votos_quixeramobim -> quixeramobim)
-    base_identifier = ""
-    if votos_file:
-        stem = votos_file.stem.lower()
-        if stem.startswith("votos_"):
-            base_identifier = stem.replace("votos_", "").replace("_municipios", "")
+    base_id = base_identifier(votos_file)
 
+    # camadas em modo coroplético: stem -> atribuição ponto -> polígono (para o clique)
+    choropleths: dict[str, pd.Series] = {}
+    boundary_layers = []  # limites que contêm pontos da base (recorte das áreas de influência)
+    income_layers = []
+    leader_layers = []
+    static_ok = _static_serving() and not deck  # tiles PNG/MVT são camadas do Leaflet
+    raster_names = []  # camadas densas que foram como tiles PNG
+
+    # modo delta: reaproveita o mapa estático da sessão enquanto base, camadas e estilos não mudam
+    sig = (
+        candidate_folder.name, cache.file_key(votos_file) if votos_file else None, tuple(center), zoom_start,
+        tuple(cache.file_key(layer["path"]) for layer in common_layers + cand_layers),
+        cache.file_key(LAYER_STYLE_FILE), static_ok,
+    )
+    cached = st.session_state.get("mapa_estatico") if delta else None
+    build = not (cached and cached["sig"] == sig)
+    if build:
+        m = mapa.build_map(center=center, zoom_start=zoom_start)
+        # Ajustar bounds do mapa se for municípios e tiver bounds
+        if is_municipios and bounds:
+            m.fit_bounds(bounds)
+    else:
+        m = cached["map"]
+        raster_names = list(cached["raster"])
+
+    dyn: list = []  # grupos refeitos a cada filtro (modo delta)
+    delta_visible: dict[str, Any] = {}  # camada de votos -> _fid no filtro
+    delta_totals: dict[str, np.ndarray] = {}  # coroplético -> total por polígono no filtro
+
+    def _dyn(name: str, show: bool):
+        """(onde pôr a camada, show dela): no modo delta, num grupo próprio enviado a cada filtro."""
+        if not delta:
+            return m, show
+        fg = map_folium.dynamic_group(name, show)
+        dyn.append(fg)
+        return fg, True
     for layer in common_layers + cand_layers:
         layer_name = layer["stem"].lower()
-        layer_filename = layer["filename"].lower()
-        
-        # Pular camadas que não correspondem à base de votos selecionada
-        # Exceção: camadas que não começam com padrões conhecidos (locais_, distritos_, etc) sempre aparecem
-        if base_identifier:
-            # Lista de prefixos que devem ser filtrados por base
-            prefixes = ["votos_", "locais_", "distritos_", "bairros_", "zonas_", "lider_"]
-            
-            # Verificar se a camada tem algum prefixo conhecido
-            has_prefix = any(layer_name.startswith(p) for p in prefixes)
-            
-            if has_prefix:
-                # Se tem prefixo, só mostra se corresponder à base selecionada
-                if base_identifier not in layer_name and base_identifier not in layer_filename:
-                    continue
-            
+
+        # Pular camadas de outras bases (locais_, distritos_, lider_...); as sem prefixo conhecido sempre aparecem
+        if not layer_in_base(layer, base_id):
+            continue
+
         meta = {
             "stem": layer["stem"],
             "filename": layer["filename"],
@@ -372,29 +755,77 @@ def render_candidate(candidate_folder: Path, title: str, subtitle: str, votos_fi
             "type": layer["stem"],
         }
         stl = resolve_layer_style(meta, styles)
-        add_geojson_layer(m, layer["stem"], layer["geojson"], stl)
+        layer_gj = layer["geojson"]
+        if is_income_layer(layer_gj):
+            income_layers.append(layer)
+        if layer_name.startswith("lider_") and str(layer.get("geom")).lower() == "point":
+            leader_layers.append(layer)
+        totals = None
+        if stl.get("mode") == "choropleth" and votos_file:
+            regions = point_regions(votos_file, df, layer["path"], layer_gj)
+            if regions is not None:
+                totals = region_totals(regions, df_f, layer["features"])
+                choropleths[layer["stem"]] = regions
+                if (regions >= 0).any():
+                    boundary_layers.append(layer)
+        raster = static_ok and use_raster(layer["features"], stl)
+        # coroplético em PNG não se recolore no navegador: no modo delta vai refeito a cada filtro
+        dynamic = delta and totals is not None and raster
+        if delta and totals is not None and not dynamic:
+            # o mapa estático leva os totais da base inteira; os do filtro vão na atualização
+            delta_totals[layer["stem"]] = totals
+            totals = region_totals(regions, df, layer["features"])
+        if not (build or dynamic):
+            continue
+        if totals is not None:
+            layer_gj = with_totals(layer["stem"], layer_gj, totals, stl.get("labelField"))
+        target, show = _dyn(layer["stem"], stl.get("show", True)) if dynamic else (m, stl.get("show", True))
+        if static_ok and _add_vector_tiles(target, layer["stem"], layer["path"], stl):
+            continue
+        if raster:
+            if _add_raster(target, layer["stem"], layer_raster(layer["path"], layer_gj, stl), {**stl, "show": show}):
+                raster_names.append(layer["stem"])
+                continue
+        mapa.add_geojson_layer(target, layer["stem"], layer_gj, stl)
     
     # Adicionar o arquivo de votos selecionado (filtrado)
-    if votos_file and votos_file.exists():
-        votos_gj = read_geojson(votos_file)
+    votos_gj_filtered = None
+    votos_stl = resolve_layer_style(
+        {"stem": votos_file.stem, "filename": votos_file.name, "geom": "Point", "type": votos_file.stem}, styles,
+    ) if votos_file else {}
+    filterable = delta and votos_file is not None and not (static_ok and use_raster(len(df), votos_stl))
+    # base densa filtrada: nada de tiles por filtro (centenas de PNGs a cada mudança); a pirâmide mostra o recorte
+    votos_by_pyramid = False
+    if votos_file and not filterable:
+        # base densa: tiles (vetoriais ou PNG) da base inteira, ou a pirâmide com filtro
+        votos_target, votos_show = _dyn(votos_file.stem, votos_stl.get("show", True))
+        votos_stl = {**votos_stl, "show": votos_show}
+    if filterable:
+        # a base inteira vai uma vez no mapa estático; o filtro vira uma máscara das feições (_fid)
+        if build and votos_file.exists():
+            votos_gj = read_geojson_cached(votos_file)
+            if votos_gj:
+                map_folium.add_filterable_votes_layer(m, votos_file.stem, votos_gj, votos_stl)
+        delta_visible[votos_file.stem] = None if len(df_f) == len(df) else df_f["_fid"].to_numpy()
+    elif votos_file and static_ok and len(df_f) == len(df) and _add_vector_tiles(votos_target, votos_file.stem, votos_file, votos_stl):
+        # tiles vetoriais cobrem a base inteira; com filtro, vão PNG ou GeoJSON
+        pass
+    elif votos_file and static_ok and len(df_f) == len(df) and use_raster(len(df), votos_stl):
+        # um conjunto de tiles por (base, estilo), desenhado uma vez e reaproveitado por todas as sessões
+        with stage("votos.tiles", rows=len(df)):
+            if _add_raster(votos_target, votos_file.stem, base_votes_raster(votos_file, df, votos_stl), votos_stl):
+                raster_names.append(votos_file.stem)
+    elif votos_file and static_ok and use_raster(len(df_f), votos_stl):
+        votos_by_pyramid = True
+    elif votos_file and deck:
+        # WebGL: a base filtrada vai em colunas, sem montar o GeoJSON
+        mapa.add_points_layer(m, votos_file.stem, df_f, {**votos_stl, "graduated": True})
+    elif votos_file and votos_file.exists():
+        votos_gj = read_geojson_cached(votos_file)
         if votos_gj:
             # Filtrar features do GeoJSON baseado no df_f
             if not df_f.empty:
-                # Criar conjunto de coordenadas filtradas para comparação rápida
-                filtered_coords = set(zip(df_f["lat"].round(6), df_f["lon"].round(6)))
-                
-                # Filtrar features
-                filtered_features = []
-                for feature in votos_gj.get("features", []):
-                    geom = feature.get("geometry", {})
-                    if geom.get("type") == "Point":
-                        coords = geom.get("coordinates", [])
-                        if len(coords) >= 2:
-                            # Coordenadas em GeoJSON são [lon, lat]
-                            lat_rounded = round(coords[1], 6)
-                            lon_rounded = round(coords[0], 6)
-                            if (lat_rounded, lon_rounded) in filtered_coords:
-                                filtered_features.append(feature)
+                filtered_features = select_votos_features(votos_gj, df_f)
                 
                 # Criar novo GeoJSON com features filtradas
                 if filtered_features:
@@ -402,132 +833,191 @@ def render_candidate(candidate_folder: Path, title: str, subtitle: str, votos_fi
                         "type": "FeatureCollection",
                         "features": filtered_features
                     }
-                    
-                    meta = {
-                        "stem": votos_file.stem,
-                        "filename": votos_file.name,
-                        "geom": "Point",
-                        "type": votos_file.stem,
-                    }
-                    stl = resolve_layer_style(meta, styles)
-                    add_geojson_layer(m, votos_file.stem, votos_gj_filtered, stl)
+                    mapa.add_geojson_layer(votos_target, votos_file.stem, votos_gj_filtered, votos_stl)
 
-    finalize_map(m)
+    # totais por nível (município → bairro → local), trocados pelo zoom no navegador
+    if votos_file and not df_f.empty:
+        with stage("piramide", rows=len(df_f)):
+            levels = votos_pyramid(votos_file, df) if len(df_f) == len(df) else build_pyramid(df_f)
+        target, show = _dyn("🔢 Votos por nível", votos_by_pyramid or len(df_f) >= RASTER_MIN_FEATURES)
+        mapa.add_pyramid_layer(target, "🔢 Votos por nível", levels, show=show, limit=MAX_MARKERS)
 
-    if st_folium is None:
-        st.warning("Instale streamlit-folium para renderizar o mapa.")
-        st.stop()
+    # áreas de influência (Voronoi) dos locais da base, calculadas uma vez por base
+    if votos_file and not is_municipios and build:
+        with stage("voronoi"):
+            catchments = voronoi_catchments(votos_file, df, boundary_layers)
+        if catchments and catchments["features"]:
+            mapa.add_geojson_layer(m, "🗺️ Áreas de influência dos locais", catchments, {
+                "color": "#34495e", "weight": 1, "opacity": 0.7, "fillColor": "#34495e", "fillOpacity": 0.05, "show": False,
+            })
 
-    out = st_folium(
-        m,
-        width=None,
-        height=800,
-        returned_objects=["all_drawings", "last_active_drawing"],
-        key=f"folium_{candidate_folder.name}",
-    )
+    # hot-spots: densidade em grade + aglomerados, recalculados a cada filtro (~dezenas de ms)
+    with stage("hotspots", rows=len(df_f)):
+        grid = vote_density_grid(df_f)
+    if grid is not None:
+        target, show = _dyn("🔥 Densidade de votos", False)
+        mapa.add_density_overlay(target, "🔥 Densidade de votos", grid, show=show)
+        target, show = _dyn("🔥 Aglomerados de votos", False)
+        mapa.add_hotspots_layer(target, "🔥 Aglomerados de votos", vote_hotspots(grid), show=show)
+
+    # grade hexagonal: densidade que não depende da escala, uma feição por célula
+    hex_stl = resolve_hexbin_style(votos_file.stem, styles) if votos_file else {}
+    if hex_stl.get("enabled"):
+        hexbins = vote_hexbins(df_f, cells=int(hex_stl.get("cells", 60)), cell_m=hex_stl.get("cellMeters"))
+        if hexbins:
+            target, show = _dyn("⬢ Votos por hexágono", hex_stl.get("show", True))
+            mapa.add_hexbin_layer(target, "⬢ Votos por hexágono", hexbins, {**hex_stl, "show": show})
+
+    if build and not deck:
+        # no modo delta o controle de camadas vai pelo st_folium, para incluir os grupos dinâmicos
+        mapa.finalize_map(m, control=not delta)
+    if build and delta:
+        st.session_state["mapa_estatico"] = {"sig": sig, "map": m, "raster": [n for n in raster_names if n not in {g.layer_name for g in dyn}]}
+    finish(rec_mapa)
+
+    if deck:
+        with stage("st.pydeck_chart", rows=len(df_f)):
+            visiveis = st.multiselect(
+                "🗂️ Camadas", m.names(), default=m.names(visible_only=True), key=f"deck_camadas_{candidate_folder.name}",
+            )
+            event = st.pydeck_chart(
+                mapa.finalize_map(m, visiveis),
+                height=800,
+                on_select="rerun",
+                selection_mode="single-object",
+                key=f"deck_{candidate_folder.name}",
+            )
+        st.caption("🖱️ Clique numa área para filtrar gráficos e tabela (desenho livre só no mapa folium).")
+        out = {"last_active_drawing": _deck_selection(event)}
+    else:
+        if streamlit_folium is None:
+            st.warning("Instale streamlit-folium para renderizar o mapa.")
+            st.stop()
+
+        with stage("st_folium", rows=len(df_f)) as rec:
+            if detailed():
+                rec["bytes"] = len(m.get_root().render())
+            extra = {}
+            if delta:
+                extra = {
+                    "feature_group_to_add": dyn + [map_folium.delta_update(delta_visible, delta_totals)],
+                    "layer_control": map_folium.layer_control(),
+                }
+            # render=False: o st_folium já desenha o mapa (o render da página inteira repetiria tudo)
+            with map_folium.reusable(m):
+                out = streamlit_folium.st_folium(
+                    m,
+                    width=None,
+                    height=800,
+                    returned_objects=["all_drawings", "last_active_drawing"],
+                    key=f"folium_{candidate_folder.name}",
+                    render=False,
+                    **extra,
+                )
+
+    if raster_names:
+        st.caption(f"🧱 Camadas densas desenhadas como imagem (sem dicas ao passar o mouse): {', '.join(raster_names)}")
 
-    # seleção por polígono
+    # seleção: clique numa área do coroplético ou formas desenhadas (combinadas pelas operações)
+    before = (st.session_state.get("selection_region"), _draw_selection(votos_file))
+    draw = before[1]
+    if "all_drawings" in out and votos_file is not None:
+        ops = _selection_ops(candidate_folder, out.get("all_drawings"))
+        draw = selection.update(draw, out.get("all_drawings"), votos_file, df, ops)
     last = out.get("last_active_drawing")
-    if isinstance(last, dict) and last.get("geometry"):
-        gtype = (last.get("geometry") or {}).get("type")
-        if str(gtype).lower() in ("polygon", "multipolygon"):
-            st.session_state["selection_geojson"] = last
+    if draw is not before[1]:
+        # formas novas, editadas ou apagadas: o desenho passa a valer
+        st.session_state["selection_draw"] = (cache.file_key(votos_file), draw)
+        st.session_state.pop("selection_region", None)
+    elif isinstance(last, dict) and last.get("geometry"):
+        props = last.get("properties") or {}
+        if PROP_LAYER in props and PROP_ID in props:
+            st.session_state["selection_region"] = {
+                "layer": props[PROP_LAYER], "id": int(props[PROP_ID]), "nome": props.get(PROP_LABEL),
+            }
+    after = (st.session_state.get("selection_region"), _draw_selection(votos_file))
+    if _fragment_rerun() and _selection_changed(before, after):
+        # a seleção muda gráficos e tabela: sai do fragmento e refaz a página
+        st.rerun()
 
-    df_sel = df_f
-    if st.session_state.get("selection_geojson"):
-        df_sel = filter_points_within_polygon(df_f, st.session_state["selection_geojson"])
-        
-        # Formatar números sem vírgula
-        total_sel = int(df_sel["qt_votos"].sum())
-        pontos_sel = len(df_sel)
+    return {
+        "choropleths": choropleths, "income_layers": income_layers, "leader_layers": leader_layers,
+        "map": m, "votos_gj": votos_gj_filtered,
+    }
 
-        st.markdown(
-            f"<div class='lv-card'><b>Seleção por polígono</b><br/>Total de votos na área: <b>{total_sel:,}".replace(",", ".") + f"</b><br/>Pontos dentro: <b>{pontos_sel:,}".replace(",", ".") + "</b></div>",
-            unsafe_allow_html=True,
-        )
 
-    # ---- Gráficos
+def _render_charts(votos_file: Path, df: pd.DataFrame, base_df: pd.DataFrame, is_municipios: bool, income_layers: list, leader_layers: list, candidate_folder: Path) -> list[_ChartSlot]:
+    """Lugares dos gráficos (calculados no pool, ver _fill_charts), renda e líderes."""
     st.subheader("📊 Gráficos")
-    
-    base_df = df_sel if st.session_state.get("selection_geojson") else df_f
-    if base_df.empty:
-        st.info("Sem dados para gráficos com os filtros e a seleção atual.")
-        return
 
-    # Detectar tipo de arquivo para mostrar gráficos apropriados
+    # Detectar tipo de arquivo para mostrar gráficos apropriados.
+    # Os gráficos são calculados no pool de threads: a página segue (renda, líderes, tabela)
+    # e cada um aparece no seu lugar ao ficar pronto
+    slots: list[_ChartSlot] = []
     if is_municipios:
         g1, g2 = st.columns(2)
         with g1:
             st.markdown("🏆 Top 15 municípios com mais votos")
-            ch = chart_top_municipios(base_df, top_n=15)
-            if ch is None:
-                st.info("Sem dados de municípios.")
-            else:
-                st.altair_chart(ch, use_container_width=True)
+            slots.append(_chart_slot(lambda: chart_top_municipios(base_df, top_n=15), "Sem dados de municípios.", use_container_width=True))
 
         with g2:
             st.markdown("📉 15 municípios com menos votos")
-            ch = chart_bottom_municipios(base_df, bottom_n=15)
-            if ch is None:
-                st.info("Sem dados de municípios.")
-            else:
-                st.altair_chart(ch, use_container_width=True)
+            slots.append(_chart_slot(lambda: chart_bottom_municipios(base_df, bottom_n=15), "Sem dados de municípios.", use_container_width=True))
     else:
         g1, g2 = st.columns(2)
         with g1:
             st.markdown("🏆 Top 15 locais com mais votos")
-            ch = chart_top_locais(base_df, top_n=15)
-            if ch is None:
-                st.info("Sem locais preenchidos.")
-            else:
-                st.altair_chart(ch, use_container_width=True)
+            slots.append(_chart_slot(lambda: chart_top_locais(base_df, top_n=15), "Sem locais preenchidos.", use_container_width=True))
 
         with g2:
             st.markdown("📉 15 locais com menos votos")
-            ch = chart_bottom_locais(base_df, bottom_n=15)
-            if ch is None:
-                st.info("Sem locais preenchidos.")
-            else:
-                st.altair_chart(ch, use_container_width=True)
+            slots.append(_chart_slot(lambda: chart_bottom_locais(base_df, bottom_n=15), "Sem locais preenchidos.", use_container_width=True))
 
         st.markdown("Top bairros/distritos")
-        ch2 = chart_top_bairros(base_df)
-        if ch2 is not None:
-            st.altair_chart(ch2, use_container_width=True)
+        slots.append(_chart_slot(lambda: chart_top_bairros(base_df), use_container_width=True))
         
         st.markdown("📊 Análises Avançadas")
         
         g3, g4 = st.columns(2)
         with g3:
             st.markdown("🎯 Concentração de Votos (Curva de Pareto)")
-            ch_conc = chart_concentracao_votos(base_df)
-            if ch_conc is not None:
-                st.altair_chart(ch_conc, use_container_width=True)
-                st.caption("ℹ️ Mostra quantos locais concentram a maior parte dos votos. Linha vermelha = 80% dos votos.")
-            else:
-                st.info("Sem dados para análise de concentração.")
+            slots.append(_chart_slot(
+                lambda: chart_concentracao_votos(base_df), "Sem dados para análise de concentração.",
+                "ℹ️ Mostra quantos locais concentram a maior parte dos votos. Linha vermelha = 80% dos votos.",
+                use_container_width=True,
+            ))
         
         with g4:
             st.markdown("📍 Dispersão Geográfica")
-            ch_geo = chart_dispersao_geografica(base_df)
-            if ch_geo is not None:
-                st.altair_chart(ch_geo, use_container_width=True, theme="streamlit")
-                st.caption("ℹ️ Tamanho e cor dos pontos proporcionais aos votos. Top 200 locais.")
-            else:
-                st.info("Sem coordenadas para dispersão geográfica.")
+            slots.append(_chart_slot(
+                lambda: chart_dispersao_geografica(base_df), "Sem coordenadas para dispersão geográfica.",
+                "ℹ️ Tamanho e cor dos pontos proporcionais aos votos. Top 200 locais.",
+                use_container_width=True, theme="streamlit",
+            ))
         
         st.markdown("📊 Votos por Zona Eleitoral")
-        ch_zona = chart_votos_por_zona(base_df)
-        if ch_zona is not None:
-            st.altair_chart(ch_zona, use_container_width=True)
-            st.caption("ℹ️ Barras = total de votos | Linha vermelha = média de votos por local")
+        slots.append(_chart_slot(
+            lambda: chart_votos_por_zona(base_df), caption="ℹ️ Barras = total de votos | Linha vermelha = média de votos por local",
+            use_container_width=True,
+        ))
         
         st.markdown("Distribuição por faixa de votos")
-        ch3 = chart_hist_votos(base_df)
-        if ch3 is not None:
-            st.altair_chart(ch3, use_container_width=True)
+        slots.append(_chart_slot(lambda: chart_hist_votos(base_df), use_container_width=True))
+
+        for layer in income_layers:
+            _render_income(votos_file, df, base_df, layer)
+
+        if leader_layers:
+            _render_leaders(votos_file, df, base_df, leader_layers, candidate_folder)
+
+    return slots
+
 
+@st.fragment
+def _render_table(votos_file: Path | None, base_df: pd.DataFrame, is_municipios: bool, mun_col: str, local_col: str):
+    """Tabela e exportação. Fragmento: trocar o formato ou baixar não refaz mapa nem gráficos."""
     st.subheader("📄 Tabela")
+    rec_tabela = begin("tabela", rows=len(base_df))
     
     # Preparar colunas para exibição (sem coordenadas, bairro e endereço)
     if is_municipios:
@@ -552,12 +1042,20 @@ def render_candidate(candidate_folder: Path, title: str, subtitle: str, votos_fi
     # Exibir tabela
     st.dataframe(df_display, use_container_width=True)
     
-    # Botão de download responsivo embaixo
-    csv = df_display.to_csv(index=False, encoding='utf-8-sig')
-    st.download_button(
-        label="📥 Baixar CSV",
-        data=csv,
-        file_name=f"localizavotos_{votos_file.stem if votos_file else 'dados'}.csv",
-        mime="text/csv",
-        use_container_width=True
-    )
+    # Exportação com todas as colunas e a geometria: o arquivo só é gerado no clique
+    # (fora do script) e fica em disco para o mesmo recorte, ver export.py
+    if votos_file is not None:
+        c1, c2 = st.columns([1, 3])
+        fmt = c1.selectbox(
+            "Formato", export.available_formats(), format_func=lambda f: export.FORMATS[f][0],
+            key="export_formato", label_visibility="collapsed",
+        )
+        c2.download_button(
+            label=f"📥 Baixar {export.FORMATS[fmt][0]}",
+            data=lambda: export.export_bytes(votos_file, base_df, fmt),
+            file_name=export.file_name(votos_file, fmt),
+            mime=export.FORMATS[fmt][2],
+            use_container_width=True,
+        )
+    finish(rec_tabela)
+
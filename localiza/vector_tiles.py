@@ -0,0 +1,487 @@
+"""Tiles vetoriais (Mapbox Vector Tile) das camadas, gerados fora do app.
+
+`gerar_tiles.py` corta cada GeoJSON de `data/` e das pastas de candidatos em
+tiles z/x/y (MVT 2.1, extent 4096). A cada zoom as linhas e polígonos são
+simplificados com tolerância de ~1 pixel e os menores que um pixel caem; nos
+tiles com pontos demais fica um ponto por pixel (o de mais votos) e no máximo
+`MVT_MAX_POINTS`. O resultado vai para um MBTiles (SQLite, em `tiles/`, fora do
+que é servido) e é exportado em `.pbf` para `static/mvt/<camada>/<hash>/`,
+servido pelo Streamlit. No mapa, o Leaflet.VectorGrid baixa só os tiles
+visíveis; estilo e dicas ao passar o mouse continuam no navegador.
+
+O codificador de protobuf é local (o formato é pequeno) e o corte usa shapely;
+sem shapely não há tiles vetoriais e as camadas seguem como GeoJSON/PNG.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+
+from . import cache
+from .config import (
+    BASE_DIR, MVT_EXTENT, MVT_MAX_POINTS, MVT_MAX_TILES, MVT_MAX_ZOOM, MVT_MBTILES_DIR,
+    MVT_MIN_ZOOM, MVT_STATIC_DIR,
+)
+from .io_geo import file_digest, read_geojson
+from .lazy import lazy_import
+from .tiles import BOUNDS_PAD, TILE_SIZE, group_by_tile, mercator_px
+
+# só carregam no primeiro uso (ver lazy.py)
+shapely = lazy_import("shapely")
+
+# tipos de geometria do MVT
+POINT, LINESTRING, POLYGON = 1, 2, 3
+
+# campos mostrados na dica das camadas de votos (os demais saem do tile)
+VOTOS_FIELDS = {
+    "NM_MUNICIPIO": "🏛️ Município",
+    "NM_LOCAL_VOTACAO": "📍 Local de Votação",
+    "NM_VOTAVEL": "👤 Nome",
+    "NR_VOTAVEL": "🔢 N°",
+    "NR_ZONA": "📍 Zona",
+}
+
+# margem em volta do tile (unidades do extent) para não cortar contornos na borda
+BUFFER = 64
+
+
+# ---- protobuf
+
+def _varint(n: int, out: bytearray):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _field(num: int, payload: bytes | bytearray, out: bytearray):
+    _varint((num << 3) | 2, out)
+    _varint(len(payload), out)
+    out += payload
+
+
+def _uint_field(num: int, value: int, out: bytearray):
+    _varint(num << 3, out)
+    _varint(value, out)
+
+
+def _packed(num: int, values: list[int], out: bytearray):
+    body = bytearray()
+    for v in values:
+        _varint(v, body)
+    _field(num, body, out)
+
+
+def _value(v: Any) -> bytes:
+    out = bytearray()
+    if isinstance(v, bool):
+        _uint_field(7, int(v), out)
+    elif isinstance(v, (int, np.integer)) and -(2**63) <= int(v) < 2**63:
+        _varint(6 << 3, out)
+        _varint(_zigzag(int(v)), out)
+    elif isinstance(v, (float, np.floating)):
+        _varint((3 << 3) | 1, out)
+        out += np.float64(v).tobytes()
+    else:
+        _field(1, str(v).encode("utf-8"), out)
+    return bytes(out)
+
+
+def _command(cmd: int, count: int) -> int:
+    return (cmd & 0x7) | (count << 3)
+
+
+def _ring_points(coords: np.ndarray, closed: bool) -> np.ndarray | None:
+    """Coordenadas inteiras sem repetições seguidas (e sem o ponto de fechamento)."""
+    pts = np.rint(coords[:, :2]).astype(np.int64)
+    if len(pts) > 1:
+        keep = np.ones(len(pts), dtype=bool)
+        keep[1:] = np.any(pts[1:] != pts[:-1], axis=1)
+        pts = pts[keep]
+    if closed:
+        if len(pts) > 1 and (pts[0] == pts[-1]).all():
+            pts = pts[:-1]
+        return pts if len(pts) >= 3 else None
+    return pts if len(pts) >= 2 else None
+
+
+def _signed_area(pts: np.ndarray) -> float:
+    x, y = pts[:, 0].astype(float), pts[:, 1].astype(float)
+    return float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2
+
+
+def _encode_geometry(gtype: int, parts: list[np.ndarray]) -> list[int]:
+    cmds: list[int] = []
+    cx = cy = 0
+    if gtype == POINT:
+        cmds.append(_command(1, len(parts)))
+        for x, y in parts:
+            cmds += [_zigzag(int(x) - cx), _zigzag(int(y) - cy)]
+            cx, cy = int(x), int(y)
+        return cmds
+    for pts in parts:
+        x0, y0 = int(pts[0][0]), int(pts[0][1])
+        cmds += [_command(1, 1), _zigzag(x0 - cx), _zigzag(y0 - cy)]
+        cx, cy = x0, y0
+        cmds.append(_command(2, len(pts) - 1))
+        for x, y in pts[1:].tolist():
+            cmds += [_zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+        if gtype == POLYGON:
+            cmds.append(_command(7, 1))
+    return cmds
+
+
+def _geometry_parts(geom) -> tuple[int, list[np.ndarray]] | None:
+    """(tipo MVT, partes) de uma geometria shapely já em coordenadas do tile."""
+    kind = geom.geom_type
+    if kind in ("Point", "MultiPoint"):
+        pts = np.rint(shapely.get_coordinates(geom)).astype(np.int64)
+        return (POINT, list(pts)) if len(pts) else None
+    if kind in ("LineString", "MultiLineString"):
+        parts = [_ring_points(np.asarray(g.coords), closed=False) for g in getattr(geom, "geoms", [geom])]
+        parts = [p for p in parts if p is not None]
+        return (LINESTRING, parts) if parts else None
+    if kind in ("Polygon", "MultiPolygon"):
+        parts = []
+        for poly in getattr(geom, "geoms", [geom]):
+            ext = _ring_points(np.asarray(poly.exterior.coords), closed=True)
+            if ext is None:
+                continue
+            # exterior com área positiva no sistema do tile (y para baixo); buracos, negativa
+            parts.append(ext if _signed_area(ext) > 0 else ext[::-1])
+            for ring in poly.interiors:
+                hole = _ring_points(np.asarray(ring.coords), closed=True)
+                if hole is not None:
+                    parts.append(hole if _signed_area(hole) < 0 else hole[::-1])
+        return (POLYGON, parts) if parts else None
+    if kind == "GeometryCollection":
+        polys = [g for g in geom.geoms if g.geom_type in ("Polygon", "MultiPolygon")]
+        return _geometry_parts(shapely.union_all(polys)) if polys else None
+    return None
+
+
+def encode_tile(layer_name: str, features: list[tuple[int, Any, dict[str, Any]]]) -> bytes:
+    """Tile MVT com uma camada: `features` = [(id, geometria shapely no tile, propriedades)]."""
+    layer = bytearray()
+    _uint_field(15, 2, layer)
+    _field(1, layer_name.encode("utf-8"), layer)
+    keys: dict[str, int] = {}
+    values: dict[bytes, int] = {}
+    for fid, geom, props in features:
+        enc = _geometry_parts(geom)
+        if enc is None:
+            continue
+        gtype, parts = enc
+        tags = []
+        for k, v in props.items():
+            if v is None or v == "":
+                continue
+            val = _value(v)
+            tags += [keys.setdefault(k, len(keys)), values.setdefault(val, len(values))]
+        feat = bytearray()
+        _uint_field(1, int(fid), feat)
+        if tags:
+            _packed(2, tags, feat)
+        _uint_field(3, gtype, feat)
+        _packed(4, _encode_geometry(gtype, parts), feat)
+        _field(2, feat, layer)
+    for k in keys:
+        _field(3, k.encode("utf-8"), layer)
+    for val in values:
+        _field(4, val, layer)
+    _uint_field(5, MVT_EXTENT, layer)
+    tile = bytearray()
+    _field(3, layer, tile)
+    return bytes(tile)
+
+
+# ---- corte
+
+def _votes_key(props: dict[str, Any]) -> str | None:
+    return next((k for k in props if k.upper() == "QT_VOTOS"), None)
+
+
+def layer_fields(stem: str, gj: dict[str, Any]) -> dict[str, str]:
+    """Propriedades que vão para os tiles -> rótulo na dica (as mesmas do GeoJSON no mapa)."""
+    feats = gj.get("features") or []
+    props = (feats[0].get("properties") or {}) if feats else {}
+    if "votos" in stem.lower():
+        fields = {k: v for k, v in VOTOS_FIELDS.items() if k in props}
+        votes = _votes_key(props)
+        if votes:
+            fields[votes] = "🗳️ Votos"
+        return fields
+    return {k: k for k in [k for k in props if k and props[k]][:5]}
+
+
+def _to_units(geoms: np.ndarray, z: int) -> np.ndarray:
+    """Lon/lat -> unidades do extent no zoom `z` (pixels globais x extent/256)."""
+    k = MVT_EXTENT / TILE_SIZE
+
+    def project(coords: np.ndarray) -> np.ndarray:
+        x, y = mercator_px(coords[:, 0], coords[:, 1], z)
+        return np.column_stack((x * k, y * k))
+
+    return shapely.transform(geoms, project)
+
+
+def _tile_groups(bounds: np.ndarray, z: int, limit: int | None) -> dict[tuple[int, int], np.ndarray] | None:
+    """Tiles tocados pelas caixas `bounds` (em unidades do extent) -> índices das feições."""
+    pad = BUFFER
+    x0 = ((bounds[:, 0] - pad) // MVT_EXTENT).astype(np.int64)
+    y0 = ((bounds[:, 1] - pad) // MVT_EXTENT).astype(np.int64)
+    x1 = ((bounds[:, 2] + pad) // MVT_EXTENT).astype(np.int64)
+    y1 = ((bounds[:, 3] + pad) // MVT_EXTENT).astype(np.int64)
+    w, h = x1 - x0 + 1, y1 - y0 + 1
+    counts = w * h
+    if limit is not None and counts.sum() > 50 * limit:
+        return None
+    item = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    tx = x0[item] + local % w[item]
+    ty = y0[item] + local // w[item]
+    groups = group_by_tile(tx * (1 << z) + ty, item, len(counts), z)
+    return None if limit is not None and len(groups) > limit else groups
+
+
+def _thin_points(coords: np.ndarray, weight: np.ndarray | None, idx: np.ndarray, x0: float, y0: float) -> np.ndarray:
+    """Um ponto por pixel do tile (o de mais votos) e no máximo `MVT_MAX_POINTS`."""
+    if len(idx) <= MVT_MAX_POINTS and weight is None:
+        return idx
+    order = idx if weight is None else idx[np.argsort(-weight[idx], kind="stable")]
+    px = ((coords[order, 0] - x0) * TILE_SIZE // MVT_EXTENT).astype(np.int64)
+    py = ((coords[order, 1] - y0) * TILE_SIZE // MVT_EXTENT).astype(np.int64)
+    _, first = np.unique(px * (TILE_SIZE * 4) + py, return_index=True)
+    return np.sort(order[np.sort(first)][:MVT_MAX_POINTS])
+
+
+def cut_tiles(stem: str, gj: dict[str, Any]) -> Iterator[tuple[int, int, int, bytes]]:
+    """(z, x, y, tile MVT) de cada tile não vazio da camada, do menor zoom ao maior.
+
+    Para no último zoom que cabe em `MVT_MAX_TILES` tiles; acima dele o Leaflet
+    amplia (vetor não perde nitidez).
+    """
+    feats = [ft for ft in gj.get("features") or [] if ft.get("geometry")]
+    fields = layer_fields(stem, gj)
+    geoms, props = [], []
+    for ft in feats:
+        try:
+            g = shapely.geometry.shape(ft["geometry"])
+        except Exception:
+            continue
+        if g.is_empty:
+            continue
+        geoms.append(g)
+        p = ft.get("properties") or {}
+        props.append({k: p.get(k) for k in fields})
+    if not geoms:
+        return
+    geoms = np.asarray(geoms, dtype=object)
+    votes = _votes_key(props[0]) if props else None
+    weight = np.array([float(p.get(votes) or 0) for p in props]) if votes else None
+    types = shapely.get_type_id(geoms)
+    is_point = np.isin(types, (0, 4))
+
+    for z in range(MVT_MIN_ZOOM, MVT_MAX_ZOOM + 1):
+        limit = None if z == MVT_MIN_ZOOM else MVT_MAX_TILES
+        units = _to_units(geoms, z)
+        lines = ~is_point
+        if lines.any():
+            # ~1 pixel de tolerância; polígonos menores que um pixel somem neste zoom
+            px = MVT_EXTENT / TILE_SIZE
+            units[lines] = shapely.simplify(units[lines], px, preserve_topology=True)
+            poly = np.isin(types, (3, 6))
+            keep = ~(poly & (shapely.area(units) < px * px))
+        else:
+            keep = np.ones(len(units), dtype=bool)
+        idx_keep = np.flatnonzero(keep)
+        groups = _tile_groups(shapely.bounds(units[idx_keep]), z, limit)
+        if groups is None:
+            return
+        coords = shapely.get_coordinates(units) if (types == 0).all() else None
+        for (x, y), local in groups.items():
+            idx = idx_keep[local]
+            x0, y0 = x * MVT_EXTENT, y * MVT_EXTENT
+            if coords is not None:
+                idx = _thin_points(coords, weight, idx, x0, y0)
+                clipped = units[idx]
+            else:
+                clipped = shapely.clip_by_rect(units[idx], x0 - BUFFER, y0 - BUFFER, x0 + MVT_EXTENT + BUFFER, y0 + MVT_EXTENT + BUFFER)
+            clipped = shapely.transform(clipped, lambda c, x0=x0, y0=y0: c - (x0, y0))
+            features = [(int(i) + 1, g, props[i]) for i, g in zip(idx.tolist(), clipped) if not g.is_empty]
+            if features:
+                yield z, x, y, encode_tile(stem, features)
+
+
+# ---- MBTiles
+
+def layer_slug(layer_path: Path) -> str:
+    """Nome do conjunto de tiles: caminho relativo ao projeto (`data__setores_ce`)."""
+    p = Path(layer_path).resolve()
+    try:
+        rel = p.relative_to(BASE_DIR).with_suffix("")
+    except ValueError:
+        rel = Path(p.parent.name) / p.stem
+    return "__".join(rel.parts)
+
+
+def mbtiles_path(layer_path: Path, out_dir: Path = MVT_MBTILES_DIR) -> Path:
+    return out_dir / f"{layer_slug(layer_path)}.mbtiles"
+
+
+def build_mbtiles(layer_path: Path, out_dir: Path = MVT_MBTILES_DIR) -> dict[str, Any] | None:
+    """Corta a camada e grava `tiles/<slug>.mbtiles`; devolve os metadados (None se vazia)."""
+    if shapely is None:
+        raise RuntimeError("tiles vetoriais precisam do shapely")
+    layer_path = Path(layer_path)
+    gj = read_geojson(layer_path)
+    stem = layer_path.stem
+    out = mbtiles_path(layer_path, out_dir)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+
+    digest = hashlib.blake2b(digest_size=8)
+    zooms, count = set(), 0
+    con = sqlite3.connect(tmp)
+    try:
+        con.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+        con.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+        con.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+        for z, x, y, data in cut_tiles(stem, gj):
+            digest.update(f"{z}/{x}/{y}".encode())
+            digest.update(data)
+            # MBTiles usa linhas no esquema TMS (y invertido) e tiles comprimidos
+            con.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)", (z, x, (1 << z) - 1 - y, gzip.compress(data, 6)))
+            zooms.add(z)
+            count += 1
+        if not count:
+            return None
+
+        coords = [c for ft in gj.get("features") or [] for c in _flat((ft.get("geometry") or {}).get("coordinates"))]
+        arr = np.asarray(coords, dtype=float)
+        bounds = [float(arr[:, 0].min()), float(arr[:, 1].min()), float(arr[:, 0].max()), float(arr[:, 1].max())]
+        fields = layer_fields(stem, gj)
+        props = [(ft.get("properties") or {}) for ft in gj.get("features") or []]
+        votes = _votes_key(props[0]) if props else None
+        vals = [float(p.get(votes) or 0) for p in props] if votes else []
+        meta = {
+            "name": stem,
+            "format": "pbf",
+            "type": "overlay",
+            "version": "2",
+            "bounds": ",".join(f"{b:.6f}" for b in bounds),
+            "minzoom": str(min(zooms)),
+            "maxzoom": str(max(zooms)),
+            "json": json.dumps({"vector_layers": [{"id": stem, "fields": {k: "String" for k in fields}}]}),
+            "lv_fields": json.dumps(fields, ensure_ascii=False),
+            "lv_votes": json.dumps([votes, min(vals), max(vals)] if vals else None),
+            "lv_geom": str(((gj.get("features") or [{}])[0].get("geometry") or {}).get("type")),
+            # conteúdo, não mtime: um clone ou deploy novo não invalida os tiles
+            "lv_source": file_digest(layer_path),
+            "lv_digest": digest.hexdigest(),
+            "lv_tiles": str(count),
+        }
+        con.executemany("INSERT INTO metadata VALUES (?, ?)", list(meta.items()))
+        con.commit()
+    finally:
+        con.close()
+        if not count:
+            tmp.unlink(missing_ok=True)
+    os.replace(tmp, out)
+    return meta
+
+
+def _flat(coords) -> Iterator[list[float]]:
+    if not isinstance(coords, list) or not coords:
+        return
+    if isinstance(coords[0], (int, float)):
+        yield coords[:2]
+        return
+    for c in coords:
+        yield from _flat(c)
+
+
+def read_metadata(mbtiles: Path) -> dict[str, str]:
+    con = sqlite3.connect(f"file:{mbtiles}?mode=ro", uri=True)
+    try:
+        return dict(con.execute("SELECT name, value FROM metadata").fetchall())
+    finally:
+        con.close()
+
+
+def export_pbf(mbtiles: Path, out_dir: Path) -> int:
+    """Copia os tiles do MBTiles para `out_dir/z/x/y.pbf` (descomprimidos, para o servidor estático)."""
+    tmp = out_dir.parent / f".{out_dir.name}.{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    n = 0
+    con = sqlite3.connect(f"file:{mbtiles}?mode=ro", uri=True)
+    try:
+        for z, x, row, data in con.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles"):
+            path = tmp / str(z) / str(x) / f"{(1 << z) - 1 - row}.pbf"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(gzip.decompress(data) if data[:2] == b"\x1f\x8b" else data)
+            n += 1
+    finally:
+        con.close()
+    try:
+        os.replace(tmp, out_dir)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return n
+
+
+def _published(mbtiles: Path, slug: str) -> dict[str, Any]:
+    meta = read_metadata(mbtiles)
+    out_dir = MVT_STATIC_DIR / slug / meta["lv_digest"]
+    if not out_dir.exists():
+        export_pbf(mbtiles, out_dir)
+        # versões anteriores da mesma camada
+        for old in (MVT_STATIC_DIR / slug).iterdir():
+            if old != out_dir and not old.name.startswith("."):
+                shutil.rmtree(old, ignore_errors=True)
+    b = [float(v) for v in meta["bounds"].split(",")]
+    return {
+        "path": f"mvt/{slug}/{meta['lv_digest']}",
+        "layer": meta["name"],
+        "min_zoom": int(meta["minzoom"]),
+        "max_native_zoom": int(meta["maxzoom"]),
+        "bounds": [[b[1] - BOUNDS_PAD, b[0] - BOUNDS_PAD], [b[3] + BOUNDS_PAD, b[2] + BOUNDS_PAD]],
+        "fields": json.loads(meta.get("lv_fields") or "{}"),
+        "votes": json.loads(meta.get("lv_votes") or "null"),
+        "geom": meta.get("lv_geom"),
+        "source": meta.get("lv_source"),
+    }
+
+
+def lookup(layer_path: Path) -> dict[str, Any] | None:
+    """Tiles vetoriais pré-gerados da camada (exportados para static/), ou None.
+
+    None também quando o GeoJSON mudou depois da geração: a camada volta a ir
+    como GeoJSON até `gerar_tiles.py` rodar de novo.
+    """
+    mb = mbtiles_path(layer_path)
+    if not mb.exists():
+        return None
+    try:
+        meta = cache.get_or_build("mvt", mb, lambda: _published(mb, layer_slug(layer_path)))
+        # hash calculado uma vez por versão do arquivo, não a cada mapa
+        digest = cache.get_or_build("mvt_fonte", layer_path, lambda: file_digest(layer_path))
+    except (OSError, sqlite3.Error, KeyError, ValueError):
+        return None
+    if meta["source"] != digest:
+        return None
+    return meta
@@ -0,0 +1,116 @@
+"""Aquecimento das bases na subida do servidor.
+
+Carrega em paralelo (pool de threads) as bases de votos de todos os candidatos e
+as camadas comuns, preenchendo o cache compartilhado (`localiza.cache`). Assim o
+primeiro visitante de cada página não paga a leitura/normalização dos GeoJSON.
+"""
+from __future__ import annotations
+
+import importlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+from .config import CANDIDATOS_DIR, COMMON_DATA_DIR, WARMUP_MAX_WORKERS
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_thread: threading.Thread | None = None
+_done = threading.Event()
+_status: dict[str, Any] = {"started": None, "finished": None, "tasks": 0, "errors": []}
+
+# bibliotecas que o pacote só importa no primeiro uso (ver lazy.py); carregadas
+# depois do aquecimento, sem segurar a tela de senha nem o healthcheck
+PRELOAD_MODULES = (f"{__package__}.map_folium", "streamlit_folium", "altair", "shapely", "scipy.spatial")
+
+
+def warmup_tasks(candidatos_dir: Path = CANDIDATOS_DIR, common_dir: Path = COMMON_DATA_DIR) -> list[tuple[str, Callable[[], Any]]]:
+    """Lista (descrição, função) de tudo que deve ser pré-carregado."""
+    from .analytics import load_votos_df_cached
+    from .io_geo import discover_layers_geojson, read_geojson_cached
+    from .ui import discover_candidates
+
+    tasks: list[tuple[str, Callable[[], Any]]] = [
+        (f"camadas {common_dir.name}", lambda: discover_layers_geojson(common_dir)),
+    ]
+    for py in discover_candidates(candidatos_dir):
+        folder = py.parent
+        for votos_file in sorted(folder.glob("votos_*.geojson")):
+            tasks.append((f"base {votos_file}", lambda f=votos_file: load_votos_df_cached(f)))
+            tasks.append((f"camada {votos_file}", lambda f=votos_file: read_geojson_cached(f)))
+        tasks.append((f"camadas {folder.name}", lambda d=folder: discover_layers_geojson(d)))
+    return tasks
+
+
+def _run(max_workers: int):
+    t0 = time.perf_counter()
+    try:
+        tasks = warmup_tasks()
+        _status["tasks"] = len(tasks)
+
+        def _one(item):
+            desc, fn = item
+            try:
+                fn()
+            except Exception as exc:  # uma base quebrada não pode travar o healthcheck
+                log.warning("warm-up falhou em %s: %s", desc, exc)
+                _status["errors"].append(desc)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="localiza-warmup") as pool:
+            list(pool.map(_one, tasks))
+    except Exception:
+        log.exception("warm-up interrompido")
+    finally:
+        _status["finished"] = time.time()
+        log.info("warm-up concluído: %d tarefas em %.1fs", _status["tasks"], time.perf_counter() - t0)
+        _done.set()
+    _preload()
+
+
+def _preload():
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as exc:
+            log.debug("pré-carga de %s falhou: %s", name, exc)
+
+
+def start_warmup(max_workers: int | None = None) -> None:
+    """Dispara o aquecimento em segundo plano (apenas uma vez por processo).
+
+    Desligado com `LOCALIZA_WARMUP=0`.
+    """
+    global _thread
+    with _lock:
+        if _thread is not None or _done.is_set():
+            return
+        if os.environ.get("LOCALIZA_WARMUP", "1") == "0":
+            _done.set()
+            return
+        _status["started"] = time.time()
+        _thread = threading.Thread(
+            target=_run,
+            args=(max_workers or WARMUP_MAX_WORKERS,),
+            name="localiza-warmup",
+            daemon=True,
+        )
+        _thread.start()
+
+
+def warmup_done() -> bool:
+    return _done.is_set()
+
+
+def wait_warmup(timeout: float | None = None) -> bool:
+    """Bloqueia até o fim do aquecimento. Retorna False se estourar o timeout."""
+    start_warmup()
+    return _done.wait(timeout)
+
+
+def warmup_status() -> dict[str, Any]:
+    return dict(_status, done=_done.is_set())
@@ -0,0 +1,28 @@
+"""Cache compartilhado entre sessões (`localiza.cache`)."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from localiza import cache
+
+
+def test_builder_com_erro_nao_deixa_trava(tmp_path):
+    path = tmp_path / "base.geojson"
+    path.write_text("{}", encoding="utf-8")
+
+    def falha():
+        raise RuntimeError("arquivo corrompido")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_build("teste_erro", path, falha)
+    assert not [k for k in cache._building if k[0] == "teste_erro"]
+
+    # a próxima tentativa constrói normalmente
+    assert cache.get_or_build("teste_erro", path, lambda: 42) == 42
+    assert not [k for k in cache._building if k[0] == "teste_erro"]
+    cache.clear("teste_erro")
@@ -0,0 +1,38 @@
+"""Conjuntos de tiles PNG em disco (`localiza.tiles.prune`)."""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from localiza import tiles
+
+
+def make_set(root: Path, name: str, age: float) -> Path:
+    path = root / "votos" / name
+    path.mkdir(parents=True)
+    meta = path / "meta.json"
+    meta.write_text("{}", encoding="utf-8")
+    t = time.time() - age
+    os.utime(meta, (t, t))
+    return path
+
+
+def test_prune_mantem_conjuntos_recentes_e_pendentes(tmp_path):
+    antigo = make_set(tmp_path, "antigo", 7200)
+    pendente = make_set(tmp_path, "pendente", 3600)
+    recente = make_set(tmp_path, "recente", 60)
+    with tiles._locks_guard:
+        tiles._pending.add(pendente)
+    try:
+        removed = tiles.prune(tmp_path, keep=0, recent=600)
+    finally:
+        with tiles._locks_guard:
+            tiles._pending.discard(pendente)
+
+    assert removed == 1
+    assert not antigo.exists()
+    assert pendente.exists() and recente.exists()
@@ -0,0 +1,165 @@
+"""Divisão do CSV do TSE por candidato (`localiza.tse.split_tse_csv`)."""
+from __future__ import annotations
+
+import csv
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from add_candidato import slugify
+from localiza.analytics import load_votos_df, read_votos_sidecar
+from localiza.tse import NAO_CANDIDATOS, open_tse_csv, split_tse_csv, write_synthetic_tse_csv
+
+# (zona, local, município, bairro, lat, lon)
+LOCAIS = [
+    (1, 1015, "FORTALEZA", "ALDEOTA", -3.7336, -38.4950),
+    (1, 1023, "FORTALEZA", "MEIRELES", -3.7260, -38.4900),
+    (2, 1031, "FORTALEZA", "BENFICA", -3.7400, -38.5380),
+    (14, 1040, "SOBRAL", "CENTRO", -3.6880, -40.3490),
+    (14, 1058, "SOBRAL", "JUNCO", -3.6800, -40.3600),
+]
+
+
+@pytest.fixture
+def tse(tmp_path):
+    locais_file = tmp_path / "locais_teste.geojson"
+    feats = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {"NR_ZONA": zona, "NR_LOCAL_VOTACAO": local, "Municipio": mun, "Bairro": bairro},
+        }
+        for zona, local, mun, bairro, lat, lon in LOCAIS
+    ]
+    locais_file.write_text(json.dumps({"type": "FeatureCollection", "features": feats}), encoding="utf-8")
+    csv_file = tmp_path / "votacao_secao_teste.csv"
+    write_synthetic_tse_csv(csv_file, [(z, l, m) for z, l, m, *_ in LOCAIS], n_candidatos=4, secoes_por_local=3)
+    return csv_file, locais_file, tmp_path / "candidatos"
+
+
+def csv_totals(csv_file: Path) -> Counter:
+    totals: Counter = Counter()
+    with open_tse_csv(csv_file) as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            if int(row["NR_VOTAVEL"]) not in NAO_CANDIDATOS:
+                totals[slugify(row["NM_VOTAVEL"])] += int(row["QT_VOTOS"])
+    return totals
+
+
+def test_split_totais_por_candidato(tse):
+    csv_file, locais_file, out = tse
+    # chunk pequeno força várias passadas do agregador
+    stats = split_tse_csv(csv_file, [locais_file], out, slug_fn=slugify, base_name="ce", chunk_size=7)
+
+    expected = csv_totals(csv_file)
+    assert set(stats["candidatos"]) == set(expected)
+    for slug, votos in expected.items():
+        assert stats["candidatos"][slug]["votos"] == votos
+        for name in ("votos_ce.geojson", "votos_municipios.geojson"):
+            df = load_votos_df(out / slug / name)
+            assert df["qt_votos"].sum() == votos
+
+
+def test_split_liga_todas_as_linhas_a_um_local(tse):
+    csv_file, locais_file, out = tse
+    stats = split_tse_csv(csv_file, [locais_file], out, slug_fn=slugify, base_name="ce")
+
+    assert stats["sem_local"] == 0
+    assert stats["locais_sem_coordenada"] == 0
+    by_local = {f"ESCOLA {local}": (bairro, lat, lon) for _, local, _, bairro, lat, lon in LOCAIS}
+    for slug in stats["candidatos"]:
+        df = load_votos_df(out / slug / "votos_ce.geojson")
+        assert len(df) == stats["candidatos"][slug]["locais"]
+        for row in df.itertuples():
+            # o nome do ponto é o local de votação, não o bairro
+            assert row.local_votacao in by_local
+            bairro, lat, lon = by_local[row.local_votacao]
+            assert row.bairro == bairro
+            assert (row.lat, row.lon) == pytest.approx((lat, lon))
+
+
+def test_split_grava_sidecar_legivel(tse):
+    csv_file, locais_file, out = tse
+    stats = split_tse_csv(csv_file, [locais_file], out, slug_fn=slugify, base_name="ce")
+
+    for slug in stats["candidatos"]:
+        for name in ("votos_ce.geojson", "votos_municipios.geojson"):
+            path = out / slug / name
+            sidecar = read_votos_sidecar(path)
+            assert sidecar is not None
+            assert len(sidecar) == len(load_votos_df(path)) > 0
+
+
+def test_split_conta_votos_sem_local(tse, tmp_path):
+    csv_file, locais_file, out = tse
+    # um local a mais no CSV, sem coordenada em locais_*.geojson
+    extra = tmp_path / "extra.csv"
+    write_synthetic_tse_csv(extra, [(99, 9999, "CRATO")], n_candidatos=2, secoes_por_local=1)
+    with open(csv_file, "a", encoding="latin-1", newline="") as f:
+        f.writelines(extra.read_text(encoding="latin-1").splitlines(keepends=True)[1:])
+
+    stats = split_tse_csv(csv_file, [locais_file], out, slug_fn=slugify, base_name="ce")
+    missing = csv_totals(extra)
+    assert stats["locais_sem_coordenada"] == 1
+    assert stats["sem_local"] == sum(missing.values())
+    expected = csv_totals(csv_file) - missing
+    assert {slug: info["votos"] for slug, info in stats["candidatos"].items()} == dict(expected)
+
+
+def append_rows(csv_file: Path, rows: list[tuple[int, str, int]], cargo: str = "DEPUTADO ESTADUAL", cd_cargo: int = 7):
+    """Acrescenta (número, nome, votos) no primeiro local de LOCAIS."""
+    zona, local, mun, *_ = LOCAIS[0]
+    with open(csv_file, "a", encoding="latin-1", newline="") as f:
+        w = csv.writer(f, delimiter=";", quoting=csv.QUOTE_ALL)
+        for nr, nome, votos in rows:
+            w.writerow([2024, 1, "CE", 10000 + zona, mun, zona, local * 10, cd_cargo, cargo, nr, nome, votos,
+                        local, f"ESCOLA {local}", f"RUA {local}, 0"])
+
+
+def test_split_homonimos_vao_para_pastas_separadas(tse):
+    csv_file, locais_file, out = tse
+    append_rows(csv_file, [(12345, "JOSÉ DA SILVA", 10), (54321, "JOSE DA SILVA", 20)])
+
+    stats = split_tse_csv(csv_file, [locais_file], out, slug_fn=slugify, base_name="ce")
+    assert stats["candidatos"]["jose_da_silva_12345"]["votos"] == 10
+    assert stats["candidatos"]["jose_da_silva_54321"]["votos"] == 20
+    assert "jose_da_silva" not in stats["candidatos"]
+    # os demais continuam só com o nome
+    assert set(stats["candidatos"]) - {"jose_da_silva_12345", "jose_da_silva_54321"} == set(csv_totals(csv_file)) - {"jose_da_silva"}
+
+
+def test_split_ignora_votos_de_legenda(tse):
+    csv_file, locais_file, out = tse
+    expected = csv_totals(csv_file)
+    append_rows(csv_file, [(13, "PARTIDO DOS TESTES", 50), (45, "OUTRO PARTIDO", 7)])
+
+    stats = split_tse_csv(csv_file, [locais_file], out, slug_fn=slugify, base_name="ce")
+    assert stats["legenda"] == 57
+    assert {slug: info["votos"] for slug, info in stats["candidatos"].items()} == dict(expected)
+
+
+def test_split_prefeito_de_dois_digitos_e_candidato(tmp_path, tse):
+    _csv, locais_file, out = tse
+    csv_file = tmp_path / "prefeito.csv"
+    write_synthetic_tse_csv(csv_file, [], cargo="PREFEITO", cd_cargo=11)
+    append_rows(csv_file, [(13, "CANDIDATA A PREFEITA", 50)], cargo="PREFEITO", cd_cargo=11)
+
+    stats = split_tse_csv(csv_file, [locais_file], out, slug_fn=slugify, base_name="ce")
+    assert stats["legenda"] == 0
+    assert stats["candidatos"]["candidata_a_prefeita"]["votos"] == 50
+
+
+def test_split_exige_um_cargo(tse):
+    csv_file, locais_file, out = tse
+    append_rows(csv_file, [(12345, "CANDIDATO SINTETICO 000", 10)], cargo="DEPUTADO FEDERAL", cd_cargo=6)
+
+    with pytest.raises(ValueError, match="--cargo"):
+        split_tse_csv(csv_file, [locais_file], out, slug_fn=slugify, base_name="ce")
+    # com o cargo escolhido, a linha do outro cargo fica de fora
+    stats = split_tse_csv(csv_file, [locais_file], out, slug_fn=slugify, cargo="7", base_name="ce")
+    assert {slug: info["votos"] for slug, info in stats["candidatos"].items()} == dict(csv_totals(csv_file) - Counter({"candidato_sintetico_000": 10}))
@@ -0,0 +1,207 @@
+"""Tiles vetoriais (`localiza.vector_tiles.cut_tiles`), lidos de volta por um decodificador de protobuf."""
+from __future__ import annotations
+
+import struct
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+pytest.importorskip("shapely")
+
+from localiza.config import MVT_EXTENT, MVT_MIN_ZOOM
+from localiza.tiles import TILE_SIZE, mercator_px
+from localiza.vector_tiles import POINT, POLYGON, cut_tiles, encode_tile, layer_fields
+
+# (local, município, votos, lat, lon): longe o bastante para não cair no mesmo pixel em z5
+LOCAIS = [
+    ("ESCOLA 1015", "FORTALEZA", 120, -3.7336, -38.4950),
+    ("ESCOLA 1040", "SOBRAL", 45, -3.6880, -40.3490),
+    ("ESCOLA 2010", "CRATO", 7, -7.2340, -39.4090),
+    ("ESCOLA 3001", "QUIXERAMOBIM", 0, -5.1990, -39.2930),
+]
+
+
+def read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        shift += 7
+        if b < 0x80:
+            return n, pos
+
+
+def read_message(buf: bytes) -> list[tuple[int, int | bytes]]:
+    """(campo, valor) na ordem do buffer: varint como int, length-delimited e fixos como bytes."""
+    out, pos = [], 0
+    while pos < len(buf):
+        tag, pos = read_varint(buf, pos)
+        num, wire = tag >> 3, tag & 7
+        if wire == 0:
+            value, pos = read_varint(buf, pos)
+        elif wire == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire == 2:
+            size, pos = read_varint(buf, pos)
+            value, pos = buf[pos:pos + size], pos + size
+        elif wire == 5:
+            value, pos = buf[pos:pos + 4], pos + 4
+        else:
+            raise AssertionError(f"wire type inesperado: {wire}")
+        out.append((num, value))
+    return out
+
+
+def packed(buf: bytes) -> list[int]:
+    vals, pos = [], 0
+    while pos < len(buf):
+        v, pos = read_varint(buf, pos)
+        vals.append(v)
+    return vals
+
+
+def unzigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def decode_value(buf: bytes):
+    (num, v), = read_message(buf)
+    return {1: lambda: v.decode("utf-8"), 3: lambda: struct.unpack("<d", v)[0],
+            6: lambda: unzigzag(v), 7: lambda: bool(v)}[num]()
+
+
+def decode_geometry(cmds: list[int]) -> list[tuple[str, list[tuple[int, int]]]]:
+    """Comandos MVT -> [(comando, pontos absolutos)]; ClosePath vem como ("close", [])."""
+    out, i, x, y = [], 0, 0, 0
+    while i < len(cmds):
+        cmd, count = cmds[i] & 7, cmds[i] >> 3
+        i += 1
+        if cmd == 7:
+            out.append(("close", []))
+            continue
+        pts = []
+        for _ in range(count):
+            x += unzigzag(cmds[i])
+            y += unzigzag(cmds[i + 1])
+            i += 2
+            pts.append((x, y))
+        out.append(({1: "move", 2: "line"}[cmd], pts))
+    return out
+
+
+def decode_tile(data: bytes) -> dict:
+    (num, layer_buf), = read_message(data)
+    assert num == 3
+    layer = {"features": [], "keys": [], "values": []}
+    for num, v in read_message(layer_buf):
+        if num == 15:
+            layer["version"] = v
+        elif num == 1:
+            layer["name"] = v.decode("utf-8")
+        elif num == 2:
+            layer["features"].append(dict(read_message(v)))
+        elif num == 3:
+            layer["keys"].append(v.decode("utf-8"))
+        elif num == 4:
+            layer["values"].append(decode_value(v))
+        elif num == 5:
+            layer["extent"] = v
+    for ft in layer["features"]:
+        tags = packed(ft.get(2, b""))
+        ft["props"] = {layer["keys"][k]: layer["values"][v] for k, v in zip(tags[::2], tags[1::2])}
+        ft["geometry"] = decode_geometry(packed(ft[4]))
+    return layer
+
+
+def votos_geojson() -> dict:
+    return {"type": "FeatureCollection", "features": [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {"NM_LOCAL_VOTACAO": local, "NM_MUNICIPIO": mun, "QT_VOTOS": votos, "EXTRA": "fora do tile"},
+        }
+        for local, mun, votos, lat, lon in LOCAIS
+    ]}
+
+
+def test_cut_tiles_pontos_voltam_no_lugar():
+    gj = votos_geojson()
+    fields = layer_fields("votos_teste", gj)
+    seen = defaultdict(set)
+    k = MVT_EXTENT / TILE_SIZE
+    for z, x, y, data in cut_tiles("votos_teste", gj):
+        layer = decode_tile(data)
+        assert (layer["version"], layer["name"], layer["extent"]) == (2, "votos_teste", MVT_EXTENT)
+        for ft in layer["features"]:
+            i = ft[1] - 1
+            local, mun, votos, lat, lon = LOCAIS[i]
+            assert ft[3] == POINT
+            (cmd, pts), = ft["geometry"]
+            assert cmd == "move" and len(pts) == 1
+            gx, gy = mercator_px(np.array([lon]), np.array([lat]), z)
+            px, py = pts[0]
+            # coordenada inteira do extent, relativa ao canto do tile
+            assert abs(x * MVT_EXTENT + px - gx[0] * k) <= 0.5
+            assert abs(y * MVT_EXTENT + py - gy[0] * k) <= 0.5
+            # só os campos da dica; zero é valor, vazio não
+            expected = {f: v for f, v in gj["features"][i]["properties"].items() if f in fields}
+            assert ft["props"] == expected
+            seen[z].add(i)
+    assert seen and min(seen) == MVT_MIN_ZOOM
+    for z, idx in seen.items():
+        assert idx == set(range(len(LOCAIS))), z
+
+
+def test_cut_tiles_poligono_fechado_e_orientado():
+    # quadrado de ~11 km com um buraco no meio
+    lon0, lat0, d = -38.6, -3.8, 0.1
+    ext = [[lon0, lat0], [lon0 + d, lat0], [lon0 + d, lat0 + d], [lon0, lat0 + d], [lon0, lat0]]
+    hole = [[lon0 + d / 4, lat0 + d / 4], [lon0 + d / 4, lat0 + 3 * d / 4], [lon0 + 3 * d / 4, lat0 + 3 * d / 4],
+            [lon0 + 3 * d / 4, lat0 + d / 4], [lon0 + d / 4, lat0 + d / 4]]
+    gj = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ext, hole]}, "properties": {"CD_SETOR": "230440"}},
+    ]}
+    tiles = list(cut_tiles("setores_teste", gj))
+    assert tiles
+    with_hole = 0
+    for z, x, y, data in tiles:
+        (ft,) = decode_tile(data)["features"]
+        assert ft[3] == POLYGON
+        assert ft["props"] == {"CD_SETOR": "230440"}
+        rings, cur = [], []
+        for cmd, pts in ft["geometry"]:
+            if cmd == "move":
+                cur = list(pts)
+            elif cmd == "line":
+                cur += pts
+            else:
+                rings.append(cur)
+        # todo anel termina em ClosePath
+        assert ft["geometry"][-1][0] == "close"
+        areas = []
+        for ring in rings:
+            xs, ys = np.array(ring, dtype=float).T
+            areas.append(float(np.dot(xs, np.roll(ys, -1)) - np.dot(np.roll(xs, -1), ys)) / 2)
+        # exterior positivo (y para baixo), buraco negativo
+        assert areas[0] > 0
+        if len(rings) > 1:
+            assert all(a < 0 for a in areas[1:])
+            with_hole += 1
+    # nos zooms baixos o quadrado cabe num tile só, com o buraco
+    assert with_hole >= 1
+
+
+def test_encode_tile_tipos_de_valor():
+    shapely = pytest.importorskip("shapely")
+    props = {"nome": "JOSÉ", "votos": 12, "negativo": -3, "taxa": 0.25, "ativo": True, "vazio": "", "nulo": None}
+    layer = decode_tile(encode_tile("teste", [(7, shapely.Point(10, 20), props)]))
+    (ft,) = layer["features"]
+    assert ft[1] == 7
+    assert ft["geometry"] == [("move", [(10, 20)])]
+    assert ft["props"] == {"nome": "JOSÉ", "votos": 12, "negativo": -3, "taxa": 0.25, "ativo": True}